@@ -0,0 +1,2049 @@
+"""
+Tic-Tac-Toe Benchmarks
+Measures the speed of the game logic hot paths
+"""
+
+import argparse
+import asyncio
+import contextlib
+import gc
+import json
+import multiprocessing
+import os
+import platform
+import random
+import statistics
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from game_logic import Game, BoardCache, ZOBRIST
+from lobby import LobbyIndex
+import serverlog
+from serverlog import Logger, LEVELS, OFF, format_record
+import protocol
+from serverproc import spawn_server
+
+
+class FullScanGame(Game):
+    """Game that decides wins with the full-board check_win after every
+    move (the pre-incremental behaviour)"""
+
+    def _wins_through(self, mask, cell):
+        return self.check_win(self.get_current_player().symbol)
+
+
+class UncachedBoardGame(Game):
+    """Game that renders its board from the bitboards on every call
+    (the pre-cache behaviour)"""
+
+    def cached_board(self):
+        return BoardCache(self)
+
+
+def play_random_game(game, rng):
+    """
+    Play one game with random legal moves until it ends.
+
+    Args:
+        game: A freshly created Game instance
+        rng: random.Random used to pick moves
+
+    Returns:
+        Number of moves played
+    """
+    cells = [(r, c) for r in range(game.board_size)
+             for c in range(game.board_size)]
+    rng.shuffle(cells)
+
+    moves = 0
+    for row, col in cells:
+        player = game.get_current_player()
+        status, _ = game.make_move(player.conn, row, col)
+        moves += 1
+
+        if status in ("win", "draw"):
+            break
+
+    return moves
+
+
+def new_game(num_players, game_class=Game):
+    """Create a started game with dummy connections"""
+    game = game_class(0, num_players)
+    for i in range(num_players):
+        game.add_player(i, ("127.0.0.1", i))
+    return game
+
+
+def bench_moves(num_players, games=200, full_scan=False, seed=1234):
+    """Return moves per second for random games of the given size"""
+    rng = random.Random(seed)
+    total_moves = 0
+    start = time.perf_counter()
+
+    for _ in range(games):
+        game_class = FullScanGame if full_scan else Game
+        total_moves += play_random_game(new_game(num_players, game_class), rng)
+
+    elapsed = time.perf_counter() - start
+    return total_moves / elapsed
+
+
+def read_rss_kb(pid):
+    """Return the resident memory of a process in KB (Linux /proc)"""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def bench_connections(engine, count, host="127.0.0.1", port=5050):
+    """
+    Start server.py with the given engine, open `count` idle connections
+    and report the accept rate and the server's resident memory.
+
+    Returns:
+        dict with connections opened, accept rate and RSS before/after
+    """
+    sockets = []
+    with spawn_server(engine, host, port, log_level=None, settle=0.2) as server:
+        rss_idle = read_rss_kb(server.pid)
+        try:
+            start = time.perf_counter()
+            for _ in range(count):
+                try:
+                    sockets.append(socket.create_connection((host, port)))
+                except OSError:
+                    break
+
+            # Round trip on the last connection so every accept was processed
+            if sockets:
+                sockets[-1].sendall(b"LIST\n")
+                sockets[-1].recv(1024)
+            elapsed = time.perf_counter() - start
+            time.sleep(0.5)
+
+            return {
+                "engine": engine,
+                "connections": len(sockets),
+                "accepts_per_sec": len(sockets) / elapsed,
+                "rss_idle_kb": rss_idle,
+                "rss_loaded_kb": read_rss_kb(server.pid),
+            }
+        finally:
+            for sock in sockets:
+                sock.close()
+
+
+def bench_scaling(engine, workers, clients, games, host="127.0.0.1", port=5060):
+    """
+    Start server.py with `workers` worker processes and drive it with
+    `clients` loadtest.py processes in parallel (one load generator
+    process saturates long before a multi-core server does).
+
+    Returns:
+        dict with total games, moves, errors and moves/sec
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    # One second for every worker to bind
+    with spawn_server(engine, host, port, "--workers", str(workers), settle=1.0):
+        loads = [
+            subprocess.Popen(
+                [sys.executable, "loadtest.py", "--host", host,
+                 "--port", str(port), "--games", str(games // clients),
+                 "--connect-burst", "0", "--seed", str(1234 + i)],
+                cwd=here, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+            )
+            for i in range(clients)
+        ]
+        results = [json.loads(load.communicate()[0])["results"] for load in loads]
+
+    elapsed = max(result["elapsed_sec"] for result in results)
+    moves = sum(result["moves"] for result in results)
+    return {
+        "engine": engine,
+        "workers": workers,
+        "games": sum(result["games"] for result in results),
+        "moves": moves,
+        "errors": sum(result["errors"] for result in results),
+        "moves_per_sec": moves / elapsed,
+    }
+
+
+async def find_game(reader, writer, flow, num_players, delay, rng):
+    """
+    One player looking for a game after `delay` seconds, either with a
+    single QUICKPLAY or by LIST + JOIN of a random listed game (LIST
+    again when the join loses a race, CREATE when nothing is listed).
+
+    Returns:
+        (seconds from the first request to the game's BOARD,
+         requests sent, joins that failed)
+    """
+    await asyncio.sleep(delay)
+    start = time.perf_counter()
+    requests, failures = 1, 0
+    if flow == "quickplay":
+        writer.write(f"QUICKPLAY {num_players}\n".encode())
+    else:
+        writer.write(f"LIST players={num_players}\n".encode())
+
+    while True:
+        line = (await reader.readline()).decode().strip()
+        if not line:
+            raise ConnectionError("server closed the connection")
+        if line == "BOARD":
+            return time.perf_counter() - start, requests, failures
+
+        if line.startswith("GAMES"):
+            ids = [entry.split(":")[0] for entry in line.split()[1:]
+                   if not entry.startswith("next:")]
+            message = f"JOIN {rng.choice(ids)}" if ids else f"CREATE {num_players}"
+        elif line in ("Game is full", "Game already started") or line.endswith("not found"):
+            failures += 1
+            message = f"LIST players={num_players}"
+        else:
+            continue
+        writer.write((message + "\n").encode())
+        requests += 1
+
+
+async def run_matchmaking(host, port, flow, clients, num_players, spread,
+                          timeout, seed):
+    """Connect every client first, then let them all look for a game"""
+    streams = []
+    for start in range(0, clients, 500):
+        streams += await asyncio.gather(
+            *(asyncio.open_connection(host, port)
+              for _ in range(min(500, clients - start))))
+
+    rng = random.Random(seed)
+    tasks = [asyncio.ensure_future(find_game(reader, writer, flow, num_players,
+                                             rng.uniform(0, spread),
+                                             random.Random(rng.random())))
+             for reader, writer in streams]
+    start = time.perf_counter()
+    done, pending = await asyncio.wait(tasks, timeout=timeout)
+    elapsed = time.perf_counter() - start
+    for task in pending:
+        task.cancel()
+    for _, writer in streams:
+        writer.close()
+
+    return [task.result() for task in done if not task.exception()], elapsed
+
+
+def bench_matchmaking(flow, clients, engine="asyncio", num_players=2,
+                      spread=0.0, timeout=20.0, host="127.0.0.1", port=5070,
+                      seed=1234):
+    """
+    Start server.py and send a burst of `clients` players looking for
+    a game (arrivals spread evenly over `spread` seconds).
+
+    Returns:
+        dict with players seated in a started game, time-to-start
+        percentiles, requests per player and failed joins
+    """
+    with spawn_server(engine, host, port):
+        results, elapsed = asyncio.run(run_matchmaking(
+            host, port, flow, clients, num_players, spread, timeout, seed))
+
+    times = sorted(result[0] for result in results)
+    def pct(q):
+        return times[min(len(times) - 1, int(q * len(times)))] if times else None
+
+    return {
+        "flow": flow,
+        "started": len(results),
+        "p50": pct(0.50),
+        "p99": pct(0.99),
+        "last": times[-1] if times else None,
+        "requests": sum(result[1] for result in results) / max(1, len(results)),
+        "failed_joins": sum(result[2] for result in results),
+    }
+
+
+# A drawn 3x3 game: every move is broadcast and none ends it early
+DRAWN_GAME = [(0, 0), (0, 1), (0, 2), (1, 1), (1, 0), (1, 2), (2, 1), (2, 0), (2, 2)]
+
+
+async def read_until(reader, prefix):
+    """Read lines until one starts with prefix and return it"""
+    while True:
+        line = await reader.readline()
+        if not line:
+            raise ConnectionError("server closed the connection")
+        if line.startswith(prefix):
+            return line.decode().strip()
+
+
+async def spectate(reader, arrivals, complete, count):
+    """
+    Follow one game as a spectator, recording when each MOVED arrives.
+    complete[seq] resolves once all `count` spectators saw move seq.
+    """
+    while True:
+        line = await reader.readline()
+        if not line or line.startswith(b"DRAW"):
+            return
+        if line.startswith(b"MOVED"):
+            seq = int(line.split()[4])
+            arrivals[seq].append(time.monotonic())
+            if len(arrivals[seq]) == count:
+                complete[seq].set_result(None)
+
+
+async def watch_games(host, port, count, games, results):
+    """
+    Spectator process: watch each game id taken from games with `count`
+    connections, and put (seq, arrival times) on results once all of
+    them received move seq.
+    """
+    loop = asyncio.get_running_loop()
+    streams = []
+    for start in range(0, count, 500):
+        streams += await asyncio.gather(
+            *(asyncio.open_connection(host, port)
+              for _ in range(min(500, count - start))))
+    for reader, writer in streams:
+        writer.write(b"HELLO DELTA\n")
+        await read_until(reader, b"HELLO")
+    results.put("ready")
+
+    while True:
+        game_id = await loop.run_in_executor(None, games.get)
+        if game_id is None:
+            break
+        for _, writer in streams:
+            writer.write(f"WATCH {game_id}\n".encode())
+        await asyncio.gather(*(read_until(reader, b"BOARD") for reader, _ in streams))
+        results.put("watching")
+
+        arrivals = {seq: [] for seq in range(1, len(DRAWN_GAME) + 1)}
+        complete = {seq: loop.create_future() for seq in arrivals}
+        watchers = [asyncio.ensure_future(spectate(reader, arrivals, complete, count))
+                    for reader, _ in streams]
+        for seq in arrivals:
+            await complete[seq]
+            results.put((seq, arrivals[seq]))
+        await asyncio.gather(*watchers)
+
+    for _, writer in streams:
+        writer.close()
+
+
+def spectator_process(host, port, count, games, results):
+    """Entry point of a spectator process"""
+    asyncio.run(watch_games(host, port, count, games, results))
+
+
+async def play_watched_games(host, port, rounds, processes, games, results):
+    """
+    Play `rounds` drawn games, each watched by the spectator processes.
+
+    Returns:
+        (player latencies, median spectator latencies,
+         last spectator latencies), one entry per move
+    """
+    loop = asyncio.get_running_loop()
+
+    async def collect():
+        """Wait for one result from every spectator process"""
+        return [await loop.run_in_executor(None, results.get) for _ in range(processes)]
+
+    players = [await asyncio.open_connection(host, port) for _ in range(2)]
+    for reader, writer in players:
+        writer.write(b"HELLO DELTA\n")
+        await read_until(reader, b"HELLO")
+    await collect()
+
+    player_times, median_times, last_times = [], [], []
+    (reader_a, writer_a), (reader_b, writer_b) = players
+    for _ in range(rounds):
+        writer_a.write(b"CREATE 2\n")
+        game_id = (await read_until(reader_a, b"CREATED")).split()[1]
+        writer_b.write(f"JOIN {game_id}\n".encode())
+        await read_until(reader_b, b"BOARD")
+        await read_until(reader_a, b"YOURTURN")
+        for _ in range(processes):
+            games.put(game_id)
+        await collect()
+
+        for i, (row, col) in enumerate(DRAWN_GAME):
+            seq = i + 1
+            writer = players[i % 2][1]
+            opponent = players[1 - i % 2][0]
+            start = time.monotonic()
+            writer.write(f"MOVE {row} {col}\n".encode())
+
+            # The next player's turn notice, or the draw after the last move
+            await read_until(opponent, b"DRAW" if seq == len(DRAWN_GAME) else b"YOURTURN")
+            player_times.append(time.monotonic() - start)
+
+            times = sorted(t for _, arrivals in await collect() for t in arrivals)
+            median_times.append(times[len(times) // 2] - start)
+            last_times.append(times[-1] - start)
+
+        await read_until(reader_a, b"DRAW")
+
+    for _, writer in players:
+        writer.close()
+    return player_times, median_times, last_times
+
+
+def bench_spectators(engine, spectators, rounds=5, processes=4,
+                     host="127.0.0.1", port=5080):
+    """
+    Start server.py and measure, per move of a watched game, how long
+    until the next player hears it is their turn and until the median
+    and the last spectator receive the move. Spectators are read by
+    `processes` separate processes, so the players' times do not wait
+    on reading them.
+
+    Returns:
+        (player latencies, median spectator latencies,
+         last spectator latencies), one entry per move
+    """
+    context = multiprocessing.get_context("spawn")
+    games, results = context.Queue(), context.Queue()
+    watchers = []
+    with spawn_server(engine, host, port):
+        try:
+            shares = [spectators // processes + (i < spectators % processes)
+                      for i in range(processes)]
+            watchers = [context.Process(target=spectator_process,
+                                        args=(host, port, share, games, results))
+                        for share in shares]
+            for watcher in watchers:
+                watcher.start()
+            return asyncio.run(play_watched_games(host, port, rounds, processes,
+                                                  games, results))
+        finally:
+            for _ in watchers:
+                games.put(None)
+            for watcher in watchers:
+                watcher.join(10)
+
+
+def bench_broadcast_bytes(num_players, games=50, seed=1234):
+    """
+    Count bytes sent to all players per move with full-board broadcasts
+    versus MOVED delta events.
+
+    Returns:
+        (full_bytes_per_move, delta_bytes_per_move)
+    """
+    rng = random.Random(seed)
+    full_bytes = delta_bytes = moves = 0
+
+    for _ in range(games):
+        game = new_game(num_players)
+        cells = [(r, c) for r in range(game.board_size)
+                 for c in range(game.board_size)]
+        rng.shuffle(cells)
+
+        for row, col in cells:
+            status, _ = game.make_move(game.get_current_player().conn, row, col)
+            board = game.get_board_string() + "\n"
+            moved = (f"MOVED {row} {col} {game.get_cell(row, col)} "
+                     f"{game.move_count}\n")
+            full_bytes += len(board.encode("utf-8")) * len(game.players)
+            delta_bytes += len(moved.encode("utf-8")) * len(game.players)
+            moves += 1
+            if status in ("win", "draw"):
+                break
+
+    return full_bytes / moves, delta_bytes / moves
+
+
+def bench_lobby(total_games, waiting_games, lists=1000, page_size=50):
+    """
+    Time LIST over a registry of mostly started/finished games:
+    scanning every game (the old handle_list) versus a LobbyIndex page.
+
+    Returns:
+        (scan_seconds_per_list, index_seconds_per_list)
+    """
+    games = {}
+    lobby = LobbyIndex()
+    waiting_every = max(1, total_games // waiting_games)
+
+    for game_id in range(1, total_games + 1):
+        game = Game(game_id, 2)
+        game.add_player(0, None)
+        if game_id % waiting_every == 0:
+            lobby.add(game)
+        else:
+            game.add_player(1, None)
+        games[game_id] = game
+
+    start = time.perf_counter()
+    for _ in range(lists):
+        [f"{game_id}:{game.num_players}:{len(game.players)}"
+         for game_id, game in games.items() if game.is_waiting()]
+    scan = (time.perf_counter() - start) / lists
+
+    start = time.perf_counter()
+    for _ in range(lists):
+        page, _ = lobby.page(limit=page_size)
+        [f"{game.game_id}:{game.num_players}:{len(game.players)}"
+         for game in page]
+    index = (time.perf_counter() - start) / lists
+
+    return scan, index
+
+
+class NullSocket:
+    """Stand-in client socket that discards everything sent to it"""
+
+    def send(self, data, flags=0):
+        return len(data)
+
+    def close(self):
+        pass
+
+
+def null_connection():
+    """Return a server Connection backed by a NullSocket"""
+    from server import Connection
+    return Connection(NullSocket(), None)
+
+
+@contextlib.contextmanager
+def quiet_log():
+    """Switch the shared server logger off for the duration"""
+    level = serverlog.log.level
+    serverlog.log.level = OFF
+    try:
+        yield
+    finally:
+        serverlog.log.level = level
+
+
+class PrintLogger(Logger):
+    """Logger that formats and writes on the calling thread, like the
+    print() calls it replaced"""
+
+    def _emit(self, category, message, args):
+        print(format_record(category, message, args), file=self.stream)
+
+
+def bench_logging(mode, num_players=2, games=2000, seed=1234):
+    """
+    Play games through an in-process server with the given logging mode.
+    Measures the CPU time of the thread running the commands (the request
+    hot path) and of the whole process (the log writer thread included,
+    queue drained at the end).
+
+    Args:
+        mode: "print" (synchronous) or a serverlog level name
+        num_players: Players per game
+        games: Number of games played
+
+    Returns:
+        (request thread seconds per MOVE,
+         process seconds per command, records dropped)
+    """
+    import server as server_module
+    from server import TicTacToeServer
+
+    rng = random.Random(seed)
+    commands = moves = 0
+    request_time = 0.0
+
+    with open(os.devnull, "w") as devnull:
+        if mode == "print":
+            logger = PrintLogger(stream=devnull)
+        else:
+            logger = Logger(level=LEVELS[mode], stream=devnull)
+        shared = server_module.log
+        server_module.log = logger
+        try:
+            server = TicTacToeServer()
+            start = time.process_time()
+            for _ in range(games):
+                conns = [null_connection() for _ in range(num_players)]
+                server.handle_command(conns[0], None, f"CREATE {num_players}")
+                game = conns[0].session.game
+                for conn in conns[1:]:
+                    server.handle_command(conn, None, f"JOIN {game.game_id}")
+                commands += num_players
+
+                cells = [(r, c) for r in range(game.board_size)
+                         for c in range(game.board_size)]
+                rng.shuffle(cells)
+                for row, col in cells:
+                    player = game.get_current_player()
+                    if player is None:
+                        break
+                    message = f"MOVE {row} {col}"
+                    thread_start = time.thread_time()
+                    server.handle_command(player.conn, None, message)
+                    request_time += time.thread_time() - thread_start
+                    moves += 1
+            commands += moves
+            logger.flush(timeout=60.0)
+            elapsed = time.process_time() - start
+        finally:
+            server_module.log = shared
+
+    return request_time / moves, elapsed / commands, logger.dropped
+
+
+def drain_socket(sock):
+    """Read and discard everything until the peer closes"""
+    try:
+        while sock.recv(65536):
+            pass
+    except OSError:
+        pass
+    sock.close()
+
+
+def bench_slow_client(stalled, num_players=13, games=20,
+                      max_outbound=64 * 1024, seed=1234):
+    """
+    Play games through an in-process server over real socket pairs and
+    time every MOVE command (including its broadcast) made by players
+    that keep reading. With `stalled`, one seat per game never reads
+    its socket; its kernel buffers are kept small so they fill early
+    in the game.
+
+    Returns:
+        (MOVE latencies of reading players in seconds,
+         clients dropped as too slow)
+    """
+    from server import TicTacToeServer, Connection
+
+    server = TicTacToeServer(max_outbound=max_outbound)
+    server.outbound.start()
+    rng = random.Random(seed)
+    latencies = []
+
+    with quiet_log():
+        for _ in range(games):
+            conns, stalled_conn, stalled_end = [], None, None
+            for i in range(num_players):
+                server_end, client_end = socket.socketpair()
+                conn = Connection(server_end, None, server.outbound, max_outbound)
+                conns.append(conn)
+                if stalled and i == num_players - 1:
+                    server_end.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)
+                    client_end.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+                    stalled_conn, stalled_end = conn, client_end
+                else:
+                    threading.Thread(target=drain_socket, args=(client_end,),
+                                     daemon=True).start()
+
+            server.handle_command(conns[0], None, f"CREATE {num_players}")
+            game = conns[0].session.game
+            for conn in conns[1:]:
+                server.handle_command(conn, None, f"JOIN {game.game_id}")
+
+            cells = [(r, c) for r in range(game.board_size)
+                     for c in range(game.board_size)]
+            rng.shuffle(cells)
+            for row, col in cells:
+                player = game.get_current_player()
+                if player is None or game.ended:
+                    break
+                message = f"MOVE {row} {col}"
+                start = time.perf_counter()
+                server.handle_command(player.conn, None, message)
+                if player.conn is not stalled_conn:
+                    latencies.append(time.perf_counter() - start)
+
+                # What the dropped client's reader thread would do
+                if stalled_conn is not None and stalled_conn.closed:
+                    server.disconnect_client(stalled_conn, None)
+                    stalled_conn = None
+
+            for conn in conns:
+                conn.close()
+            if stalled_end is not None:
+                stalled_end.close()
+
+    return latencies, server.metrics.slow_clients.value
+
+
+def bench_soak(total_games, report_every=100000, grace=0.0):
+    """
+    Play many short 2-player games through an in-process server with
+    finished-game eviction enabled and sample resident memory.
+
+    Returns:
+        list of (games_completed, rss_kb, games_registered, archived)
+    """
+    from server import TicTacToeServer
+
+    server = TicTacToeServer(finished_grace=grace, archive_size=10000)
+    moves = ["MOVE 0 0", "MOVE 1 0", "MOVE 0 1", "MOVE 1 1", "MOVE 0 2"]
+    samples = []
+
+    with quiet_log():
+        for done in range(1, total_games + 1):
+            first, second = null_connection(), null_connection()
+            server.handle_command(first, None, "CREATE 2")
+            server.handle_command(second, None,
+                                  f"JOIN {first.session.game.game_id}")
+            for i, move in enumerate(moves):
+                server.handle_command(first if i % 2 == 0 else second,
+                                      None, move)
+
+            if done % 1000 == 0:
+                server.reaper.reap()
+            if done % report_every == 0:
+                samples.append((done, read_rss_kb(os.getpid()),
+                                len(server.games), len(server.reaper.archive)))
+
+    return samples
+
+
+def bench_move_path(num_players=13, games=200, seed=1234, metrics=True):
+    """
+    Time handle_command("MOVE r c") in-process, including the broadcast
+    to every player (through discarding sockets). Uses process CPU time
+    so that other load on the machine does not skew the comparison.
+
+    Returns:
+        Average seconds per MOVE command
+    """
+    from server import TicTacToeServer
+
+    server = TicTacToeServer(metrics=metrics)
+    rng = random.Random(seed)
+    elapsed = 0.0
+    moves = 0
+
+    with quiet_log():
+        for _ in range(games):
+            conns = [null_connection() for _ in range(num_players)]
+            server.handle_command(conns[0], None, f"CREATE {num_players}")
+            game = conns[0].session.game
+            for conn in conns[1:]:
+                server.handle_command(conn, None, f"JOIN {game.game_id}")
+
+            cells = [(r, c) for r in range(game.board_size)
+                     for c in range(game.board_size)]
+            rng.shuffle(cells)
+
+            for row, col in cells:
+                player = game.get_current_player()
+                if player is None:
+                    break
+                message = f"MOVE {row} {col}"
+                start = time.process_time()
+                server.handle_command(player.conn, None, message)
+                elapsed += time.process_time() - start
+                moves += 1
+
+    return elapsed / moves
+
+
+def time_per_op(func, items, repeat=5):
+    """Return the best-of-repeat seconds per call of func over items"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            func(item)
+        best = min(best, (time.perf_counter() - start) / len(items))
+    return best
+
+
+def bench_protocol_codec(num_players=13, games=200):
+    """
+    Time encoding and decoding of the hot messages in both protocols,
+    on mid-game boards.
+
+    Returns:
+        list of (message, direction, text_seconds, binary_seconds)
+    """
+    positions = midgame_positions(num_players, games, game_class=UncachedBoardGame)
+    moves = [(game, row, col) for game in positions
+             for row, col in [divmod(game.move_count, game.board_size)]]
+    symbol = positions[0].players[0].symbol
+
+    text_moves = [f"MOVE {row} {col}" for _, row, col in moves]
+    frame_moves = [protocol.encode_command("MOVE", row, col)[2:]
+                   for _, row, col in moves]
+    text_boards = [game.get_board_string() for game in positions]
+    frame_boards = [protocol.encode_board(game)[2:] for game in positions]
+
+    def parse_move(message):
+        parts = message.split()
+        return parts[0], int(parts[1]), int(parts[2])
+
+    def parse_board(message):
+        return [row.split(" ") for row in message.split("\n")[1:]]
+
+    return [
+        ("BOARD", "encode",
+         time_per_op(lambda game: (game.get_board_string() + "\n").encode("utf-8"),
+                     positions),
+         time_per_op(protocol.encode_board, positions)),
+        ("BOARD", "decode",
+         time_per_op(parse_board, text_boards),
+         time_per_op(protocol.decode_event, frame_boards)),
+        ("MOVED", "encode",
+         time_per_op(lambda move: (f"MOVED {move[1]} {move[2]} {symbol} "
+                                   f"{move[0].move_count}\n").encode("utf-8"),
+                     moves),
+         time_per_op(lambda move: protocol.encode_moved(
+             move[1], move[2], symbol, move[0].move_count), moves)),
+        ("MOVE", "decode",
+         time_per_op(parse_move, text_moves),
+         time_per_op(protocol.decode_command, frame_moves)),
+    ]
+
+
+def bench_board_serialization(num_players=13, games=200, repeat=5):
+    """
+    Time rendering the board after every move of complete games, as the
+    server does for clients without DELTA: the UTF-8 text board and the
+    binary BOARD frame. The cost of the moves themselves is measured
+    separately and subtracted.
+
+    Returns:
+        dict: (game class name, "text" or "binary") - seconds per move
+    """
+    sequences = move_sequences(num_players, games)
+    serializers = {
+        "none": None,
+        "text": lambda game: game.get_board_bytes(),
+        "binary": protocol.encode_board,
+    }
+
+    def play(game_class, serialize):
+        """Best-of-repeat seconds per move, and the number of moves"""
+        best = float("inf")
+        for _ in range(repeat):
+            fresh = [new_game(num_players, game_class) for _ in sequences]
+            moves = 0
+            start = time.perf_counter()
+            for game, sequence in zip(fresh, sequences):
+                for row, col in sequence:
+                    moves += 1
+                    status, _ = game.make_move(game.players[game.current_turn].conn,
+                                               row, col)
+                    if serialize is not None:
+                        serialize(game)
+                    if status == "win" or status == "draw":
+                        break
+            best = min(best, (time.perf_counter() - start) / moves)
+        return best
+
+    results = {}
+    for game_class in (UncachedBoardGame, Game):
+        baseline = play(game_class, None)
+        for form in ("text", "binary"):
+            results[game_class.__name__, form] = play(game_class, serializers[form]) - baseline
+    return results
+
+
+# Win for the client (X) on a 3x3 board; the opponent (O) plays between
+CLIENT_MOVES = [(0, 0), (0, 1), (0, 2)]
+OPPONENT_MOVES = [(1, 0), (1, 1)]
+
+
+class ClientOutput:
+    """
+    Collects what a client process prints, with the time each chunk
+    arrived, so a benchmark can ask when some text appeared.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.text = ""
+        self.chunks = []            # (end offset in text, arrival time)
+        self.cursor = 0             # Searches start here
+        self.changed = threading.Condition()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        """Reader thread: timestamp every chunk as it arrives"""
+        while True:
+            data = os.read(self.stream.fileno(), 65536)
+            now = time.perf_counter()
+            with self.changed:
+                if data:
+                    self.text += data.decode("utf-8", errors="replace")
+                    self.chunks.append((len(self.text), now))
+                else:
+                    self.chunks.append((len(self.text), None))
+                self.changed.notify_all()
+            if not data:
+                return
+
+    def expect(self, text, timeout=10.0):
+        """
+        Wait for text to be printed after the previous match.
+
+        Returns:
+            perf_counter time of the chunk that completed it
+        """
+        deadline = time.monotonic() + timeout
+        with self.changed:
+            while True:
+                index = self.text.find(text, self.cursor)
+                if index >= 0:
+                    end = index + len(text)
+                    self.cursor = end
+                    return next(at for offset, at in self.chunks if offset >= end)
+                remaining = deadline - time.monotonic()
+                if (self.chunks and self.chunks[-1][1] is None) or remaining <= 0:
+                    raise RuntimeError(f"client never printed {text!r}")
+                self.changed.wait(remaining)
+
+
+def bench_client(path, rounds, host="127.0.0.1", port=5000):
+    """
+    Drive client.py (or the client at path) through stdin/stdout
+    against server.py and a raw-socket opponent, timing how long each
+    kind of event takes to show on screen:
+        menu:   LIST typed -> menu prompt back
+        turn:   opponent's MOVE sent -> "Row:" prompt
+        render: own move typed -> board printed
+        end:    winning move typed -> menu prompt after the result
+
+    Returns:
+        dict: event name - list of seconds
+    """
+    client = None
+    results = {"menu": [], "turn": [], "render": [], "end": []}
+    with spawn_server("threaded", host, port):
+        try:
+            client = subprocess.Popen(
+                [sys.executable, "-u", path, "--host", host, "--port", str(port)],
+                cwd=os.path.dirname(os.path.abspath(path)),
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT
+            )
+            output = ClientOutput(client.stdout)
+
+            def type_line(text):
+                client.stdin.write((text + "\n").encode())
+                client.stdin.flush()
+                return time.perf_counter()
+
+            output.expect("Choose option: ")
+            for _ in range(rounds):
+                start = type_line("1")
+                results["menu"].append(output.expect("Choose option: ") - start)
+
+                type_line("2")
+                output.expect("(2-13)? ")
+                type_line("2")
+                output.expect("(0-1)? ")
+                type_line("0")
+                output.expect("Game ID: ")
+                begin = output.cursor
+                output.expect("\n")
+                game_id = int(output.text[begin:output.cursor])
+
+                asyncio.run(play_client_round(output, type_line, results,
+                                              host, port, game_id))
+
+            type_line("4")
+            client.wait(timeout=10)
+        finally:
+            if client is not None and client.poll() is None:
+                client.kill()
+                client.wait()
+    return results
+
+
+async def play_client_round(output, type_line, results, host, port, game_id):
+    """
+    Join the client's game as its opponent and play it to the client's
+    win. Waiting on the client blocks the event loop, which only
+    serves this opponent: its moves are written before each wait.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(f"JOIN {game_id}\n".encode())
+        await read_until(reader, b"JOINED")
+        output.expect("  Row: ")
+
+        for turn, (row, col) in enumerate(CLIENT_MOVES):
+            type_line(str(row))
+            output.expect("  Col: ")
+            start = type_line(str(col))
+            if turn < len(OPPONENT_MOVES):
+                results["render"].append(output.expect("Current Board:") - start)
+                await read_until(reader, b"YOURTURN")
+                start = time.perf_counter()
+                writer.write("MOVE {} {}\n".format(*OPPONENT_MOVES[turn]).encode())
+                results["turn"].append(output.expect("  Row: ") - start)
+            else:
+                output.expect("CONGRATULATIONS")
+                results["end"].append(output.expect("Choose option: ") - start)
+        await read_until(reader, b"LOSE")
+    finally:
+        writer.close()
+
+
+class CountingSocket(NullSocket):
+    """NullSocket that counts the bytes sent to it"""
+
+    def __init__(self):
+        self.sent = 0
+
+    def send(self, data, flags=0):
+        self.sent += len(data)
+        return len(data)
+
+
+def bench_protocol_bandwidth(capabilities, num_players=13, games=20, seed=1234):
+    """
+    Play complete games through the server in-process and count the
+    bytes each side puts on the wire, HELLO handshake included.
+
+    Args:
+        capabilities: HELLO capabilities, e.g. ["BINARY/1", "DELTA"]
+
+    Returns:
+        (server_to_client_bytes_per_game, client_to_server_bytes_per_game)
+    """
+    from server import Connection, TicTacToeServer
+
+    server = TicTacToeServer(metrics=False)
+    rng = random.Random(seed)
+    sockets = []
+    received = 0
+
+    def command(conn, *args):
+        # Send one command in the connection's protocol (HELLO is
+        # always text: the switch happens after its reply)
+        nonlocal received
+        if conn.binary:
+            data = protocol.encode_command(*args)
+            received += len(data)
+            server.handle_frame(conn, None, data[2:])
+        else:
+            message = " ".join(map(str, args))
+            received += len(message) + 1
+            server.handle_command(conn, None, message)
+
+    with quiet_log():
+        for _ in range(games):
+            conns = []
+            for _ in range(num_players):
+                sock = CountingSocket()
+                sockets.append(sock)
+                conn = Connection(sock, None)
+                if capabilities:
+                    command(conn, "HELLO", *capabilities)
+                conns.append(conn)
+
+            command(conns[0], "CREATE", num_players)
+            game = conns[0].session.game
+            for conn in conns[1:]:
+                command(conn, "JOIN", game.game_id)
+
+            cells = [(r, c) for r in range(game.board_size)
+                     for c in range(game.board_size)]
+            rng.shuffle(cells)
+            for row, col in cells:
+                player = game.get_current_player()
+                if player is None:
+                    break
+                command(player.conn, "MOVE", row, col)
+
+    sent = sum(sock.sent for sock in sockets)
+    return sent / games, received / games
+
+
+def bench_bot(num_players, positions=10, move_time=0.1, seed=1234):
+    """
+    Let a bot search positions a few moves into random games.
+
+    Returns:
+        (latencies, nodes, depths), one entry per searched position
+    """
+    from bot import BotPlayer, Position
+
+    rng = random.Random(seed + num_players)
+    latencies, nodes, depths = [], [], []
+
+    while len(latencies) < positions:
+        game = new_game(num_players)
+        cells = [(r, c) for r in range(game.board_size)
+                 for c in range(game.board_size)]
+        rng.shuffle(cells)
+        for row, col in cells[:rng.randrange(num_players + 1)]:
+            game.make_move(game.get_current_player().conn, row, col)
+        if game.ended:
+            continue
+
+        bot = BotPlayer(game.get_current_player().symbol, move_time)
+        start = time.perf_counter()
+        bot.choose_move(Position.from_game(game))
+        latencies.append(time.perf_counter() - start)
+        nodes.append(bot.nodes)
+        depths.append(bot.depth)
+
+    return latencies, nodes, depths
+
+
+def random_positions(count, seed=1234):
+    """
+    Yield (game, board) for distinct random positions on every board
+    size; board is the position itself as (size, symbol masks).
+    """
+    rng = random.Random(seed)
+    seen = set()
+    while len(seen) < count:
+        num_players = rng.randrange(2, 14)
+        game = new_game(num_players)
+        cells = [(r, c) for r in range(game.board_size)
+                 for c in range(game.board_size)]
+        rng.shuffle(cells)
+        for row, col in cells[:rng.randrange(1, len(cells))]:
+            status, _ = game.make_move(game.get_current_player().conn, row, col)
+            if status != "success":
+                break
+        board = (game.board_size, tuple(game.symbol_masks))
+        if board not in seen:
+            seen.add(board)
+            yield game, board
+
+
+def bench_zobrist_collisions(count=200000, bits=(64, 32, 24), seed=1234):
+    """
+    Count key collisions among distinct random positions, for the full
+    key and for its low bits (where collisions become measurable).
+
+    Returns:
+        list of (bits, collisions, expected collisions for random keys)
+    """
+    keys = {width: {} for width in bits}
+    collisions = dict.fromkeys(bits, 0)
+    for game, board in random_positions(count, seed):
+        key = game.zobrist_key
+        for width in bits:
+            short = key & ((1 << width) - 1)
+            if keys[width].setdefault(short, board) != board:
+                collisions[width] += 1
+
+    return [(width, collisions[width], count * (count - 1) / 2 ** (width + 1))
+            for width in bits]
+
+
+def bench_zobrist_update(num_players, games=200):
+    """
+    Time the incremental key update per move (one XOR, as in make_move)
+    against recomputing the key from the board after every move.
+
+    Returns:
+        (incremental_seconds_per_move, recompute_seconds_per_move)
+    """
+    size = num_players + 1
+    keys, symmetry_keys = ZOBRIST[size]
+    sequences = move_sequences(num_players, games)
+    moves = [(cell_row * size + cell_col, i % num_players)
+             for sequence in sequences
+             for i, (cell_row, cell_col) in enumerate(sequence)]
+
+    start = time.perf_counter()
+    position_keys = 0
+    for cell, index in moves:
+        position_keys ^= symmetry_keys[cell][index]
+    incremental = (time.perf_counter() - start) / len(moves)
+
+    elapsed = 0.0
+    for sequence in sequences[:max(1, games // 20)]:
+        masks = [0] * num_players
+        start = time.perf_counter()
+        for i, (row, col) in enumerate(sequence):
+            masks[i % num_players] |= 1 << (row * size + col)
+            key = 0
+            for index, mask in enumerate(masks):
+                while mask:
+                    low = mask & -mask
+                    key ^= keys[low.bit_length() - 1][index]
+                    mask ^= low
+        elapsed += time.perf_counter() - start
+    recompute = elapsed / (max(1, games // 20) * size * size)
+
+    return incremental, recompute
+
+
+def bench_journal_throughput(mode, events, fsync=False):
+    """
+    Append MOVE records to a journal in a temporary directory until
+    every one is on disk.
+
+    Args:
+        mode: "group" (Journal, one write per commit interval) or
+              "write" (one os.write per event, like journaling inline)
+        events: Number of records
+        fsync: fsync after every write
+
+    Returns:
+        (events per second, write calls)
+    """
+    from journal import Journal, RECORDS, MOVE
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.journal")
+        if mode == "group":
+            journal = Journal(path, fsync)
+            journal.start()
+            start = time.perf_counter()
+            for i in range(events):
+                journal.move(i, 1, 1)
+            journal.close()
+            elapsed = time.perf_counter() - start
+            writes = journal.commits
+        else:
+            layout = RECORDS[MOVE]
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            start = time.perf_counter()
+            for i in range(events):
+                os.write(fd, layout.pack(MOVE, i, 1, 1))
+                if fsync:
+                    os.fsync(fd)
+            elapsed = time.perf_counter() - start
+            os.close(fd)
+            writes = events
+
+    return events / elapsed, writes
+
+
+def write_recovery_journal(path, games, seed=1234):
+    """
+    Write a journal holding `games` in-progress games of random sizes,
+    each with every seat taken and a few random moves played.
+
+    Returns:
+        Number of records written
+    """
+    from journal import Journal
+
+    rng = random.Random(seed)
+    journal = Journal(path)
+    journal.open()
+    for game_id in range(1, games + 1):
+        num_players = rng.randint(2, 13)
+        game = Game(game_id, num_players)
+        journal.create(game_id, num_players)
+        for index in range(num_players):
+            game.add_player(index, None)
+            journal.join(game_id, index, rng.getrandbits(63) + 1)
+
+        size = game.board_size
+        cells = rng.sample(range(size * size), rng.randint(0, size))
+        for cell in cells:
+            row, col = divmod(cell, size)
+            if game.make_move(game.get_current_player().conn, row, col)[0] != "success":
+                break
+            journal.move(game_id, row, col)
+    records = journal.records
+    journal.close()
+    return records
+
+
+def bench_journal_recovery(games):
+    """
+    Time a server start that replays a journal of `games`
+    in-progress games.
+
+    Returns:
+        (journal bytes, records, seconds to recover, games recovered)
+    """
+    from server import TicTacToeServer
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.journal")
+        records = write_recovery_journal(path, games)
+        size = os.path.getsize(path)
+
+        gc.collect()
+        with quiet_log():
+            start = time.perf_counter()
+            server = TicTacToeServer(metrics=False, journal_path=path)
+            elapsed = time.perf_counter() - start
+        recovered = len(server.games)
+        server.journal.close()
+        server.bot_pool.shutdown()
+
+    return size, records, elapsed, recovered
+
+
+def populate_server(server, games, seed=1234):
+    """
+    Register `games` games of random sizes in an in-process server:
+    about one in five still waiting for players, the rest started with
+    a few random moves played.
+    """
+    from server import AwayConnection
+
+    rng = random.Random(seed)
+    for game_id in range(1, games + 1):
+        num_players = rng.randint(2, 13)
+        game = Game(game_id, num_players)
+        seats = num_players if rng.random() < 0.8 else rng.randint(1, num_players - 1)
+        for _ in range(seats):
+            seat = AwayConnection()
+            game.add_player(seat, seat.addr)
+            game.players[-1].token = rng.getrandbits(63) + 1
+
+        size = game.board_size
+        if game.started:
+            for cell in rng.sample(range(size * size), rng.randint(0, size)):
+                row, col = divmod(cell, size)
+                if game.make_move(game.get_current_player().conn, row, col)[0] != "success":
+                    break
+        server.games[game_id] = game
+    server.next_game_id = games + 1
+
+
+def bench_snapshot(games):
+    """
+    Save a snapshot of `games` games and load it in a new server.
+
+    Returns:
+        (snapshot bytes, seconds to write, seconds to load, games loaded)
+    """
+    from server import TicTacToeServer
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.snapshot")
+        with quiet_log():
+            server = TicTacToeServer(metrics=False, snapshot_path=path)
+            populate_server(server, games)
+
+            gc.collect()
+            _, size, write_time = server.snapshots.save()
+
+            gc.collect()
+            start = time.perf_counter()
+            loaded = TicTacToeServer(metrics=False, snapshot_path=path)
+            load_time = time.perf_counter() - start
+
+        server.bot_pool.shutdown()
+        loaded.bot_pool.shutdown()
+
+    return size, write_time, load_time, len(loaded.games)
+
+
+def measure_game_memory(num_players, active, count=2000):
+    """
+    Measure the bytes allocated per game with tracemalloc.
+
+    Args:
+        num_players: Players per game
+        active: If True, fill every seat, render the board (as the
+                server does on start) and play one move per player;
+                otherwise only the creator has joined (waiting game)
+        count: Number of games allocated for the average
+
+    Returns:
+        Average bytes per game
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+
+    games = []
+    for game_id in range(count):
+        game = Game(game_id, num_players)
+        for seat in range(num_players if active else 1):
+            game.add_player(seat, None)
+        if active:
+            game.get_board_bytes()
+            for col in range(num_players):
+                game.make_move(game.get_current_player().conn, col % 2, col)
+        games.append(game)
+
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used / count
+
+
+# ---------------------------------------------------------------------------
+# Micro-benchmark suite for the game_logic hot paths
+# ---------------------------------------------------------------------------
+
+SUITE_GAMES = 200       # Games prepared per timed run
+SUITE_SEED = 1234       # Seed for every move sequence
+
+
+def move_sequences(num_players, games, seed=SUITE_SEED):
+    """Return fixed-seed shuffled cell orders, one per game"""
+    rng = random.Random(seed * 100 + num_players)
+    size = num_players + 1
+    cells = [(r, c) for r in range(size) for c in range(size)]
+    sequences = []
+    for _ in range(games):
+        rng.shuffle(cells)
+        sequences.append(list(cells))
+    return sequences
+
+
+def midgame_positions(num_players, games, seed=SUITE_SEED, game_class=Game):
+    """Return started games played halfway (or until they end)"""
+    positions = []
+    for sequence in move_sequences(num_players, games, seed):
+        game = new_game(num_players, game_class)
+        for row, col in sequence[:len(sequence) // 2]:
+            status, _ = game.make_move(game.get_current_player().conn, row, col)
+            if status != "success":
+                break
+        positions.append(game)
+    return positions
+
+
+def time_make_move(num_players, games):
+    """Time make_move over complete fixed-seed games"""
+    sequences = move_sequences(num_players, games)
+    fresh = [new_game(num_players) for _ in range(games)]
+    ops = 0
+    start = time.perf_counter()
+    for game, sequence in zip(fresh, sequences):
+        for row, col in sequence:
+            ops += 1
+            status, _ = game.make_move(game.players[game.current_turn].conn,
+                                       row, col)
+            if status == "win" or status == "draw":
+                break
+    return ops, time.perf_counter() - start
+
+
+def time_check_win(num_players, games):
+    """Time the full-board check_win for every symbol on mid-game boards"""
+    positions = midgame_positions(num_players, games)
+    symbols = [player.symbol for player in positions[0].players]
+    start = time.perf_counter()
+    for game in positions:
+        for symbol in symbols:
+            game.check_win(symbol)
+    return len(positions) * len(symbols), time.perf_counter() - start
+
+
+def time_board_string(num_players, games):
+    """Time get_board_string on mid-game boards"""
+    positions = midgame_positions(num_players, games)
+    start = time.perf_counter()
+    for game in positions:
+        game.get_board_string()
+    return len(positions), time.perf_counter() - start
+
+
+def time_add_player(num_players, games):
+    """Time add_player filling every seat of fresh games"""
+    fresh = [Game(i, num_players) for i in range(games)]
+    start = time.perf_counter()
+    for game in fresh:
+        for seat in range(num_players):
+            game.add_player(seat, None)
+    return games * num_players, time.perf_counter() - start
+
+
+def time_remove_player(num_players, games):
+    """Time remove_player emptying full started games in a fixed order"""
+    full = [new_game(num_players) for _ in range(games)]
+    rng = random.Random(SUITE_SEED + num_players)
+    orders = []
+    for _ in range(games):
+        order = list(range(num_players))
+        rng.shuffle(order)
+        orders.append(order)
+    start = time.perf_counter()
+    for game, order in zip(full, orders):
+        for seat in order:
+            game.remove_player(seat)
+    return games * num_players, time.perf_counter() - start
+
+
+SUITE = {
+    "make_move": time_make_move,
+    "check_win": time_check_win,
+    "get_board_string": time_board_string,
+    "add_player": time_add_player,
+    "remove_player": time_remove_player,
+}
+
+
+def run_suite_case(func, num_players, games, warmup, repeat):
+    """
+    Run one benchmark case with warm-up and repeated timing.
+
+    Returns:
+        dict with nanoseconds per operation: ns_per_op is the fastest
+        run (least disturbed by other load), plus median and max
+    """
+    for _ in range(warmup):
+        func(num_players, games)
+
+    # Like timeit, keep the garbage collector out of the timed runs
+    samples = []
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            ops, elapsed = func(num_players, games)
+        finally:
+            gc.enable()
+        samples.append(elapsed / ops * 1e9)
+
+    return {
+        "ns_per_op": round(min(samples), 1),
+        "median_ns": round(statistics.median(samples), 1),
+        "max_ns": round(max(samples), 1),
+        "repeat": repeat,
+    }
+
+
+def run_suite(args):
+    """Run every game_logic micro-benchmark and print/write JSON"""
+    results = {}
+    for name in args.cases:
+        for num_players in range(2, 14):
+            size = num_players + 1
+            key = f"{name}/{size}x{size}"
+            results[key] = run_suite_case(SUITE[name], num_players, args.games,
+                                          args.warmup, args.repeat)
+            print(f"{key:<24} {results[key]['ns_per_op']:>10.1f} ns/op",
+                  file=sys.stderr)
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "games": args.games,
+            "warmup": args.warmup,
+            "repeat": args.repeat,
+            "seed": SUITE_SEED,
+        },
+        "results": results,
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+def run_compare(args):
+    """
+    Compare two suite result files and flag regressions.
+    Exits with status 1 if any case got slower than the threshold.
+    """
+    with open(args.base) as f:
+        base = json.load(f)["results"]
+    with open(args.new) as f:
+        new = json.load(f)["results"]
+
+    regressions = 0
+    print(f"{'case':<24} | {'base ns':>10} | {'new ns':>10} | change")
+    print("-" * 60)
+
+    for key in sorted(base.keys() & new.keys()):
+        before = base[key]["ns_per_op"]
+        after = new[key]["ns_per_op"]
+        change = (after - before) / before * 100
+        flag = ""
+        if change > args.threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{key:<24} | {before:>10.1f} | {after:>10.1f} | "
+              f"{change:+6.1f}%{flag}")
+
+    for key in sorted(base.keys() ^ new.keys()):
+        print(f"{key:<24} | only in {'base' if key in base else 'new'}")
+
+    print(f"\n{regressions} regression(s) beyond {args.threshold:.0f}%")
+    if regressions:
+        sys.exit(1)
+
+
+def run_moves(args):
+    """Print moves/sec for every board size, full scan vs incremental"""
+    print(f"{'board':>6} | {'full scan':>12} | {'incremental':>12} | speedup")
+    print("-" * 50)
+
+    for num_players in range(2, 14):
+        size = num_players + 1
+        full = bench_moves(num_players, args.games, full_scan=True)
+        incremental = bench_moves(num_players, args.games)
+        print(f"{size:>3}x{size:<2} | {full:>12.0f} | {incremental:>12.0f} | "
+              f"{incremental / full:.2f}x")
+
+
+def run_connections(args):
+    """Print accept rate and server memory per engine and connection count"""
+    print(f"{'engine':>9} | {'conns':>6} | {'accepts/s':>10} | "
+          f"{'RSS idle':>10} | {'RSS loaded':>10} | per conn")
+    print("-" * 70)
+
+    for count in args.counts:
+        for engine in args.engines:
+            result = bench_connections(engine, count, port=args.port)
+            opened = result["connections"]
+            idle = result["rss_idle_kb"] or 0
+            loaded = result["rss_loaded_kb"] or 0
+            per_conn = (loaded - idle) * 1024 / opened if opened else 0
+            print(f"{engine:>9} | {opened:>6} | "
+                  f"{result['accepts_per_sec']:>10.0f} | {idle:>8} KB | "
+                  f"{loaded:>8} KB | {per_conn:.0f} B")
+
+
+def run_scaling(args):
+    """Print moves/sec for each worker count (multi-process server)"""
+    print(f"CPU cores: {os.cpu_count()}")
+    print(f"{'engine':>9} | {'workers':>7} | {'games':>6} | {'errors':>6} | "
+          f"{'moves/sec':>10} | speedup")
+    print("-" * 62)
+
+    for engine in args.engines:
+        base = None
+        for workers in args.workers:
+            result = bench_scaling(engine, workers, args.clients, args.games,
+                                   port=args.port)
+            base = base or result["moves_per_sec"]
+            print(f"{engine:>9} | {workers:>7} | {result['games']:>6} | "
+                  f"{result['errors']:>6} | {result['moves_per_sec']:>10.0f} | "
+                  f"{result['moves_per_sec'] / base:.2f}x")
+
+
+def run_broadcast(args):
+    """Print bytes on the wire per move, full board vs delta events"""
+    print(f"{'players':>7} | {'full board':>12} | {'delta':>8} | reduction")
+    print("-" * 48)
+
+    for num_players in args.players:
+        full, delta = bench_broadcast_bytes(num_players, args.games)
+        print(f"{num_players:>7} | {full:>10.0f} B | {delta:>6.0f} B | "
+              f"{full / delta:.1f}x")
+
+
+def run_lobby(args):
+    """Print LIST cost with a large history of games"""
+    scan, index = bench_lobby(args.games, args.waiting, args.lists)
+    print(f"{args.games} games, {args.waiting} waiting, page size 50")
+    print(f"  full scan: {scan * 1e6:>10.1f} us per LIST")
+    print(f"  index:     {index * 1e6:>10.1f} us per LIST")
+
+
+def run_slow_client(args):
+    """
+    Print MOVE latency of reading players with and without one player
+    per game that stopped reading.
+    """
+    print(f"{'game':>16} | {'moves':>6} | {'p50':>9} | {'p99':>9} | "
+          f"{'max':>9} | dropped")
+    print("-" * 72)
+    for stalled in (False, True):
+        latencies, dropped = bench_slow_client(stalled, args.players, args.games,
+                                               args.max_outbound)
+        latencies.sort()
+        p50 = latencies[len(latencies) // 2]
+        p99 = latencies[int(len(latencies) * 0.99)]
+        label = "one not reading" if stalled else "all reading"
+        print(f"{label:>16} | {len(latencies):>6} | {p50 * 1e6:>6.1f} us | "
+              f"{p99 * 1e6:>6.1f} us | {latencies[-1] * 1e6:>6.0f} us | {dropped}")
+
+
+def run_soak(args):
+    """Print memory while completing many games with eviction enabled"""
+    print(f"{'games':>9} | {'RSS':>10} | {'registered':>10} | archived")
+    print("-" * 48)
+    for done, rss, registered, archived in bench_soak(args.games, args.every):
+        print(f"{done:>9} | {rss:>7} KB | {registered:>10} | {archived}")
+
+
+def run_move_path(args):
+    """
+    Print the cost of one MOVE command through the server with metrics
+    collection off and on (best of --rounds interleaved runs each).
+    """
+    best = {False: float("inf"), True: float("inf")}
+    for _ in range(args.rounds):
+        for metrics in (False, True):
+            per_move = bench_move_path(args.players, args.games, metrics=metrics)
+            best[metrics] = min(best[metrics], per_move)
+
+    for metrics in (False, True):
+        label = "metrics on " if metrics else "metrics off"
+        print(f"{args.players}-player games, {label}: "
+              f"{best[metrics] * 1e6:.2f} us per MOVE "
+              f"({1 / best[metrics]:.0f} moves/sec)")
+    print(f"metrics overhead: {(best[True] / best[False] - 1) * 100:+.2f}%")
+
+
+def run_logging(args):
+    """
+    Print the server command cost for each logging mode
+    (best of --rounds interleaved runs each).
+    """
+    best = {mode: (float("inf"), float("inf"), 0) for mode in args.modes}
+    for _ in range(args.rounds):
+        for mode in args.modes:
+            request, process, dropped = bench_logging(mode, args.players,
+                                                      args.games)
+            best[mode] = (min(best[mode][0], request),
+                          min(best[mode][1], process), dropped)
+
+    print(f"{'mode':>7} | {'request thread':>14} | {'whole process':>13} | dropped")
+    print("-" * 54)
+    for mode in args.modes:
+        request, process, dropped = best[mode]
+        print(f"{mode:>7} | {request * 1e6:>8.2f} us/MOVE | "
+              f"{process * 1e6:>7.2f} us/cmd | {dropped}")
+
+
+def run_protocol(args):
+    """
+    Print encode/decode cost of the text and binary protocols and the
+    bytes on the wire per complete game in each protocol mode.
+    """
+    print(f"{args.players}-player games")
+    print(f"{'message':>7} | {'op':>6} | {'text':>9} | {'binary':>9} | speedup")
+    print("-" * 52)
+    for message, op, text, binary in bench_protocol_codec(args.players):
+        print(f"{message:>7} | {op:>6} | {text * 1e9:>6.0f} ns | "
+              f"{binary * 1e9:>6.0f} ns | {text / binary:.1f}x")
+
+    print()
+    print(f"{'protocol':>15} | {'server->client':>14} | {'client->server':>14} | "
+          f"vs text")
+    print("-" * 64)
+    base = None
+    for label, capabilities in (("text", []),
+                                ("text DELTA", ["DELTA"]),
+                                ("binary", ["BINARY/1"]),
+                                ("binary DELTA", ["BINARY/1", "DELTA"])):
+        sent, received = bench_protocol_bandwidth(capabilities, args.players,
+                                                  args.games)
+        if base is None:
+            base = sent + received
+        print(f"{label:>15} | {sent:>9.0f} B/gm | {received:>9.0f} B/gm | "
+              f"{(sent + received) / base * 100:>5.1f}%")
+
+
+def run_bot(args):
+    """Print bot search speed and move latency per board size"""
+    print(f"move time {args.move_time * 1000:.0f} ms, "
+          f"{args.positions} positions per size")
+    print(f"{'board':>6} | {'nodes/sec':>9} | {'depth':>5} | {'p50':>8} | {'max':>8}")
+    print("-" * 50)
+    for size in args.sizes:
+        latencies, nodes, depths = bench_bot(size - 1, args.positions,
+                                             args.move_time)
+        latencies.sort()
+        print(f"{size:>3}x{size:<2} | {sum(nodes) / sum(latencies):>9.0f} | "
+              f"{statistics.mean(depths):>5.1f} | "
+              f"{latencies[len(latencies) // 2] * 1000:>5.1f} ms | "
+              f"{latencies[-1] * 1000:>5.1f} ms")
+
+
+def run_zobrist(args):
+    """Print Zobrist key collision rates and update cost"""
+    print(f"{args.positions} distinct random positions (all board sizes)")
+    print(f"{'key bits':>8} | {'collisions':>10} | expected (random keys)")
+    print("-" * 46)
+    for width, collisions, expected in bench_zobrist_collisions(args.positions):
+        print(f"{width:>8} | {collisions:>10} | {expected:.3g}")
+
+    print(f"\n{'board':>6} | {'incremental':>11} | {'recompute':>10}")
+    print("-" * 36)
+    for num_players in range(2, 14):
+        size = num_players + 1
+        incremental, recompute = bench_zobrist_update(num_players)
+        print(f"{size:>3}x{size:<2} | {incremental * 1e9:>5.0f} ns/mv | "
+              f"{recompute * 1e9:>6.0f} ns/mv")
+
+
+def run_journal(args):
+    """Print journal append throughput and crash recovery time"""
+    print(f"{'mode':>14} | {'events':>7} | {'events/sec':>10} | writes")
+    print("-" * 48)
+    for mode, fsync, events in (("write", False, args.events),
+                                ("group", False, args.events),
+                                ("write", True, args.fsync_events),
+                                ("group", True, args.fsync_events)):
+        rate, writes = bench_journal_throughput(mode, events, fsync)
+        label = mode + (" + fsync" if fsync else "")
+        print(f"{label:>14} | {events:>7} | {rate:>10.0f} | {writes}")
+
+    print(f"\n{'games':>7} | {'journal':>8} | {'records':>8} | {'recovery':>8} | recovered")
+    print("-" * 56)
+    for games in args.games:
+        size, records, elapsed, recovered = bench_journal_recovery(games)
+        print(f"{games:>7} | {size / 1e6:>5.1f} MB | {records:>8} | "
+              f"{elapsed:>7.2f}s | {recovered}")
+
+
+def run_snapshot(args):
+    """Print snapshot size, write time and load time"""
+    print(f"{'games':>7} | {'size':>8} | {'per game':>8} | {'write':>7} | "
+          f"{'load':>7} | loaded")
+    print("-" * 60)
+    for games in args.games:
+        size, write_time, load_time, loaded = bench_snapshot(games)
+        print(f"{games:>7} | {size / 1e6:>5.2f} MB | {size / games:>6.0f} B | "
+              f"{write_time:>6.2f}s | {load_time:>6.2f}s | {loaded}")
+
+
+def run_quickplay(args):
+    """Print time-to-game-start for QUICKPLAY and LIST/JOIN bursts"""
+    print(f"{args.clients} players, {args.players}-player games, "
+          f"arrivals over {args.spread:g}s, {args.engine} engine")
+    print(f"{'flow':>9} | {'started':>7} | {'p50':>8} | {'p99':>8} | "
+          f"{'last':>8} | {'req/player':>10} | failed joins")
+    print("-" * 80)
+    for flow in ("quickplay", "list"):
+        result = bench_matchmaking(flow, args.clients, args.engine, args.players,
+                                   args.spread, args.timeout, port=args.port)
+
+        def ms(value):
+            return "-" if value is None else f"{value * 1000:.0f} ms"
+
+        print(f"{flow:>9} | {result['started']:>7} | {ms(result['p50']):>8} | "
+              f"{ms(result['p99']):>8} | {ms(result['last']):>8} | "
+              f"{result['requests']:>10.2f} | {result['failed_joins']}")
+
+
+def run_spectators_bench(args):
+    """Print move-to-spectator latency for one watched game"""
+    print(f"One game, {len(DRAWN_GAME)} moves x {args.rounds} rounds per row "
+          "(DELTA clients)")
+    print(f"{'engine':>8} | {'spectators':>10} | {'next player p50':>15} | "
+          f"{'median spectator p50':>20} | {'last spectator p50':>18} | "
+          f"{'last p99':>8}")
+    print("-" * 95)
+    for engine in args.engines:
+        for count in args.spectators:
+            player, median, last = bench_spectators(engine, count, args.rounds,
+                                                    args.processes, port=args.port)
+
+            def ms(values, q=0.5):
+                values = sorted(values)
+                return f"{values[min(len(values) - 1, int(q * len(values)))] * 1000:.2f} ms"
+
+            print(f"{engine:>8} | {count:>10} | {ms(player):>15} | "
+                  f"{ms(median):>20} | {ms(last):>18} | {ms(last, 0.99):>8}")
+
+
+def run_board_cache(args):
+    """Print board serialization cost per move, uncached vs cached"""
+    size = args.players + 1
+    print(f"{size}x{size} boards, {args.games} games, serialization time per move")
+    print(f"{'form':>6} | {'rebuilt per call':>16} | {'versioned cache':>15} | speedup")
+    print("-" * 56)
+    results = bench_board_serialization(args.players, args.games)
+    for form in ("text", "binary"):
+        uncached = results["UncachedBoardGame", form]
+        cached = results["Game", form]
+        print(f"{form:>6} | {uncached * 1e6:>13.2f} us | {cached * 1e6:>12.2f} us | "
+              f"{uncached / cached:.1f}x")
+
+
+def run_client(args):
+    """Print how long a client takes to show server events and replies"""
+    print(f"{os.path.relpath(args.client)}: {args.rounds} games, "
+          "time until the screen shows it")
+    print(f"{'event':>6} | {'p50':>9} | {'p99':>9} | {'max':>9}")
+    print("-" * 42)
+    results = bench_client(args.client, args.rounds, port=args.port)
+    labels = {"menu": "LIST typed -> menu", "turn": "opponent moved -> Row:",
+              "render": "move typed -> board", "end": "game won -> menu"}
+    for event, times in results.items():
+        times = sorted(times)
+        p99 = times[min(len(times) - 1, int(0.99 * len(times)))]
+        print(f"{event:>6} | {statistics.median(times) * 1000:>6.2f} ms | "
+              f"{p99 * 1000:>6.2f} ms | {times[-1] * 1000:>6.2f} ms   {labels[event]}")
+
+
+def run_memory(args):
+    """Print bytes per waiting and per active game for each player count"""
+    print(f"{'players':>7} | {'board':>6} | {'waiting':>9} | {'active':>9}")
+    print("-" * 42)
+    for num_players in range(2, 14):
+        size = num_players + 1
+        waiting = measure_game_memory(num_players, active=False)
+        active = measure_game_memory(num_players, active=True)
+        print(f"{num_players:>7} | {size:>3}x{size:<2} | {waiting:>7.0f} B | "
+              f"{active:>7.0f} B")
+
+
+def main():
+    """Benchmark entry point"""
+    parser = argparse.ArgumentParser(description="Tic-Tac-Toe benchmarks")
+    commands = parser.add_subparsers(dest="command")
+
+    moves = commands.add_parser("moves", help="make_move throughput")
+    moves.add_argument("--games", type=int, default=200)
+    moves.set_defaults(func=run_moves)
+
+    conns = commands.add_parser("connections",
+                                help="idle connections per server engine")
+    conns.add_argument("--counts", type=int, nargs="+",
+                       default=[1000, 5000, 10000])
+    conns.add_argument("--engines", nargs="+",
+                       default=["threaded", "asyncio"])
+    conns.add_argument("--port", type=int, default=5050)
+    conns.set_defaults(func=run_connections)
+
+    scaling = commands.add_parser("scaling",
+                                  help="moves/sec per number of server workers")
+    scaling.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    scaling.add_argument("--engines", nargs="+", default=["threaded", "asyncio"])
+    scaling.add_argument("--clients", type=int, default=8,
+                         help="load generator processes")
+    scaling.add_argument("--games", type=int, default=4000)
+    scaling.add_argument("--port", type=int, default=5060)
+    scaling.set_defaults(func=run_scaling)
+
+    broadcast = commands.add_parser("broadcast",
+                                    help="bytes sent per move, full vs delta")
+    broadcast.add_argument("--players", type=int, nargs="+", default=[2, 6, 13])
+    broadcast.add_argument("--games", type=int, default=50)
+    broadcast.set_defaults(func=run_broadcast)
+
+    lobby = commands.add_parser("lobby", help="LIST cost with many games")
+    lobby.add_argument("--games", type=int, default=100000)
+    lobby.add_argument("--waiting", type=int, default=1000)
+    lobby.add_argument("--lists", type=int, default=100)
+    lobby.set_defaults(func=run_lobby)
+
+    soak = commands.add_parser("soak", help="memory over many finished games")
+    soak.add_argument("--games", type=int, default=1000000)
+    soak.add_argument("--every", type=int, default=100000)
+    soak.set_defaults(func=run_soak)
+
+    slow = commands.add_parser("slowclient",
+                               help="MOVE latency with a player that stopped reading")
+    slow.add_argument("--players", type=int, default=13)
+    slow.add_argument("--games", type=int, default=20)
+    slow.add_argument("--max-outbound", type=int, default=64 * 1024)
+    slow.set_defaults(func=run_slow_client)
+
+    move_path = commands.add_parser("movepath",
+                                    help="server MOVE command cost")
+    move_path.add_argument("--players", type=int, default=13)
+    move_path.add_argument("--games", type=int, default=200)
+    move_path.add_argument("--rounds", type=int, default=5)
+    move_path.set_defaults(func=run_move_path)
+
+    logging = commands.add_parser("logging",
+                                  help="server command cost per logging mode")
+    logging.add_argument("--modes", nargs="+", default=["off", "info", "debug", "print"],
+                         choices=list(LEVELS) + ["print"])
+    logging.add_argument("--players", type=int, default=2)
+    logging.add_argument("--games", type=int, default=2000)
+    logging.add_argument("--rounds", type=int, default=3)
+    logging.set_defaults(func=run_logging)
+
+    protocol_bench = commands.add_parser("protocol",
+                                         help="text vs binary protocol cost and bytes")
+    protocol_bench.add_argument("--players", type=int, default=13)
+    protocol_bench.add_argument("--games", type=int, default=20)
+    protocol_bench.set_defaults(func=run_protocol)
+
+    bot = commands.add_parser("bot",
+                              help="bot nodes/sec and move latency per board size")
+    bot.add_argument("--sizes", type=int, nargs="+", default=list(range(3, 15)))
+    bot.add_argument("--positions", type=int, default=10)
+    bot.add_argument("--move-time", type=float, default=0.1)
+    bot.set_defaults(func=run_bot)
+
+    zobrist = commands.add_parser("zobrist",
+                                  help="position key collisions and update cost")
+    zobrist.add_argument("--positions", type=int, default=200000)
+    zobrist.set_defaults(func=run_zobrist)
+
+    journal = commands.add_parser("journal",
+                                  help="journal throughput and recovery time")
+    journal.add_argument("--events", type=int, default=200000)
+    journal.add_argument("--fsync-events", type=int, default=2000)
+    journal.add_argument("--games", type=int, nargs="+", default=[10000, 100000])
+    journal.set_defaults(func=run_journal)
+
+    snapshot = commands.add_parser("snapshot",
+                                   help="snapshot size, write and load time")
+    snapshot.add_argument("--games", type=int, nargs="+", default=[10000, 100000])
+    snapshot.set_defaults(func=run_snapshot)
+
+    quickplay = commands.add_parser("quickplay",
+                                    help="time-to-game-start, QUICKPLAY vs LIST/JOIN")
+    quickplay.add_argument("--clients", type=int, default=10000)
+    quickplay.add_argument("--players", type=int, default=2)
+    quickplay.add_argument("--spread", type=float, default=0.0,
+                           help="seconds over which the players arrive")
+    quickplay.add_argument("--timeout", type=float, default=20.0)
+    quickplay.add_argument("--engine", choices=["threaded", "asyncio"],
+                           default="asyncio")
+    quickplay.add_argument("--port", type=int, default=5070)
+    quickplay.set_defaults(func=run_quickplay)
+
+    spectators = commands.add_parser("spectators",
+                                     help="move-to-last-spectator latency (WATCH)")
+    spectators.add_argument("--spectators", type=int, nargs="+", default=[1000, 10000])
+    spectators.add_argument("--engines", nargs="+", choices=["threaded", "asyncio"],
+                            default=["threaded", "asyncio"])
+    spectators.add_argument("--rounds", type=int, default=5)
+    spectators.add_argument("--processes", type=int, default=4,
+                            help="processes reading the spectators")
+    spectators.add_argument("--port", type=int, default=5080)
+    spectators.set_defaults(func=run_spectators_bench)
+
+    board_cache = commands.add_parser("boardcache",
+                                      help="board serialization cost per move")
+    board_cache.add_argument("--players", type=int, default=13)
+    board_cache.add_argument("--games", type=int, default=200)
+    board_cache.set_defaults(func=run_board_cache)
+
+    client = commands.add_parser("client",
+                                 help="client latency from event to screen")
+    client.add_argument("--client", default=os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "client.py"),
+        help="client script to drive")
+    client.add_argument("--rounds", type=int, default=20)
+    client.add_argument("--port", type=int, default=5000,
+                        help="server port (passed to the client as --port)")
+    client.set_defaults(func=run_client)
+
+    memory = commands.add_parser("memory", help="bytes per waiting/active game")
+    memory.set_defaults(func=run_memory)
+
+    suite = commands.add_parser("suite",
+                                help="game_logic micro-benchmarks (JSON)")
+    suite.add_argument("--cases", nargs="+", choices=sorted(SUITE),
+                       default=list(SUITE))
+    suite.add_argument("--games", type=int, default=SUITE_GAMES,
+                       help="games per timed run")
+    suite.add_argument("--warmup", type=int, default=1)
+    suite.add_argument("--repeat", type=int, default=5)
+    suite.add_argument("--output", help="write JSON results to this file")
+    suite.set_defaults(func=run_suite)
+
+    compare = commands.add_parser("compare",
+                                  help="diff two suite result files")
+    compare.add_argument("base", help="baseline JSON results")
+    compare.add_argument("new", help="new JSON results")
+    compare.add_argument("--threshold", type=float, default=10.0,
+                         help="percent slowdown flagged as a regression")
+    compare.set_defaults(func=run_compare)
+
+    args = parser.parse_args()
+    if args.command is None:
+        args = parser.parse_args(["moves"])
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,390 @@
+"""
+Tic-Tac-Toe Computer Opponent
+Iterative-deepening alpha-beta search for the N-player game
+"""
+
+import random
+import time
+from game_logic import (SYMBOL_INDEX, WIN_MASKS, ZOBRIST, KEY_BITS,
+                        MIN_BOARD_SIZE, MAX_BOARD_SIZE)
+
+BOT_MOVE_TIME = 0.2         # Search time per bot move (seconds)
+TABLE_SIZE = 200000         # Transposition table entries kept per bot
+CHECK_EVERY = 128           # Nodes between deadline checks (power of two)
+
+WIN_SCORE = 1000000         # Score of a won position (minus plies to reach it)
+TWO_WEIGHT = 8              # Open line holding two of a player's symbols
+ONE_WEIGHT = 1              # Open line holding one of a player's symbols
+
+# Transposition table entry flags
+EXACT, LOWER, UPPER = 0, 1, 2
+
+TURN_SEED = 0x5EA7          # Seed of the side-to-move keys
+
+
+def build_geometry(size):
+    """
+    Precompute the search tables for a board of the given size.
+
+    Returns:
+        dict with:
+            full: mask of every cell
+            lines: ((shift, starts), ...) per direction; bit x of starts
+                   marks a 3-in-a-row at cells x, x+shift, x+2*shift
+            near: per cell, the cells within two steps of it
+            rank: per cell, its distance from the centre (for move order)
+            zobrist: the game's Zobrist keys, zobrist[cell][symbol_index]
+            turn_keys: one random 64-bit key per turn position
+    """
+    all_masks, _ = WIN_MASKS[size]
+    lines = {}
+    for mask in all_masks:
+        start = (mask & -mask).bit_length() - 1
+        rest = mask ^ (1 << start)
+        shift = (rest & -rest).bit_length() - 1 - start
+        lines[shift] = lines.get(shift, 0) | (1 << start)
+
+    near = []
+    rank = []
+    centre = (size - 1) / 2
+    for row in range(size):
+        for col in range(size):
+            mask = 0
+            for r in range(max(0, row - 2), min(size, row + 3)):
+                for c in range(max(0, col - 2), min(size, col + 3)):
+                    mask |= 1 << (r * size + c)
+            near.append(mask)
+            rank.append(abs(row - centre) + abs(col - centre))
+
+    rng = random.Random(TURN_SEED + size)
+    turn_keys = tuple(rng.getrandbits(KEY_BITS) for _ in range(size - 1))
+
+    return {
+        "full": (1 << (size * size)) - 1,
+        "lines": tuple(lines.items()),
+        "near": tuple(near),
+        "rank": tuple(rank),
+        "zobrist": ZOBRIST[size][0],
+        "turn_keys": turn_keys,
+    }
+
+
+# Search tables for every supported board size, built once at import
+GEOMETRY = {size: build_geometry(size)
+            for size in range(MIN_BOARD_SIZE, MAX_BOARD_SIZE + 1)}
+
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the move's time budget is spent"""
+
+
+class Position:
+    """
+    Snapshot of a game taken under its lock, so the search can run
+    without holding it.
+    """
+    __slots__ = ("size", "masks", "occupied", "key", "order", "turn",
+                 "move_count")
+
+    def __init__(self, size, masks, occupied, key, order, turn, move_count=0):
+        self.size = size
+        self.masks = masks            # Bitboard per symbol index
+        self.occupied = occupied
+        self.key = key                # Zobrist key of the board
+        self.order = order            # Symbol index of each seat, in turn order
+        self.turn = turn              # Seat to move
+        self.move_count = move_count
+
+    @classmethod
+    def from_game(cls, game):
+        """Copy the position of a started game (caller holds game.lock)"""
+        return cls(game.board_size, list(game.symbol_masks), game.occupied,
+                   game.zobrist_key,
+                   tuple(SYMBOL_INDEX[player.symbol] for player in game.players),
+                   game.current_turn, game.move_count)
+
+
+def threats(mask, others, lines, empty):
+    """
+    Return the empty cells where a player with `mask` would complete
+    a 3-in-a-row, computed for all lines at once.
+    """
+    result = 0
+    for shift, starts in lines:
+        a = mask & starts
+        b = (mask >> shift) & starts
+        c = (mask >> (2 * shift)) & starts
+        result |= ((a & b) << (2 * shift)) | ((a & c) << shift) | (b & c)
+    return result & empty
+
+
+class BotPlayer:
+    """
+    Computer player for one seat.
+
+    Searches with paranoid alpha-beta: the bot maximizes its own score
+    and assumes every other player minimizes it, which keeps alpha-beta
+    pruning valid with any number of players. Iterative deepening
+    returns the best move of the deepest search finished within
+    move_time, and a Zobrist-keyed transposition table carries results
+    between iterations and between the bot's moves.
+    """
+
+    def __init__(self, symbol, move_time=BOT_MOVE_TIME, table_size=TABLE_SIZE):
+        self.symbol = symbol
+        self.index = SYMBOL_INDEX[symbol]
+        self.move_time = move_time
+        self.table_size = table_size
+        self.table = {}           # Dictionary: position key - (depth, score, flag, cell)
+        self.table_order = None   # Turn order the table was built for
+
+        # Statistics of the last search
+        self.nodes = 0
+        self.depth = 0
+
+        # Search state
+        self.deadline = 0.0
+        self.geometry = None
+        self.order = ()
+
+    def choose_move(self, position, deadline=None):
+        """
+        Pick a move for the seat to move in position (this bot's seat).
+
+        Args:
+            deadline: time.perf_counter() value by which the move must be
+                      chosen (default: move_time from now). A search that
+                      starts late gets only what is left; one that starts
+                      past its deadline plays the first ordered move (a
+                      win, a block, or the cell nearest the centre).
+
+        Returns:
+            (row, col)
+        """
+        if deadline is None:
+            deadline = time.perf_counter() + self.move_time
+        self.deadline = deadline
+        self.geometry = geometry = GEOMETRY[position.size]
+        self.order = position.order
+        self.nodes = 0
+        self.depth = 0
+
+        # Entries are scored for one turn order; a player leaving changes it
+        if self.table_order != position.order:
+            self.table.clear()
+            self.table_order = position.order
+        elif len(self.table) > self.table_size:
+            self.table.clear()
+
+        masks = list(position.masks)
+        occupied = position.occupied
+        empty = geometry["full"] & ~occupied
+        key = position.key
+        near = 0
+        bits = occupied
+        while bits:
+            low = bits & -bits
+            near |= geometry["near"][low.bit_length() - 1]
+            bits ^= low
+
+        moves = self.order_moves(masks, occupied, empty, near, position.turn, None)
+        best = moves[0]
+
+        # An immediate win (or the only legal move) needs no search,
+        # and a move whose budget is spent gets none
+        mine = masks[self.index]
+        if empty & (empty - 1) == 0 or threats(
+                mine, occupied & ~mine, geometry["lines"], empty) >> best & 1:
+            return divmod(best, position.size)
+        if time.perf_counter() >= deadline:
+            return divmod(best, position.size)
+
+        remaining = bin(empty).count("1")
+        try:
+            for depth in range(1, remaining + 1):
+                score, cell = self.search_root(masks, occupied, near, key,
+                                               position.turn, depth, moves)
+                best = cell
+                self.depth = depth
+                # Move the best move to the front for the next iteration
+                moves.remove(cell)
+                moves.insert(0, cell)
+                if abs(score) >= WIN_SCORE - remaining:
+                    break   # Result is decided
+        except SearchTimeout:
+            pass
+
+        return divmod(best, position.size)
+
+    def order_moves(self, masks, occupied, empty, near, turn, first):
+        """
+        Return the candidate cells for the player at turn, best first:
+        the table move, winning cells, cells blocking another player's
+        win, then cells near the pieces already played, centre first.
+        """
+        geometry = self.geometry
+        lines = geometry["lines"]
+        player = self.order[turn]
+        mask = masks[player]
+
+        wins = threats(mask, occupied & ~mask, lines, empty)
+        if wins:
+            # Any winning cell ends the game; one is enough
+            return [(wins & -wins).bit_length() - 1]
+
+        blocks = 0
+        for index in self.order:
+            other = masks[index]
+            if index != player and other:
+                blocks |= threats(other, occupied & ~other, lines, empty)
+
+        candidates = (near & empty) or empty
+        rank = geometry["rank"]
+        cells = []
+        bits = candidates & ~blocks
+        while bits:
+            low = bits & -bits
+            cells.append(low.bit_length() - 1)
+            bits ^= low
+        cells.sort(key=rank.__getitem__)
+
+        urgent = []
+        while blocks:
+            low = blocks & -blocks
+            urgent.append(low.bit_length() - 1)
+            blocks ^= low
+        cells = urgent + cells
+
+        if first is not None and first in cells:
+            cells.remove(first)
+            cells.insert(0, first)
+        return cells
+
+    def evaluate(self, masks, occupied):
+        """
+        Score a position for this bot: its open lines (lines no other
+        player has entered) minus every other player's.
+        """
+        lines = self.geometry["lines"]
+        score = 0
+        for index, mask in enumerate(masks):
+            if not mask:
+                continue
+            others = occupied & ~mask
+            value = 0
+            for shift, starts in lines:
+                double = 2 * shift
+                open_lines = starts & ~(others | (others >> shift) | (others >> double))
+                a = mask & open_lines
+                b = (mask >> shift) & open_lines
+                c = (mask >> double) & open_lines
+                value += (TWO_WEIGHT * ((a & b) | (a & c) | (b & c)).bit_count() +
+                          ONE_WEIGHT * (a | b | c).bit_count())
+            score += value if index == self.index else -value
+        return score
+
+    def search_root(self, masks, occupied, near, key, turn, depth, moves):
+        """
+        Search every root move to the given depth.
+
+        Returns:
+            (score, best cell)
+        """
+        geometry = self.geometry
+        zobrist = geometry["zobrist"]
+        near_cells = geometry["near"]
+        next_turn = (turn + 1) % len(self.order)
+        mask = masks[self.index]
+
+        best_score, best_cell = -WIN_SCORE - 1, moves[0]
+        alpha, beta = -WIN_SCORE - 1, WIN_SCORE + 1
+        for cell in moves:
+            bit = 1 << cell
+            masks[self.index] = mask | bit
+            score = self.search(masks, occupied | bit, near | near_cells[cell],
+                                key ^ zobrist[cell][self.index], next_turn,
+                                depth - 1, alpha, beta, 1)
+            masks[self.index] = mask
+            if score > best_score:
+                best_score, best_cell = score, cell
+                alpha = max(alpha, score)
+        return best_score, best_cell
+
+    def search(self, masks, occupied, near, key, turn, depth, alpha, beta, ply):
+        """
+        Paranoid alpha-beta: maximize at this bot's turns,
+        minimize at everyone else's.
+
+        Returns:
+            score of the position for this bot
+        """
+        self.nodes += 1
+        if self.nodes & (CHECK_EVERY - 1) == 0 and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+
+        geometry = self.geometry
+        empty = geometry["full"] & ~occupied
+        if not empty:
+            return 0    # Draw
+
+        player = self.order[turn]
+        mask = masks[player]
+
+        # The player to move completes a line if it can
+        if threats(mask, occupied & ~mask, geometry["lines"], empty):
+            return WIN_SCORE - ply if player == self.index else ply - WIN_SCORE
+
+        if depth == 0:
+            return self.evaluate(masks, occupied)
+
+        table_key = key ^ geometry["turn_keys"][turn]
+        entry = self.table.get(table_key)
+        first = None
+        if entry is not None:
+            entry_depth, score, flag, first = entry
+            if entry_depth >= depth:
+                if flag == EXACT:
+                    return score
+                if flag == LOWER and score >= beta:
+                    return score
+                if flag == UPPER and score <= alpha:
+                    return score
+
+        zobrist = geometry["zobrist"]
+        near_cells = geometry["near"]
+        next_turn = (turn + 1) % len(self.order)
+        maximizing = player == self.index
+        original_alpha, original_beta = alpha, beta
+        best_cell = None
+
+        if maximizing:
+            best = -WIN_SCORE - 1
+        else:
+            best = WIN_SCORE + 1
+
+        for cell in self.order_moves(masks, occupied, empty, near, turn, first):
+            bit = 1 << cell
+            masks[player] = mask | bit
+            score = self.search(masks, occupied | bit, near | near_cells[cell],
+                                key ^ zobrist[cell][player], next_turn,
+                                depth - 1, alpha, beta, ply + 1)
+            masks[player] = mask
+
+            if maximizing:
+                if score > best:
+                    best, best_cell = score, cell
+                    alpha = max(alpha, score)
+            elif score < best:
+                best, best_cell = score, cell
+                beta = min(beta, score)
+            if alpha >= beta:
+                break
+
+        if best <= original_alpha:
+            flag = UPPER
+        elif best >= original_beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.table[table_key] = (depth, best, flag, best_cell)
+        return best
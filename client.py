@@ -1,332 +1,457 @@
+"""
+Tic-Tac-Toe Client
+A single event loop multiplexes the server socket and the keyboard
+(stdin) with selectors: server messages are shown and the next prompt
+is asked as soon as they arrive, with no polling and no extra threads.
+Needs a stdin the selector can watch (a POSIX terminal or pipe).
+"""
+
+import argparse
+import os
+import selectors
 import socket
-import time
-import threading 
-from ui import print_menu, print_board_text, read_move_safe
+import sys
+from ui import print_menu, print_board_text
 
 # Server connection settings
 HOST = '127.0.0.1'      # Server IP address (localhost)
 PORT = 5000             # Server port
 FORMAT = 'utf-8'        # Encoding format for messages
 ADDR = (HOST, PORT)     # Full server address tuple
+RECV_SIZE = 4096        # Bytes read per recv/read call
 
-# Global state variables
-board_size = None       # Board size (NxN)
-in_game = False         # True if the player is currently in a game
-waiting_for_move = False  # True while waiting for user input
-game_active = False     # True while the game is active
+# Messages that end the game for this client
+GAME_OVER = ("WIN", "LOSE", "DRAW", "GAME_ABORTED")
 
-def listen_to_server():
+
+class ClientState:
     """
-    Background thread that continuously listens
-    for messages from the server.
+    What the client knows about its session, and the answer the user
+    is currently being asked for.
     """
-    while True:
-        try:
-            data = client_socket.recv(1024).decode(FORMAT)
 
-            # Connection closed by server
-            if not data:
-                print("\n[CONNECTION LOST] Server disconnected")
-                break
+    def __init__(self):
+        self.running = True
+        self.in_game = False        # True while seated in a game
+        self.board_size = None      # Board size (NxN)
 
-            handle_server_message(data)
+        # Local board mirror, kept up to date from MOVED events (DELTA capability)
+        self.board_rows = None      # List of rows, each a list of cell symbols
+        self.move_seq = 0           # Number of moves applied to board_rows
+        self.board_lines = None     # Rows of a BOARD message still arriving
+
+        # Input in progress: the next line typed answers `prompt`
+        # ("menu", "players", "bots", "game_id", "row", "col" or None)
+        self.prompt = None
+        self.answers = []           # Earlier answers of a multi-step prompt
+        self.awaiting_reply = False # Menu command sent: show the menu after its reply
 
-        except Exception as e:
-            # Print error only if socket is still open
-            if client_socket.fileno() != -1:
-                print(f"\n[ERROR] Connection error: {e}")
-            break
 
-def start_client():
+class Client:
     """
-    Main client function:
-    - Connects to the server
-    - Starts the listener thread
-    - Displays the main menu
+    Event-driven client: reacts to whichever of the server socket and
+    the keyboard is ready, one complete line at a time.
     """
-    try:
-        client_socket.connect((HOST, PORT))
-        print("Connected to server.\n")
 
-    except ConnectionRefusedError:
-        print("\nError: Cannot connect to server.")
-        print("Please make sure the server is running and try again.\n")
-        return
+    def __init__(self, host=HOST, port=PORT, stdin=None):
+        self.addr = (host, port)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.stdin = stdin if stdin is not None else sys.stdin.fileno()
+        self.selector = selectors.DefaultSelector()
+        self.state = ClientState()
+
+        self.received = b""         # Bytes from the server after the last newline
+        self.typed = b""            # Keyboard bytes after the last newline
+
+    def run(self):
+        """
+        Main client function:
+        - Connects to the server
+        - Shows the main menu
+        - Serves the socket and the keyboard until exit
+        """
+        try:
+            self.sock.connect(self.addr)
+            print("Connected to server.\n")
+
+        except ConnectionRefusedError:
+            print("\nError: Cannot connect to server.")
+            print("Please make sure the server is running and try again.\n")
+            return
+
+        except Exception as e:
+            print(f"\nError: Connection failed - {e}\n")
+            return
+
+        # Ask for compact move events instead of full boards
+        self.send("HELLO DELTA")
+
+        self.selector.register(self.sock, selectors.EVENT_READ, self.on_socket)
+        self.selector.register(self.stdin, selectors.EVENT_READ, self.on_keyboard)
+        self.show_menu()
+
+        while self.state.running:
+            for key, _ in self.selector.select():
+                key.data()
 
-    except Exception as e:
-        print(f"\nError: Connection failed - {e}\n")
-        return
+        # Close connection
+        self.selector.close()
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+        print("\nCLOSING CONNECTION...")
 
-    # START LISTENER THREAD
-    threading.Thread(target=listen_to_server, daemon=True).start()
+    def send(self, message):
+        """Send one command line to the server"""
+        try:
+            self.sock.sendall((message + "\n").encode(FORMAT))
+        except OSError as e:
+            print(f"\n[ERROR] Failed to send message: {e}")
+            self.state.running = False
 
-    while True:
-        # If already inside a game, skip the menu
-        if in_game:
-            time.sleep(0.2)
-            continue
+    def ask(self, prompt, text):
+        """Show a prompt; the next line typed answers it"""
+        self.state.prompt = prompt
+        print(text, end="", flush=True)
 
-        # Show main menu
+    def show_menu(self):
+        """Display the main menu and wait for a choice"""
         print_menu()
-        choice = input("Choose option: ")
+        self.ask("menu", "Choose option: ")
 
-        # Request list of available games
-        if choice == "1":
-            message = "LIST"
+    # ------------------------------------------------------------------
+    # Server side
+    # ------------------------------------------------------------------
 
-        # Create a new game
-        elif choice == "2":
-            players = input("How many players (2-13)? ")
+    def on_socket(self):
+        """The socket is readable: handle every complete line received"""
+        try:
+            data = self.sock.recv(RECV_SIZE)
+        except OSError as e:
+            print(f"\n[ERROR] Connection error: {e}")
+            data = b""
+
+        # Connection closed by server
+        if not data:
+            print("\n[CONNECTION LOST] Server disconnected")
+            self.state.running = False
+            return
+
+        *lines, self.received = (self.received + data).split(b"\n")
+        for line in lines:
+            self.handle_line(line.decode(FORMAT, errors="replace").strip())
+
+        # The reply to a menu command is in: back to the menu
+        state = self.state
+        if state.awaiting_reply and not state.in_game and state.board_lines is None:
+            state.awaiting_reply = False
+            self.show_menu()
+
+    def handle_line(self, message):
+        """
+        Handles a single line from the server.
+        A BOARD message spans several lines: its rows are collected
+        first (the first row tells the board size).
+        """
+        state = self.state
+
+        if state.board_lines is not None:
+            state.board_lines.append(message)
+            if len(state.board_lines) == len(state.board_lines[0].split()):
+                rows, state.board_lines = state.board_lines, None
+                self.handle_board(rows)
+            return
+
+        if message == "BOARD":
+            state.board_lines = []
+            return
+
+        if message:
+            self.handle_message(message)
+
+    def handle_board(self, rows):
+        """A full board arrived: show it and refresh the local mirror"""
+        state = self.state
+        size = print_board_text("\n".join(["BOARD"] + rows))
+        if size is not None:
+            state.board_size = size
+
+        # Refresh the local mirror (seq = number of filled cells)
+        state.board_rows = [row.split() for row in rows]
+        state.move_seq = sum(cell != '.' for row in state.board_rows for cell in row)
+
+    def handle_message(self, message):
+        """
+        Handles a single server message.
+        """
+        state = self.state
+
+        # Capabilities accepted by the server
+        if message.startswith("HELLO"):
+            return
+
+        # List available games
+        if message.startswith("GAMES"):
+            games = message[6:].strip()
+            print("\nAvailable games:")
+            if games:
+                print("  ID | Players | Joined")
+                print("  " + "-" * 25)
+                for game in games.split():
+                    parts = game.split(':')
+                    if len(parts) == 3:
+                        gid, total, joined = parts
+                        print(f"  {gid:2} | {total:7} | {joined:6}")
+                    elif parts[0] == "next":
+                        print("  (more games available)")
+            else:
+                print("  No available games")
+            return
+
+        # Game created
+        if message.startswith("CREATED"):
+            parts = message.split()
+            if len(parts) >= 2:
+                print(f"\nGame created successfully. Game ID: {parts[1]}")
+            return
+
+        # Joined game
+        if message.startswith("JOINED"):
+            state.in_game = True
+            state.prompt = None
+            parts = message.split()
+            if len(parts) >= 2:
+                print(f"\nYou joined the game as: {parts[1]}")
+            return
+
+        # Waiting for players
+        if message.startswith("WAIT"):
+            print("\nWaiting for other players to join...")
+            return
+
+        # Player's turn (a repeated notice while asking is ignored)
+        if message.startswith("YOURTURN"):
+            if state.in_game and state.prompt not in ("row", "col"):
+                print("\nIt is your turn!")
+                print("\nEnter your move:")
+                self.ask("row", "  Row: ")
+            return
+
+        # Single move applied to the board
+        if message.startswith("MOVED"):
+            parts = message.split()
             try:
-                num = int(players)
-                if num < 2 or num > 13:
-                    print("Number of players must be between 2 and 13")
-                    continue
+                row, col, symbol, seq = int(parts[1]), int(parts[2]), parts[3], int(parts[4])
+            except (ValueError, IndexError):
+                return
+
+            # Missed an update (or no board yet) - ask for a full snapshot
+            if state.board_rows is None or seq != state.move_seq + 1:
+                self.send("RESYNC")
+                return
+
+            state.board_rows[row][col] = symbol
+            state.move_seq = seq
+            print_board_text("\n".join(["BOARD"] + [" ".join(r) for r in state.board_rows]))
+            return
+
+        # Invalid move (the server repeats YOURTURN)
+        if message.startswith("INVALID"):
+            reason = message[8:].strip() if len(message) > 8 else "Unknown reason"
+            print(f"\nInvalid move: {reason}")
+            print("Please try again.")
+            return
+
+        # Game over: straight back to the menu
+        if message in GAME_OVER:
+            self.end_game(message)
+            return
+
+        # Disconnected
+        if message == "BYE":
+            print("\nDisconnected from server.")
+            print("Returning to main menu...")
+            return
+
+        # Player left the game
+        if message.startswith("PLAYER_LEFT"):
+            print("\nA player has left the game.")
+            return
+
+        # Unknown message
+        print(f"\n{message}")
+
+    def end_game(self, result):
+        """Show the result of the game and return to the menu"""
+        state = self.state
+        state.in_game = False
+        state.prompt = None
+        state.awaiting_reply = False
+
+        if result == "GAME_ABORTED":
+            print("\nGame aborted (not enough players).")
+        else:
+            print("\n" + "=" * 40)
+            if result == "WIN":
+                print("CONGRATULATIONS! YOU WON! :)")
+            elif result == "LOSE":
+                print("You lost the game :( Better luck next time!")
+            else:
+                print("Game ended in a draw.")
+            print("=" * 40)
+        self.show_menu()
+
+    # ------------------------------------------------------------------
+    # Keyboard side
+    # ------------------------------------------------------------------
+
+    def on_keyboard(self):
+        """stdin is readable: handle every complete line typed"""
+        data = os.read(self.stdin, RECV_SIZE)
+
+        # End of input: leave like option 4
+        if not data:
+            self.send("EXIT")
+            self.state.running = False
+            return
+
+        *lines, self.typed = (self.typed + data).split(b"\n")
+        for line in lines:
+            if self.state.running:
+                self.handle_input(line.decode(FORMAT, errors="replace").strip())
+
+    def handle_input(self, text):
+        """Use a typed line as the answer to the current prompt"""
+        state = self.state
+        prompt, state.prompt = state.prompt, None
+
+        if prompt == "menu":
+            self.menu_choice(text)
+
+        # Create a new game: number of players, then computer players
+        elif prompt == "players":
+            try:
+                num = int(text)
+            except ValueError:
+                print("Invalid number")
+                self.show_menu()
+                return
+            if num < 2 or num > 13:
+                print("Number of players must be between 2 and 13")
+                self.show_menu()
+                return
+            state.answers = [num]
+            self.ask("bots", f"How many computer players (0-{num - 1})? ")
+
+        elif prompt == "bots":
+            num = state.answers[0]
+            try:
+                bots = int(text or "0")
             except ValueError:
                 print("Invalid number")
-                continue
-            message = f"CREATE {players}"
+                self.show_menu()
+                return
+            if bots < 0 or bots >= num:
+                print(f"Number of computer players must be between 0 and {num - 1}")
+                self.show_menu()
+                return
+            self.send_command(f"CREATE {num} {bots}")
 
         # Join an existing game
-        elif choice == "3":
-            game_id = input("Enter game id: ")
+        elif prompt == "game_id":
             try:
-                int(game_id)
+                game_id = int(text)
             except ValueError:
                 print("Invalid game ID")
-                continue
-            message = f"JOIN {game_id}"
+                self.show_menu()
+                return
+            self.send_command(f"JOIN {game_id}")
+
+        # Move: row, then column
+        elif prompt == "row":
+            state.answers = [text]
+            self.ask("col", "  Col: ")
+
+        elif prompt == "col":
+            self.submit_move(state.answers[0], text)
+
+        # Typed while nothing was asked
+        elif text:
+            if state.in_game:
+                print("\nPlease wait for your turn.")
+            else:
+                print("\nPlease wait for the server's reply.")
+            state.prompt = prompt
+
+    def menu_choice(self, choice):
+        """Act on a main menu option"""
+        # Request list of available games
+        if choice == "1":
+            self.send_command("LIST")
+
+        # Create a new game
+        elif choice == "2":
+            self.ask("players", "How many players (2-13)? ")
+
+        # Join an existing game
+        elif choice == "3":
+            self.ask("game_id", "Enter game id: ")
 
         # Exit client
         elif choice == "4":
-            message = "EXIT"
-            client_socket.send(message.encode(FORMAT))
-            break
+            self.send("EXIT")
+            self.state.running = False
 
         else:
             print("Invalid option")
-            continue
+            self.show_menu()
 
-        # Send message to server
-        try:
-            client_socket.send(message.encode(FORMAT))
-        except Exception as e:
-            print(f"\n[ERROR] Failed to send message: {e}")
-            break
+    def send_command(self, message):
+        """Send a menu command; the menu returns once it is answered"""
+        self.state.awaiting_reply = True
+        self.send(message)
 
-        time.sleep(0.3)
-
-    # Close connection
-    try:
-        client_socket.close()
-    except:
-        pass
-    print("\nCLOSING CONNECTION...")
-
-def ask_for_move():
-    """
-    Prompts the player for a move and sends it to the server.
-    Runs in a separate thread.
-    """
-    global waiting_for_move, game_active
-    
-    if not game_active:
-        return
-    
-    waiting_for_move = True
-    print("\nIt is your turn!")
-    
-    # Safe input function that stops if the game ends
-    row, col = read_move_safe(board_size, lambda: game_active)
-
-    # Game aborted during input
-    if row is None or col is None:
-        waiting_for_move = False
-        return
-
-    if not game_active:
-        waiting_for_move = False
-        return
-
-    # Convert input to integers
-    try:
-        r = int(row)
-        c = int(col)
-        msg = f"MOVE {r} {c}"
-    except (ValueError, TypeError):
-        if not game_active:
-            waiting_for_move = False
+    def submit_move(self, row_text, col_text):
+        """Validate a typed move and send it, or ask again"""
+        size = self.state.board_size
+        try:
+            row = int(row_text)
+            col = int(col_text)
+        except ValueError:
+            print("Please enter valid numbers")
+            row = col = None
+
+        if row is not None and size is not None:
+            if row < 0 or row >= size:
+                print(f"Row must be between 0 and {size - 1}")
+                row = None
+            elif col < 0 or col >= size:
+                print(f"Column must be between 0 and {size - 1}")
+                row = None
+
+        if row is None:
+            print("\nEnter your move:")
+            self.ask("row", "  Row: ")
             return
-        print("Invalid input, please try again")
-        waiting_for_move = False
-        ask_for_move()  # Try again
-        return
-    
-    if not game_active:
-        waiting_for_move = False
-        return
-    
-    # Send move to server
-    try:
-        client_socket.send(msg.encode(FORMAT))
-    except Exception as e:
-        print(f"\n[ERROR] Failed to send move: {e}")
-    
-    waiting_for_move = False
-
-def handle_server_message(data):
-    """
-    Handles raw data received from the server.
-    Supports multiple messages in a single packet.
-    """
-    global in_game, board_size
-    
-    if data.startswith("BOARD"):
-        handle_single_message(data.strip())
-        return
-    
-    messages = data.strip().split('\n')
-    
-    for message in messages:
-        message = message.strip()
-        if not message:
-            continue
-        
-        handle_single_message(message)
-
-def handle_single_message(message):
-    """
-    Handles a single server message.
-    """
-    global in_game, board_size, game_active
-    
-    # List available games
-    if message.startswith("GAMES"):
-        games = message[6:].strip()
-        print("\nAvailable games:")
-        if games:
-            game_list = games.split()
-            print("  ID | Players | Joined")
-            print("  " + "-" * 25)
-            for game in game_list:
-                parts = game.split(':')
-                if len(parts) == 3:
-                    gid, total, joined = parts
-                    print(f"  {gid:2} | {total:7} | {joined:6}")
-        else:
-            print("  No available games")
-        return
-
-    # Game created
-    if message.startswith("CREATED"):
-        parts = message.split()
-        if len(parts) >= 2:
-            print(f"\nGame created successfully. Game ID: {parts[1]}")
-        return
-
-    # Joined game
-    if message.startswith("JOINED"):
-        in_game = True
-        game_active = True
-        parts = message.split()
-        if len(parts) >= 2:
-            print(f"\nYou joined the game as: {parts[1]}")
-        return
-
-    # Waiting for players
-    if message.startswith("WAIT"):
-        print("\nWaiting for other players to join...")
-        return
-
-    # Player's turn
-    if message.startswith("YOURTURN"):
-        if game_active:
-            threading.Thread(target=ask_for_move, daemon=True).start()
-        return
-
-    # Board state
-    if message.startswith("BOARD"):
-        parts = message.split("\n")
-        board_part = ["BOARD"]
-        rest = []
-
-        for line in parts[1:]:
-            if line in ["YOURTURN", "WIN", "LOSE", "DRAW", "BYE"]:
-                rest.append(line)
-            else:
-                board_part.append(line)
 
-        size = print_board_text("\n".join(board_part))
-        if size is not None:
-            board_size = size
-
-        for cmd in rest:
-            handle_server_message(cmd)
-        return
-
-    # Invalid move
-    if message.startswith("INVALID"):
-        reason = message[8:].strip() if len(message) > 8 else "Unknown reason"
-        print(f"\nInvalid move: {reason}")
-        print("Please try again.")
-        return
-
-    # Win
-    if message == "WIN":
-        in_game = False
-        game_active = False
-        print("\n" + "=" * 40)
-        print("CONGRATULATIONS! YOU WON! :)")
-        print("=" * 40)
-        return
-
-    # Lose
-    if message == "LOSE":
-        in_game = False
-        game_active = False
-        print("\n" + "=" * 40)
-        print("You lost the game :( Better luck next time!")
-        print("=" * 40)
-        return
-
-    # Draw
-    if message == "DRAW":
-        in_game = False
-        game_active = False
-        print("\n" + "=" * 40)
-        print("Game ended in a draw.")
-        print("=" * 40)
-        return
-
-    # Disconnected
-    if message == "BYE":
-        print("\nDisconnected from server.")
-        print("Returning to main menu...")
-        return
-
-    # Player left the game
-    if message.startswith("PLAYER_LEFT"):
-        print("\nA player has left the game.")
-        return
-
-    # Game aborted
-    if message == "GAME_ABORTED":
-        print("\nGame aborted (not enough players).")
-        in_game = False
-        game_active = False
-        return
-
-    # Unknown message
-    if message:
-        print(f"\n{message}")
+        self.send(f"MOVE {row} {col}")
 
-if __name__ == "__main__":
-    # Create TCP socket
-    client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+
+def main():
+    """Client entry point"""
+    parser = argparse.ArgumentParser(description="Tic-Tac-Toe client")
+    parser.add_argument("--host", default=HOST, help="server address")
+    parser.add_argument("--port", type=int, default=PORT, help="server port")
+    args = parser.parse_args()
 
     print("=" * 50)
     print("WELCOME TO TIC-TAC-TOE")
     print("=" * 50)
 
-    start_client()
-    print("\nGoodbye!")
\ No newline at end of file
+    Client(args.host, args.port).run()
+    print("\nGoodbye!")
+
+
+if __name__ == "__main__":
+    main()
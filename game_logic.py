@@ -3,30 +3,197 @@ Tic-Tac-Toe Game Logic
 flat implementation for a multi-player game
 """
 
-# List of symbols assigned to players (supports up to 13 players)
-SYMBOLS = ['X', 'O', '△', '𝄞', '✿', '♕', '♖', '☀︎', '♥', '♣', '♦', '♠', '♫']
+import random
+import threading
+import time
+
+# Symbols assigned to players (supports up to 13 players).
+# Shared by all games; a game with N players uses the first N symbols.
+SYMBOLS = ('X', 'O', '△', '𝄞', '✿', '♕', '♖', '☀︎', '♥', '♣', '♦', '♠', '♫')
+
+# Dictionary: symbol - its index in SYMBOLS (and in Game.symbol_masks)
+SYMBOL_INDEX = {symbol: i for i, symbol in enumerate(SYMBOLS)}
+
+# UTF-8 encoding of each symbol (patched into the cached board bytes)
+SYMBOL_BYTES = tuple(symbol.encode("utf-8") for symbol in SYMBOLS)
+
+# Cell value of a free square in Game.get_cell_indices()
+EMPTY_INDEX = 0xFF
+
+# Number of identical symbols in a row needed to win
+WIN_LENGTH = 3
+
+# Line directions: row, column, both diagonals
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+# Supported board sizes (players + 1)
+MIN_BOARD_SIZE = 3
+MAX_BOARD_SIZE = 14
+
+
+def build_win_masks(size):
+    """
+    Build the winning-line bitmasks for a board of the given size.
+    Cell (row, col) is bit row * size + col.
+    
+    Returns:
+        (all_masks, cell_masks)
+        all_masks: tuple of every 3-in-a-row mask on the board
+        cell_masks: tuple indexed by cell, holding the masks through that cell
+    """
+    all_masks = []
+    cell_masks = [[] for _ in range(size * size)]
+    
+    for row in range(size):
+        for col in range(size):
+            for d_row, d_col in DIRECTIONS:
+                end_row = row + d_row * (WIN_LENGTH - 1)
+                end_col = col + d_col * (WIN_LENGTH - 1)
+                if not (0 <= end_row < size and 0 <= end_col < size):
+                    continue
+                
+                cells = [(row + d_row * i) * size + (col + d_col * i)
+                         for i in range(WIN_LENGTH)]
+                mask = 0
+                for cell in cells:
+                    mask |= 1 << cell
+                
+                all_masks.append(mask)
+                for cell in cells:
+                    cell_masks[cell].append(mask)
+    
+    return tuple(all_masks), tuple(tuple(masks) for masks in cell_masks)
+
+
+# Winning-line tables for every supported board size, built once at import
+WIN_MASKS = {size: build_win_masks(size)
+             for size in range(MIN_BOARD_SIZE, MAX_BOARD_SIZE + 1)}
+
+# Zobrist hashing: a position's key is the XOR of one random 64-bit
+# number per occupied (cell, symbol)
+KEY_BITS = 64
+KEY_MASK = (1 << KEY_BITS) - 1
+ZOBRIST_SEED = 0x7A3C       # Fixed seed: keys are identical in every process
+
+# The 8 symmetries of a square board, as functions of (row, col, size)
+SYMMETRIES = (
+    lambda r, c, n: (r, c),                     # identity
+    lambda r, c, n: (c, n - 1 - r),             # rotate 90
+    lambda r, c, n: (n - 1 - r, n - 1 - c),     # rotate 180
+    lambda r, c, n: (n - 1 - c, r),             # rotate 270
+    lambda r, c, n: (r, n - 1 - c),             # mirror left-right
+    lambda r, c, n: (n - 1 - r, c),             # mirror top-bottom
+    lambda r, c, n: (c, r),                     # transpose
+    lambda r, c, n: (n - 1 - c, n - 1 - r),     # anti-transpose
+)
+
+
+def build_zobrist(size):
+    """
+    Build the Zobrist tables for a board of the given size
+    (symbols of a size-1 player game).
+    
+    Returns:
+        (keys, symmetry_keys)
+        keys: keys[cell][symbol_index], random 64-bit numbers
+        symmetry_keys: symmetry_keys[cell][symbol_index], the keys of the
+            cell's image under each of the 8 SYMMETRIES packed into one
+            integer (symmetry t in bits 64*t .. 64*t+63), so a single XOR
+            updates the position's key in all 8 orientations
+    """
+    rng = random.Random(ZOBRIST_SEED + size)
+    cells = size * size
+    keys = tuple(tuple(rng.getrandbits(KEY_BITS) for _ in range(size - 1))
+                 for _ in range(cells))
+    
+    images = [[row * size + col for row, col in
+               (transform(cell // size, cell % size, size) for cell in range(cells))]
+              for transform in SYMMETRIES]
+    symmetry_keys = tuple(
+        tuple(sum(keys[image[cell]][index] << (KEY_BITS * t)
+                  for t, image in enumerate(images))
+              for index in range(size - 1))
+        for cell in range(cells))
+    
+    return keys, symmetry_keys
+
+
+# Zobrist tables for every supported board size, built once at import
+ZOBRIST = {size: build_zobrist(size)
+           for size in range(MIN_BOARD_SIZE, MAX_BOARD_SIZE + 1)}
 
 class Player:
     """
     Represents a single player in the game.
-    Holds the socket connection, address, and assigned symbol.
+    Holds the socket connection, address, assigned symbol,
+    the player's position in the game's players list and the
+    secret token that reclaims the seat after a server restart.
     """
-    def __init__(self, conn, addr, symbol):
+    __slots__ = ("conn", "addr", "symbol", "index", "token")
+    
+    def __init__(self, conn, addr, symbol, index=0, token=0):
         self.conn = conn      # Client socket connection
         self.addr = addr      # Client address (IP, port)
         self.symbol = symbol  # Player's symbol on the board
+        self.index = index    # Index in Game.players (kept up to date)
+        self.token = token    # Seat token (0 for a computer player)
     
     def __repr__(self):
         return f"Player({self.symbol}, {self.addr})"
 
+class BoardCache:
+    """
+    Renderings of a game's board at one version of the game, each built
+    on first use. make_move patches the played cell into the renderings
+    that exist: the encoded text is split only down to the played row,
+    which alone is re-joined. The new bytes still copy every row (O(board)
+    bytes), because the old ones may be queued on sockets and must not
+    change. Only the bytes sent to clients are kept, not the text they
+    were encoded from (a str holding '𝄞' takes 4 bytes per character).
+    """
+    __slots__ = ("version", "data", "indices")
+    
+    def __init__(self, game):
+        self.version = game.version
+        self.data = None                  # get_board_bytes()
+        self.indices = None               # get_cell_indices()
+    
+    def place(self, row, col, index, size):
+        """Record a mark of symbol index at (row, col)"""
+        if self.data is not None:
+            # "BOARD", the rows down to the played one, then the rest
+            lines = self.data.split(b"\n", row + 2)
+            cells = lines[row + 1].split(b" ")
+            cells[col] = SYMBOL_BYTES[index]
+            lines[row + 1] = b" ".join(cells)
+            self.data = b"\n".join(lines)
+        if self.indices is not None:
+            cell = row * size + col
+            self.indices = self.indices[:cell] + bytes((index,)) + self.indices[cell + 1:]
+
 class Game:
     """
     Tic-Tac-Toe game logic class.
     
     Board size = number of players + 1
     Win condition: 3 identical symbols in a row (row / column / diagonal)
+    
+    Memory budget (measured with `python benchmark.py memory`):
+    0.6-0.85 KB per waiting game and 0.9-2.6 KB per active game
+    (2 to 13 players, including the encoded board), excluding the
+    client sockets themselves. The server frees the board cache of a
+    finished game.
     """
     
+    __slots__ = (
+        "game_id", "num_players", "players", "board_size",
+        "symbol_masks", "occupied", "all_win_masks", "cell_win_masks",
+        "position_keys", "symmetry_keys",
+        "current_turn", "started", "ended", "winner", "move_count",
+        "result", "created_at", "ended_at", "available_symbols", "lock",
+        "spectators", "version", "board_cache",
+    )
+    
     def __init__(self, game_id, num_players):
         """
         Initialize a new game instance.
@@ -45,18 +212,40 @@ class Game:
         # Board size is players + 1
         self.board_size = num_players + 1
         
-        # Initialize empty board ('.' means empty cell)
-        self.board = [['.' for _ in range(self.board_size)]
-                      for _ in range(self.board_size)]
+        # Board as bitboards: one mask per symbol (indexed like SYMBOLS)
+        # plus an occupancy mask (cell (row, col) is bit row * board_size + col)
+        self.symbol_masks = [0] * num_players
+        self.occupied = 0
+        self.all_win_masks, self.cell_win_masks = WIN_MASKS[self.board_size]
+        
+        # Zobrist keys of the position in all 8 orientations, packed as
+        # in build_zobrist and updated with one XOR per move
+        self.position_keys = 0
+        self.symmetry_keys = ZOBRIST[self.board_size][1]
         
         self.current_turn = 0     # Index of current player in players list
         self.started = False      # True once all players joined
         self.ended = False        # True when game ends
         self.winner = None        # Winning Player object
         self.move_count = 0       # Total number of moves played
+        self.result = None        # "win", "draw" or "abort" once ended
+        self.created_at = time.time()
+        self.ended_at = None      # Time the game ended
+        
+        # Available symbols pool (only as many as there are seats)
+        self.available_symbols = list(SYMBOLS[:num_players])
+        
+        # Serializes access to this game when shared between threads
+        self.lock = threading.Lock()
         
-        # Available symbols pool
-        self.available_symbols = SYMBOLS[:]
+        # Connections watching the game, set by the server on the first
+        # WATCH: server.Spectators, grouped by update form
+        self.spectators = None
+        
+        # Bumped on every board change; the rendered board is cached
+        # for the current version (built when first needed)
+        self.version = 0
+        self.board_cache = None
     
     def is_full(self):
         """Return True if the game already has all required players"""
@@ -85,7 +274,7 @@ class Game:
             return False, "No symbols available"
 
         symbol = self.available_symbols.pop(0)
-        player = Player(conn, addr, symbol)
+        player = Player(conn, addr, symbol, len(self.players))
         self.players.append(player)
         
         # Start the game when all players have joined
@@ -105,6 +294,11 @@ class Game:
         current = self.get_current_player()
         return current is not None and current.conn == conn
     
+    def is_turn_of(self, player):
+        """Check if it is the given player's turn (no connection lookup)"""
+        return (self.started and not self.ended and
+                self.players[self.current_turn] is player)
+    
     def make_move(self, conn, row, col):
         """
         Execute a move on behalf of a player.
@@ -124,23 +318,37 @@ class Game:
             return "invalid", "Out of bounds"
         
         # Validate cell is empty
-        if self.board[row][col] != '.':
+        cell = row * self.board_size + col
+        bit = 1 << cell
+        if self.occupied & bit:
             return "invalid", "Cell already occupied"
         
         # Execute the move
         current_player = self.get_current_player()
-        self.board[row][col] = current_player.symbol
+        symbol = current_player.symbol
+        index = SYMBOL_INDEX[symbol]
+        mask = self.symbol_masks[index] | bit
+        self.symbol_masks[index] = mask
+        self.occupied |= bit
+        self.position_keys ^= self.symmetry_keys[cell][index]
         self.move_count += 1
         
-        # Check for win condition
-        if self.check_win(current_player.symbol):
-            self.ended = True
+        # Patch the cached board unless it is older than the last version
+        self.version += 1
+        cache = self.board_cache
+        if cache is not None and cache.version == self.version - 1:
+            cache.place(row, col, index, self.board_size)
+            cache.version = self.version
+        
+        # Check for win condition (only lines through the played cell)
+        if self._wins_through(mask, cell):
+            self.end("win")
             self.winner = current_player
             return "win", current_player.symbol
         
         # Check for draw (board is full)
         if self.move_count == self.board_size * self.board_size:
-            self.ended = True
+            self.end("draw")
             return "draw", None
         
         # Advance turn to next player
@@ -148,53 +356,198 @@ class Game:
         
         return "success", None
     
+    def restore(self, seats, symbol_masks, current_turn, started, available_symbols):
+        """
+        Set the players, board and turn of a game saved in a snapshot,
+        without replaying its moves.
+        
+        Args:
+            seats: (conn, addr, symbol, token) per player, in turn order
+            symbol_masks: Bitboard per symbol index
+            current_turn: Index of the player to move
+            started: True if the game had started
+            available_symbols: Free symbols, in the order they are handed out
+        """
+        self.players = [Player(conn, addr, symbol, index, token)
+                        for index, (conn, addr, symbol, token) in enumerate(seats)]
+        self.available_symbols = list(available_symbols)
+        self.started = started
+        self.current_turn = current_turn
+        self.symbol_masks = list(symbol_masks)
+        
+        # Occupancy, move count and Zobrist keys follow from the masks
+        occupied = 0
+        keys = 0
+        symmetry_keys = self.symmetry_keys
+        for index, mask in enumerate(self.symbol_masks):
+            occupied |= mask
+            while mask:
+                low = mask & -mask
+                keys ^= symmetry_keys[low.bit_length() - 1][index]
+                mask ^= low
+        self.occupied = occupied
+        self.move_count = occupied.bit_count()
+        self.position_keys = keys
+        self.version += 1
+    
+    def undo_move(self, row, col):
+        """
+        Take back the last move, played at (row, col).
+        Restores the board, its keys, the turn and a win or draw the
+        move produced (for analysis and search; not a server command).
+        
+        Returns:
+            True if the move was undone
+        """
+        cell = row * self.board_size + col
+        bit = 1 << cell
+        if not self.occupied & bit:
+            return False
+        
+        for index, mask in enumerate(self.symbol_masks):
+            if mask & bit:
+                break
+        self.symbol_masks[index] = mask ^ bit
+        self.occupied ^= bit
+        self.position_keys ^= self.symmetry_keys[cell][index]
+        self.move_count -= 1
+        self.version += 1
+        
+        # A finishing move did not advance the turn
+        if self.result in ("win", "draw"):
+            self.ended = False
+            self.result = None
+            self.winner = None
+            self.ended_at = None
+        else:
+            self.current_turn = (self.current_turn - 1) % len(self.players)
+        return True
+    
+    @property
+    def zobrist_key(self):
+        """64-bit Zobrist key of the position (the board as it is oriented)"""
+        return self.position_keys & KEY_MASK
+    
+    def canonical_key(self):
+        """
+        Zobrist key shared by the position and its rotations and
+        reflections: the smallest of its 8 orientation keys.
+        """
+        keys = self.position_keys
+        return min((keys >> (KEY_BITS * t)) & KEY_MASK
+                   for t in range(len(SYMMETRIES)))
+    
+    def end(self, result):
+        """Mark the game as ended with the given result (first result wins)"""
+        if not self.ended:
+            self.ended = True
+            self.result = result
+            self.ended_at = time.time()
+    
     def check_win(self, symbol):
         """
         Check whether the given symbol has won the game
         (3 consecutive symbols in any direction)
         """
-        # Check rows
-        for row in range(self.board_size):
-            for col in range(self.board_size - 2):
-                if (self.board[row][col] == symbol and
-                    self.board[row][col + 1] == symbol and
-                    self.board[row][col + 2] == symbol):
-                    return True
-        
-        # Check columns
-        for col in range(self.board_size):
-            for row in range(self.board_size - 2):
-                if (self.board[row][col] == symbol and
-                    self.board[row + 1][col] == symbol and
-                    self.board[row + 2][col] == symbol):
-                    return True
-        
-        # Check diagonal (top-left to bottom-right)
-        for row in range(self.board_size - 2):
-            for col in range(self.board_size - 2):
-                if (self.board[row][col] == symbol and
-                    self.board[row + 1][col + 1] == symbol and
-                    self.board[row + 2][col + 2] == symbol):
-                    return True
-        
-        # Check diagonal (top-right to bottom-left)
-        for row in range(self.board_size - 2):
-            for col in range(2, self.board_size):
-                if (self.board[row][col] == symbol and
-                    self.board[row + 1][col - 1] == symbol and
-                    self.board[row + 2][col - 2] == symbol):
-                    return True
+        index = SYMBOL_INDEX.get(symbol)
+        if index is None or index >= self.num_players:
+            return False
+        
+        mask = self.symbol_masks[index]
+        for win_mask in self.all_win_masks:
+            if mask & win_mask == win_mask:
+                return True
+        return False
+    
+    def check_win_at(self, row, col):
+        """
+        Check whether the symbol at (row, col) completes 3 in a row
+        on one of the lines passing through that cell.
+        Only the last move can create a new win, so this is enough
+        after every move (check_win remains the full-board verifier).
+        """
+        symbol = self.get_cell(row, col)
+        if symbol == '.':
+            return False
         
+        return self._wins_through(self.symbol_masks[SYMBOL_INDEX[symbol]],
+                                  row * self.board_size + col)
+    
+    def _wins_through(self, mask, cell):
+        """Return True if mask covers a winning line through the given cell"""
+        for win_mask in self.cell_win_masks[cell]:
+            if mask & win_mask == win_mask:
+                return True
         return False
     
+    def get_cell(self, row, col):
+        """Return the symbol at (row, col), or '.' if the cell is empty"""
+        bit = 1 << (row * self.board_size + col)
+        if self.occupied & bit:
+            for index, mask in enumerate(self.symbol_masks):
+                if mask & bit:
+                    return SYMBOLS[index]
+        return '.'
+    
+    def get_cells(self):
+        """Return a flat row-major list of cell symbols ('.' for empty)"""
+        cells = ['.'] * (self.board_size * self.board_size)
+        for symbol, mask in zip(SYMBOLS, self.symbol_masks):
+            while mask:
+                low = mask & -mask
+                cells[low.bit_length() - 1] = symbol
+                mask ^= low
+        return cells
+    
+    @property
+    def board(self):
+        """The board as a list of rows (a fresh copy built from the bitboards)"""
+        cells = self.get_cells()
+        size = self.board_size
+        return [cells[i:i + size] for i in range(0, size * size, size)]
+    
+    def cached_board(self):
+        """Return the BoardCache of the current version"""
+        cache = self.board_cache
+        if cache is None or cache.version != self.version:
+            cache = self.board_cache = BoardCache(self)
+        return cache
+    
     def get_board_string(self):
         """
-        Return the board as a string.
+        Return the board as a string: "BOARD", then one line per row.
+        Decoded from get_board_bytes() (the text itself is not cached).
+        """
+        return self.get_board_bytes()[:-1].decode("utf-8")
+    
+    def get_board_bytes(self):
+        """
+        Return the board as UTF-8 lines, each ending in a newline,
+        ready for a text client. Encoded once per version.
         """
-        lines = ["BOARD"]
-        for row in self.board:
-            lines.append(" ".join(row))
-        return "\n".join(lines)
+        cache = self.cached_board()
+        if cache.data is None:
+            cells = self.get_cells()
+            size = self.board_size
+            rows = (" ".join(cells[i:i + size]) for i in range(0, size * size, size))
+            cache.data = ("BOARD\n" + "\n".join(rows) + "\n").encode("utf-8")
+        return cache.data
+    
+    def get_cell_indices(self):
+        """
+        Return the board as bytes, one per cell in row-major order:
+        the symbol's index, or EMPTY_INDEX for a free cell.
+        """
+        cache = self.cached_board()
+        if cache.indices is None:
+            indices = bytearray([EMPTY_INDEX]) * (self.board_size * self.board_size)
+            for index, mask in enumerate(self.symbol_masks):
+                while mask:
+                    low = mask & -mask
+                    indices[low.bit_length() - 1] = index
+                    mask ^= low
+            cache.indices = bytes(indices)
+        return cache.indices
     
     def get_player_by_conn(self, conn):
         """Return the Player object associated with the given connection"""
@@ -217,16 +570,20 @@ class Game:
 
         self.players.remove(player)
         self.available_symbols.append(player.symbol)
+        
+        # Keep player indices in sync with the list
+        for i in range(player.index, len(self.players)):
+            self.players[i].index = i
 
         # No players left → abort game
         if len(self.players) == 0:
-            self.ended = True
+            self.end("abort")
             return "abort"
 
         # Adjust game state if game already started
         if self.started and not self.ended:
             if len(self.players) <= 1:
-                self.ended = True
+                self.end("abort")
                 return "abort"
 
             # Fix current turn index if needed
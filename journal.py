@@ -0,0 +1,354 @@
+"""
+Tic-Tac-Toe Game Journal
+Append-only binary log of game events, replayed after a crash
+"""
+
+import os
+import shutil
+import struct
+import threading
+from serverlog import log
+
+MAGIC = b"TTTJ"             # File signature
+VERSION = 1                 # Record format version
+COMMIT_INTERVAL = 0.005     # Seconds between group commits
+COMMIT_SIZE = 64 * 1024     # Buffered bytes that trigger an early commit
+PREVIOUS_SUFFIX = ".prev"   # Segment kept until the next snapshot is written
+
+# Record types
+CREATE = 1      # game_id, players
+JOIN = 2        # game_id, symbol index, seat token (0 = computer player)
+MOVE = 3        # game_id, row, col
+LEAVE = 4       # game_id, symbol index
+END = 5         # game_id (finished or aborted: nothing to recover)
+ROTATE = 6      # snapshot generation (first record of a new segment)
+SNAP = 7        # game_id, snapshot generation (game saved in that snapshot)
+
+# Record layouts: type u8, game_id u32, payload (fixed per type)
+RECORDS = {
+    CREATE: struct.Struct(">BIB"),
+    JOIN: struct.Struct(">BIBQ"),
+    MOVE: struct.Struct(">BIBB"),
+    LEAVE: struct.Struct(">BIB"),
+    END: struct.Struct(">BI"),
+    ROTATE: struct.Struct(">BI"),
+    SNAP: struct.Struct(">BII"),
+}
+
+HEADER = MAGIC + bytes((VERSION,))
+
+
+class JournalError(Exception):
+    """Raised for a file that is not a journal of this version"""
+
+
+class Journal:
+    """
+    Append-only journal of game events with group commit.
+
+    Command threads only pack a record into an in-memory buffer. A
+    background thread writes everything buffered so far with one
+    write() (and one fsync() if enabled) every COMMIT_INTERVAL, or
+    sooner once COMMIT_SIZE bytes are waiting. A crash loses at most the
+    last commit interval of events.
+
+    Events of one game are appended under that game's lock, so they
+    reach the file in the order they were applied.
+
+    Snapshots rotate the journal in two steps. mark_rotation() only
+    seals the buffer and starts the next one with a ROTATE record, so
+    it is cheap enough to run under the server's games_lock. rotate()
+    then does the file work: the current segment becomes
+    path + PREVIOUS_SUFFIX and a new file receives the records from the
+    ROTATE record on. The previous segment is deleted once the snapshot
+    is on disk.
+
+    A failed write or fsync (disk full, I/O error) stops the journal:
+    the error is logged, buffered records are dropped and new ones are
+    not buffered, so memory stays bounded. The next snapshot rotation
+    starts a fresh segment and resumes journaling; the snapshot covers
+    the events lost in between.
+    """
+
+    def __init__(self, path, fsync=False, interval=COMMIT_INTERVAL):
+        self.path = path
+        self.fsync = fsync
+        self.interval = interval
+
+        self.buffer = bytearray()
+        self.sealed = None          # Records of the segment being rotated out
+        self.resuming = False       # Rotating out a failed segment
+        self.lock = threading.Lock()          # Guards buffer, sealed
+        self.write_lock = threading.Lock()    # Guards fd (commit vs rotate)
+        self.wakeup = threading.Event()
+        self.running = False
+        self.thread = None
+        self.failed = False         # Stopped by a write error until the next rotation
+
+        # Statistics
+        self.records = 0
+        self.commits = 0
+
+        self.fd = None
+        self.size = 0               # File length after the last complete commit
+
+    def open(self, offset=None):
+        """
+        Open the file for appending, creating it with a header if needed.
+
+        Args:
+            offset: End of the last complete record (from replay); a torn
+                    record after it is cut off before appending
+        """
+        self.fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        if offset is not None:
+            os.ftruncate(self.fd, offset)
+        if os.fstat(self.fd).st_size == 0:
+            os.write(self.fd, HEADER)
+        self.size = os.fstat(self.fd).st_size
+
+    def start(self):
+        """Start the commit thread"""
+        if self.fd is None:
+            self.open()
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def append(self, record_type, *fields):
+        """Buffer one record"""
+        data = RECORDS[record_type].pack(record_type, *fields)
+        with self.lock:
+            if self.failed:
+                return
+            self.buffer += data
+            self.records += 1
+            if len(self.buffer) >= COMMIT_SIZE:
+                self.wakeup.set()
+
+    def create(self, game_id, num_players):
+        """Record a new game"""
+        self.append(CREATE, game_id, num_players)
+
+    def join(self, game_id, symbol_index, token):
+        """Record a seat taken (token 0 for a computer player)"""
+        self.append(JOIN, game_id, symbol_index, token)
+
+    def move(self, game_id, row, col):
+        """Record a move"""
+        self.append(MOVE, game_id, row, col)
+
+    def leave(self, game_id, symbol_index):
+        """Record a player leaving"""
+        self.append(LEAVE, game_id, symbol_index)
+
+    def end(self, game_id):
+        """Record that a game finished or was aborted"""
+        self.append(END, game_id)
+
+    def snap(self, game_id, generation):
+        """Record that a game was saved in a snapshot (caller holds game.lock)"""
+        self.append(SNAP, game_id, generation)
+
+    def mark_rotation(self, generation):
+        """
+        Start the segment for the snapshot of the given generation: the
+        records buffered so far stay in the current segment, the ones
+        appended from now on follow a ROTATE record in the next one.
+        Only swaps buffers (caller holds server.games_lock); rotate()
+        does the file work. A failed journal buffers records again.
+        """
+        with self.lock:
+            if self.sealed is None:
+                self.sealed = self.buffer
+            else:
+                self.sealed += self.buffer
+            self.buffer = bytearray(RECORDS[ROTATE].pack(ROTATE, generation))
+            self.resuming, self.failed = self.resuming or self.failed, False
+
+    def rotate(self):
+        """
+        Move the segment sealed by mark_rotation() aside and open the
+        next one. If the last snapshot failed, the previous segment is
+        still needed and the current one is appended to it instead of
+        replacing it.
+
+        Raises:
+            OSError if the new segment could not be started (the journal
+            is then failed)
+        """
+        previous = self.path + PREVIOUS_SUFFIX
+        with self.write_lock:
+            with self.lock:
+                sealed, self.sealed = self.sealed, None
+                resuming, self.resuming = self.resuming, False
+            if sealed is None:
+                return
+            try:
+                if self.fd is not None:
+                    # A failed segment already ends at its last good commit
+                    try:
+                        if not resuming:
+                            if sealed:
+                                self.write(sealed)
+                            if self.fsync:
+                                os.fsync(self.fd)
+                    finally:
+                        os.close(self.fd)
+                        self.fd = None
+
+                if not os.path.exists(self.path):
+                    pass    # Lost with an earlier failed rotation
+                elif os.path.exists(previous):
+                    with open(self.path, "rb") as current, open(previous, "ab") as old:
+                        current.seek(len(HEADER))
+                        shutil.copyfileobj(current, old)
+                    os.remove(self.path)
+                else:
+                    os.rename(self.path, previous)
+
+                self.open()
+            except OSError as e:
+                self.fail(e)
+                raise
+
+        if resuming:
+            log.warning("JOURNAL RESUMED", "%s: new segment after the failure",
+                        self.path)
+
+    def drop_previous(self):
+        """Delete the previous segment (its snapshot is on disk)"""
+        try:
+            os.remove(self.path + PREVIOUS_SUFFIX)
+        except FileNotFoundError:
+            pass
+
+    def run(self):
+        """Commit loop"""
+        while self.running:
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            self.commit()
+        self.commit()
+
+    def commit(self):
+        """Write out everything buffered so far"""
+        with self.write_lock:
+            with self.lock:
+                # A marked rotation must open the next segment first
+                if not self.buffer or self.fd is None or self.sealed is not None:
+                    return
+                data, self.buffer = self.buffer, bytearray()
+            try:
+                self.write(data)
+                if self.fsync:
+                    os.fsync(self.fd)
+            except OSError as e:
+                self.fail(e)
+                return
+            self.commits += 1
+
+    def write(self, data):
+        """Write data at the end of the file (os.write may write less)"""
+        view = memoryview(data)
+        while view:
+            view = view[os.write(self.fd, view):]
+        self.size += len(data)
+
+    def fail(self, error):
+        """
+        Stop journaling after a write error (caller holds write_lock):
+        drop the buffer, stop buffering and cut off a torn record
+        """
+        with self.lock:
+            self.failed = True
+            self.buffer = bytearray()
+            self.sealed = None
+        if self.fd is not None:
+            try:
+                os.ftruncate(self.fd, self.size)
+            except OSError:
+                pass
+        log.error("JOURNAL FAILED", "%s: %s (stopped until the next snapshot)",
+                  self.path, error)
+
+    def close(self):
+        """Commit what is left and close the file"""
+        if self.running:
+            self.running = False
+            self.wakeup.set()
+            self.thread.join()
+        if self.fd is not None:
+            self.commit()
+            os.close(self.fd)
+            self.fd = None
+
+
+class NullJournal:
+    """Stand-in used when journaling is disabled"""
+
+    def create(self, game_id, num_players):
+        pass
+
+    def join(self, game_id, symbol_index, token):
+        pass
+
+    def move(self, game_id, row, col):
+        pass
+
+    def leave(self, game_id, symbol_index):
+        pass
+
+    def end(self, game_id):
+        pass
+
+    def snap(self, game_id, generation):
+        pass
+
+    def mark_rotation(self, generation):
+        pass
+
+    def rotate(self):
+        pass
+
+    def drop_previous(self):
+        pass
+
+    def start(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def read_journal(path):
+    """
+    Read every complete record of a journal.
+
+    Returns:
+        (records, offset)
+        records: list of tuples (type, game_id, *payload)
+        offset: end of the last complete record; anything after it is
+                a record torn by a crash
+
+    Raises:
+        JournalError if the file is not a journal of this version
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+
+    if not data:
+        return [], None
+    if data[:len(HEADER)] != HEADER:
+        raise JournalError(f"{path}: not a version {VERSION} journal")
+
+    records = []
+    pos, end = len(HEADER), len(data)
+    while pos < end:
+        layout = RECORDS.get(data[pos])
+        if layout is None or pos + layout.size > end:
+            break
+        records.append(layout.unpack_from(data, pos))
+        pos += layout.size
+
+    return records, pos
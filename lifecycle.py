@@ -0,0 +1,106 @@
+"""
+Tic-Tac-Toe Game Lifecycle
+Evicts finished games from the server and archives a compact summary
+"""
+
+import threading
+import time
+from collections import deque, namedtuple
+from serverlog import log
+
+FINISHED_GRACE_PERIOD = 60.0  # Seconds a finished game stays registered
+ARCHIVE_SIZE = 10000          # Finished game summaries kept in memory
+REAP_INTERVAL = 1.0           # Seconds between eviction sweeps
+
+# Compact record of a finished game
+GameSummary = namedtuple(
+    "GameSummary",
+    ["game_id", "symbols", "result", "winner", "move_count", "duration"]
+)
+
+
+class GameReaper:
+    """
+    Removes finished (WIN / DRAW) games from the server registry once
+    their grace period has passed and keeps a bounded archive of
+    summaries.
+
+    Games are queued when they finish, in finishing order, so each sweep
+    only looks at games whose grace period has expired.
+    """
+
+    def __init__(self, server, grace_period=FINISHED_GRACE_PERIOD,
+                 archive_size=ARCHIVE_SIZE, interval=REAP_INTERVAL):
+        self.server = server
+        self.grace_period = grace_period
+        self.interval = interval
+
+        self.pending = deque()                     # (deadline, Game, GameSummary)
+        self.archive = deque(maxlen=archive_size)  # Latest GameSummary records
+        self.reaped = 0                            # Total games evicted
+        self.lock = threading.Lock()
+
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    def game_finished(self, game):
+        """
+        Schedule a finished game for eviction.
+        Called by the server while it holds game.lock.
+        """
+        summary = summarize(game)
+        with self.lock:
+            self.pending.append(
+                (time.monotonic() + self.grace_period, game, summary))
+
+    def reap(self, now=None):
+        """
+        Evict every finished game whose grace period has expired.
+
+        Returns:
+            Number of games evicted by this sweep
+        """
+        now = time.monotonic() if now is None else now
+        expired = []
+
+        with self.lock:
+            while self.pending and self.pending[0][0] <= now:
+                expired.append(self.pending.popleft())
+
+        for _, game, summary in expired:
+            self.server.unregister_game(game)
+            self.archive.append(summary)
+
+        with self.lock:
+            self.reaped += len(expired)
+
+        return len(expired)
+
+    def start(self):
+        """Run periodic sweeps in a background thread"""
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        """Background sweep loop"""
+        while not self.stop_event.wait(self.interval):
+            count = self.reap()
+            if count:
+                log.info("GAMES REAPED", "%d finished games (%d total, %d archived)",
+                         count, self.reaped, len(self.archive))
+
+    def stop(self):
+        """Stop the background sweeps"""
+        self.stop_event.set()
+
+
+def summarize(game):
+    """Build the archive summary of a finished game"""
+    return GameSummary(
+        game_id=game.game_id,
+        symbols=tuple(player.symbol for player in game.players),
+        result=game.result,
+        winner=game.winner.symbol if game.winner else None,
+        move_count=game.move_count,
+        duration=(game.ended_at or time.time()) - game.created_at,
+    )
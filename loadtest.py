@@ -0,0 +1,286 @@
+"""
+Tic-Tac-Toe Load Generator
+Headless bot clients that play complete games against server.py
+and report throughput and latency as JSON
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import random
+import sys
+import time
+from serverproc import spawn_server
+
+HOST = '127.0.0.1'
+PORT = 5000
+FORMAT = 'utf-8'
+READ_TIMEOUT = 30.0     # Seconds to wait for a server message
+
+
+def percentile(values, pct):
+    """Return the nearest-rank percentile of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+class Stats:
+    """Counters and samples collected across all bots"""
+
+    def __init__(self):
+        self.connections = 0
+        self.connect_rate = None    # Connections/sec in the setup burst
+        self.games = 0
+        self.moves = 0
+        self.invalid_moves = 0
+        self.errors = 0
+        self.latencies = []         # MOVE -> own board update, seconds
+
+    def to_dict(self, elapsed):
+        """Summarize as a JSON-serializable dict"""
+        def ms(value):
+            return None if value is None else round(value * 1000, 3)
+
+        return {
+            "elapsed_sec": round(elapsed, 3),
+            "connections": self.connections,
+            "connections_per_sec": self.connect_rate,
+            "games": self.games,
+            "games_per_sec": round(self.games / elapsed, 1),
+            "moves": self.moves,
+            "moves_per_sec": round(self.moves / elapsed, 1),
+            "invalid_moves": self.invalid_moves,
+            "errors": self.errors,
+            "latency_ms": {
+                "p50": ms(percentile(self.latencies, 50)),
+                "p95": ms(percentile(self.latencies, 95)),
+                "p99": ms(percentile(self.latencies, 99)),
+                "max": ms(max(self.latencies) if self.latencies else None),
+            },
+        }
+
+
+class Bot:
+    """
+    One headless client speaking the text protocol.
+    Keeps a local board and plays random legal moves.
+    """
+
+    def __init__(self, reader, writer, board_size, rng, stats):
+        self.reader = reader
+        self.writer = writer
+        self.board_size = board_size
+        self.rng = rng
+        self.stats = stats
+        self.board = [['.'] * board_size for _ in range(board_size)]
+        self.pending = None     # (row, col, sent_at) of our last MOVE
+
+    def send(self, message):
+        """Queue a command line to the server"""
+        self.writer.write((message + "\n").encode(FORMAT))
+
+    async def read_line(self):
+        """Read one line from the server"""
+        line = await asyncio.wait_for(self.reader.readline(), READ_TIMEOUT)
+        if not line:
+            raise ConnectionError("server closed the connection")
+        return line.decode(FORMAT).strip()
+
+    async def expect(self, prefix):
+        """Read lines until one starts with prefix and return it"""
+        while True:
+            line = await self.read_line()
+            if line.startswith(prefix):
+                return line
+
+    async def play(self):
+        """Play until the game ends"""
+        while True:
+            line = await self.read_line()
+
+            if line == "BOARD":
+                for row in range(self.board_size):
+                    self.board[row] = (await self.read_line()).split()
+                self.move_applied()
+
+            elif line.startswith("MOVED"):
+                _, row, col, symbol, _ = line.split()
+                self.board[int(row)][int(col)] = symbol
+                self.move_applied()
+
+            elif line == "YOURTURN":
+                self.make_move()
+
+            elif line.startswith("INVALID"):
+                self.stats.invalid_moves += 1
+                self.pending = None
+
+            elif line in ("WIN", "LOSE", "DRAW", "GAME_ABORTED"):
+                return line
+
+    def make_move(self):
+        """Pick a random empty cell and send MOVE"""
+        empty = [(r, c) for r in range(self.board_size)
+                 for c in range(self.board_size) if self.board[r][c] == '.']
+        if not empty:
+            return
+        row, col = self.rng.choice(empty)
+        self.pending = (row, col, time.perf_counter())
+        self.send(f"MOVE {row} {col}")
+
+    def move_applied(self):
+        """Record latency once our pending move shows up on the board"""
+        if self.pending is None:
+            return
+        row, col, sent_at = self.pending
+        if self.board[row][col] != '.':
+            self.stats.latencies.append(time.perf_counter() - sent_at)
+            self.stats.moves += 1
+            self.pending = None
+
+    def close(self):
+        """Close the connection"""
+        self.writer.close()
+
+
+async def connect_bots(host, port, count, board_size, rng, stats):
+    """Open `count` connections concurrently and wrap them in bots"""
+    streams = await asyncio.gather(
+        *(asyncio.open_connection(host, port) for _ in range(count)))
+    stats.connections += count
+    return [Bot(reader, writer, board_size, random.Random(rng.random()), stats)
+            for reader, writer in streams]
+
+
+async def play_game(host, port, num_players, delta, rng, stats):
+    """Connect num_players bots, create and fill a game, and play it out"""
+    bots = []
+    try:
+        bots = await connect_bots(host, port, num_players, num_players + 1,
+                                  rng, stats)
+        if delta:
+            for bot in bots:
+                bot.send("HELLO DELTA")
+                await bot.expect("HELLO")
+
+        creator = bots[0]
+        creator.send(f"CREATE {num_players}")
+        game_id = (await creator.expect("CREATED")).split()[1]
+        await creator.expect("WAIT")
+
+        for bot in bots[1:]:
+            bot.send(f"JOIN {game_id}")
+            await bot.expect("JOINED")
+
+        await asyncio.gather(*(bot.play() for bot in bots))
+        stats.games += 1
+
+    except (ConnectionError, asyncio.TimeoutError, OSError, ValueError):
+        stats.errors += 1
+
+    finally:
+        for bot in bots:
+            bot.close()
+
+
+async def measure_connect_rate(host, port, count):
+    """
+    Open `count` connections at once, confirm each with a LIST round
+    trip, and return connections per second.
+    """
+    async def connect():
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(b"LIST\n")
+        await asyncio.wait_for(reader.readline(), READ_TIMEOUT)
+        return writer
+
+    start = time.perf_counter()
+    writers = await asyncio.gather(*(connect() for _ in range(count)))
+    elapsed = time.perf_counter() - start
+
+    for writer in writers:
+        writer.close()
+    return round(count / elapsed, 1)
+
+
+async def run_load(host, port, games, num_players, concurrency, delta, seed,
+                   connect_burst):
+    """Play `games` games with at most `concurrency` in flight"""
+    stats = Stats()
+    rng = random.Random(seed)
+    limit = asyncio.Semaphore(concurrency)
+
+    if connect_burst:
+        stats.connect_rate = await measure_connect_rate(host, port, connect_burst)
+
+    async def one_game():
+        async with limit:
+            await play_game(host, port, num_players, delta, rng, stats)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one_game() for _ in range(games)))
+    return stats, time.perf_counter() - start
+
+
+def main():
+    """Load generator entry point"""
+    parser = argparse.ArgumentParser(description="Tic-Tac-Toe load generator")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--games", type=int, default=200,
+                        help="total games to play")
+    parser.add_argument("--players", type=int, default=2,
+                        help="players per game (2-13)")
+    parser.add_argument("--concurrency", type=int, default=50,
+                        help="games played at the same time")
+    parser.add_argument("--delta", action="store_true",
+                        help="negotiate DELTA move events")
+    parser.add_argument("--connect-burst", type=int, default=500,
+                        help="connections opened at once to measure setup rate")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--spawn", choices=["threaded", "asyncio"],
+                        help="start server.py with this engine for the run")
+    parser.add_argument("--server-arg", action="append", default=[],
+                        metavar="ARG",
+                        help="extra argument for the spawned server, e.g. "
+                             "--server-arg=--log-level=debug (repeatable)")
+    parser.add_argument("--output", help="write JSON results to this file")
+    args = parser.parse_args()
+
+    with contextlib.ExitStack() as stack:
+        if args.spawn:
+            try:
+                stack.enter_context(spawn_server(args.spawn, args.host, args.port,
+                                                 *args.server_arg, log_level=None))
+            except RuntimeError as e:
+                sys.exit(str(e))
+        stats, elapsed = asyncio.run(run_load(
+            args.host, args.port, args.games, args.players,
+            args.concurrency, args.delta, args.seed, args.connect_burst))
+
+    result = {
+        "config": {
+            "games": args.games,
+            "players": args.players,
+            "concurrency": args.concurrency,
+            "delta": args.delta,
+            "connect_burst": args.connect_burst,
+            "engine": args.spawn,
+            "server_args": args.server_arg,
+        },
+        "results": stats.to_dict(elapsed),
+    }
+
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""
+Tic-Tac-Toe Lobby Index
+Live index of games that are waiting for players
+"""
+
+import threading
+from bisect import bisect_left, bisect_right
+from collections import deque
+
+DEFAULT_PAGE_SIZE = 50  # Games per LIST page when no limit is given
+MAX_PAGE_SIZE = 200     # Largest page a client may request
+
+
+class LobbyEntry:
+    """
+    A waiting game of another worker, as that worker announced it
+    (multi-worker mode). Indexed like a Game so LIST can page through it.
+    """
+    __slots__ = ("game_id", "num_players", "joined")
+
+    def __init__(self, game_id, num_players, joined):
+        self.game_id = game_id
+        self.num_players = num_players
+        self.joined = joined    # Players seated so far
+
+
+def joined_count(game):
+    """Players seated in a waiting Game or LobbyEntry"""
+    if isinstance(game, LobbyEntry):
+        return game.joined
+    return len(game.players)
+
+
+class LobbyIndex:
+    """
+    Keeps the waiting games sorted by game id, overall and per player
+    count, so a LIST page costs O(log n + page size) no matter how many
+    games the server has ever created.
+
+    A FIFO queue per player count serves QUICKPLAY: its head is the
+    longest-waiting game of that size. Games leaving the index stay in
+    their queue until they reach the head (or the queue is compacted),
+    so adding, removing and finding the head are all O(1) amortized.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.games = {}     # Dictionary: game_id - waiting Game
+        self.ids = []       # Sorted ids of all waiting games
+        self.by_size = {}   # Dictionary: num_players - sorted ids
+        self.queues = {}    # Dictionary: num_players - deque of Games
+
+    def __len__(self):
+        return len(self.games)
+
+    def add(self, game):
+        """Add a waiting game to the index"""
+        with self.lock:
+            if game.game_id in self.games:
+                return
+            self.games[game.game_id] = game
+            self._insert(self.ids, game.game_id)
+            self._insert(self.by_size.setdefault(game.num_players, []),
+                         game.game_id)
+            self.queues.setdefault(game.num_players, deque()).append(game)
+
+    def get(self, game_id):
+        """Return the waiting game with this id, or None"""
+        return self.games.get(game_id)
+
+    def remove(self, game):
+        """
+        Remove a game (started or aborted) from the index.
+
+        Returns:
+            True if the game was in the index
+        """
+        with self.lock:
+            if self.games.pop(game.game_id, None) is None:
+                return False
+            self._delete(self.ids, game.game_id)
+            waiting = self.by_size[game.num_players]
+            self._delete(waiting, game.game_id)
+
+            # Drop departed games once they make up most of the queue
+            queue = self.queues[game.num_players]
+            if len(queue) > 2 * len(waiting) + 64:
+                self.queues[game.num_players] = deque(
+                    queued for queued in queue
+                    if self.games.get(queued.game_id) is queued)
+        return True
+
+    def first(self, num_players):
+        """Return the longest-waiting game for num_players, or None"""
+        with self.lock:
+            queue = self.queues.get(num_players)
+            while queue:
+                game = queue[0]
+                if self.games.get(game.game_id) is game:
+                    return game
+                queue.popleft()
+        return None
+
+    def page(self, num_players=None, after=0, limit=DEFAULT_PAGE_SIZE):
+        """
+        Return one page of waiting games.
+
+        Args:
+            num_players: Only list games for this many players (None = all)
+            after: Cursor - list games with an id greater than this
+            limit: Maximum number of games to return
+
+        Returns:
+            (games, next_cursor)
+            games: list of Game objects in id order
+            next_cursor: id to pass as `after` for the next page, or None
+        """
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+        with self.lock:
+            ids = self.ids if num_players is None else self.by_size.get(num_players, [])
+            start = bisect_right(ids, after)
+            page_ids = ids[start:start + limit]
+            games = [self.games[game_id] for game_id in page_ids]
+            more = start + limit < len(ids)
+
+        return games, (page_ids[-1] if more else None)
+
+    def entries(self):
+        """Return (game_id, players, joined) of every waiting game"""
+        with self.lock:
+            games = list(self.games.values())
+        return [(game.game_id, game.num_players, joined_count(game)) for game in games]
+
+    @staticmethod
+    def merge_pages(pages, limit=DEFAULT_PAGE_SIZE):
+        """
+        Merge pages of several indexes fetched with the same arguments
+        into one page.
+
+        Args:
+            pages: (games, next_cursor) per index
+
+        Returns:
+            (games, next_cursor) as from page()
+        """
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        games = sorted((game for page, _ in pages for game in page),
+                       key=lambda game: game.game_id)
+        more = len(games) > limit or any(cursor is not None for _, cursor in pages)
+        games = games[:limit]
+        return games, (games[-1].game_id if more and games else None)
+
+    @staticmethod
+    def _insert(ids, game_id):
+        """Insert an id keeping the list sorted (ids usually arrive in order)"""
+        if not ids or ids[-1] < game_id:
+            ids.append(game_id)
+        else:
+            ids.insert(bisect_left(ids, game_id), game_id)
+
+    @staticmethod
+    def _delete(ids, game_id):
+        """Delete an id from a sorted list"""
+        i = bisect_left(ids, game_id)
+        if i < len(ids) and ids[i] == game_id:
+            del ids[i]
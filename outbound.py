@@ -0,0 +1,219 @@
+"""
+Tic-Tac-Toe Outbound Buffering
+Flushes client sockets that could not take all their data at once,
+and fans broadcasts out to spectators
+"""
+
+import selectors
+import socket
+import threading
+from collections import deque
+from serverlog import log
+
+MAX_OUTBOUND = 256 * 1024   # Queued bytes per client before it is dropped as too slow
+FANOUT_BATCH = 1000         # Spectators written per event loop callback
+
+# Changes requested of the writer loop
+WATCH = 0       # Flush the connection whenever its socket is writable
+UNWATCH = 1     # Stop watching (its buffer was dropped)
+CLOSE = 2       # Stop watching and close the socket
+
+
+class OutboundOverflow(Exception):
+    """Raised when a client's outbound buffer passes the high-water mark"""
+
+
+class OutboundWriter:
+    """
+    Background thread that finishes sending for clients whose socket
+    buffer is full.
+
+    Command threads send without blocking (MSG_DONTWAIT). Whatever a
+    socket does not accept stays in the connection's buffer and the
+    connection is handed here; this thread waits until the socket is
+    writable again and flushes it, so a client that stops reading never
+    blocks the thread broadcasting to its game.
+    """
+
+    def __init__(self):
+        self.selector = selectors.DefaultSelector()
+        self.requests = deque()     # (connection, WATCH/UNWATCH/CLOSE) for the loop
+        self.wake_reader, self.wake_writer = socket.socketpair()
+        self.wake_reader.setblocking(False)
+        self.wake_writer.setblocking(False)
+        self.selector.register(self.wake_reader, selectors.EVENT_READ)
+        self.thread = None
+
+    def watch(self, conn):
+        """Flush conn whenever its socket becomes writable"""
+        self.requests.append((conn, WATCH))
+        self.wake()
+
+    def unwatch(self, conn):
+        """Stop watching a connection whose buffer was dropped"""
+        self.requests.append((conn, UNWATCH))
+        self.wake()
+
+    def forget(self, conn):
+        """
+        Stop watching a connection and close its socket. The socket is
+        closed by the writer thread after unregistering it, so the
+        selector never holds a descriptor number that could be reused.
+        """
+        self.requests.append((conn, CLOSE))
+        self.wake()
+
+    def wake(self):
+        """Interrupt select() so pending requests are applied"""
+        try:
+            self.wake_writer.send(b"\0")
+        except BlockingIOError:
+            pass    # Already woken
+
+    def start(self):
+        """Start the writer thread"""
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        """Writer loop"""
+        while True:
+            self.step()
+
+    def step(self, timeout=None):
+        """
+        Flush the sockets that became writable, then apply the pending
+        requests (an unexpected error costs one connection, not the loop)
+        """
+        for key, _ in self.selector.select(timeout):
+            conn = key.data
+            if conn is None:
+                self.drain_wakeups()
+                continue
+            try:
+                done = conn.flush_waiting()
+            except Exception as e:
+                log.error("OUTBOUND ERROR", "%s: %s", conn.addr, e)
+                done = True
+            if done:
+                self.selector.unregister(key.fileobj)
+
+        while self.requests:
+            conn, action = self.requests.popleft()
+            try:
+                self.apply(conn, action)
+            except Exception as e:
+                log.error("OUTBOUND ERROR", "%s: %s", conn.addr, e)
+
+    def apply(self, conn, action):
+        """Register a connection's socket, or unregister (and close) it"""
+        if action == WATCH:
+            if not conn.closed:
+                try:
+                    self.selector.register(conn.sock, selectors.EVENT_WRITE, conn)
+                except (KeyError, ValueError):
+                    pass    # Already registered
+            return
+
+        try:
+            self.selector.unregister(conn.sock)
+        except (KeyError, ValueError):
+            pass    # Flushed (or never registered)
+        if action == CLOSE:
+            conn.sock.close()
+
+    def drain_wakeups(self):
+        """Empty the wake-up socket"""
+        try:
+            while self.wake_reader.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+
+
+class Fanout:
+    """
+    Background thread that delivers broadcasts to spectators.
+
+    The thread applying a move only queues the encoded bytes together
+    with the tuple of recipients; this thread writes that same bytes
+    object to every connection, so a game with thousands of spectators
+    never delays its players. Broadcasts go out in the order queued.
+    """
+
+    def __init__(self, on_overflow):
+        self.on_overflow = on_overflow  # Called with a spectator that fell behind
+        self.jobs = deque()             # (connections, data) waiting to be sent
+        self.ready = threading.Event()
+        self.thread = None
+
+    def submit(self, conns, data):
+        """Queue data for every connection in conns"""
+        self.jobs.append((conns, data))
+        self.ready.set()
+
+    def start(self):
+        """Start the fan-out thread"""
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        """Fan-out loop"""
+        while True:
+            self.ready.wait()
+            self.ready.clear()
+            while self.jobs:
+                conns, data = self.jobs.popleft()
+                self.deliver(conns, data)
+
+    def deliver(self, conns, data):
+        """
+        Write data to each connection without blocking
+        (an unexpected error skips that connection only)
+        """
+        for conn in conns:
+            try:
+                conn.write(data)
+            except OutboundOverflow:
+                self.on_overflow(conn)
+            except Exception as e:
+                log.error("FANOUT ERROR", "%s: %s", conn.addr, e)
+
+
+class AsyncFanout(Fanout):
+    """
+    Fan-out for the asyncio engine: the queue is drained by event loop
+    callbacks, FANOUT_BATCH connections at a time, so player traffic is
+    served between the batches of a large broadcast.
+    """
+
+    def __init__(self, on_overflow):
+        super().__init__(on_overflow)
+        self.loop = None
+        self.position = 0       # Connections of the first job already written
+
+    def start(self, loop):
+        """Deliver on the given event loop (called from the loop)"""
+        self.loop = loop
+
+    def submit(self, conns, data):
+        """Queue data for every connection in conns (called from the loop)"""
+        if not self.jobs:
+            self.loop.call_soon(self.drain)
+        self.jobs.append((conns, data))
+
+    def drain(self):
+        """Deliver up to FANOUT_BATCH writes, then yield to the loop"""
+        budget = FANOUT_BATCH
+        while self.jobs and budget > 0:
+            conns, data = self.jobs[0]
+            end = min(len(conns), self.position + budget)
+            self.deliver(conns[self.position:end], data)
+            budget -= end - self.position
+            if end == len(conns):
+                self.jobs.popleft()
+                self.position = 0
+            else:
+                self.position = end
+        if self.jobs:
+            self.loop.call_soon(self.drain)
@@ -0,0 +1,390 @@
+"""
+Tic-Tac-Toe Binary Protocol
+Compact length-prefixed frames, enabled per connection with
+"HELLO BINARY/1" (the server answers in text, then both sides switch)
+
+Frame layout (all integers big-endian):
+    length  u16   number of bytes that follow (type + payload)
+    type    u8    frame type, see below
+    payload       fixed layout per type
+
+Client -> server
+    HELLO   0x01  caps u8 (bit 0: DELTA, bit 1: REJOIN)
+    LIST    0x02  players u8 (0 = all), after u32, limit u16 (0 = default)
+    CREATE  0x03  players u8, bots u8
+    JOIN    0x04  game_id u32
+    MOVE    0x05  row u8, col u8
+    RESYNC  0x06
+    STATS   0x07
+    EXIT    0x08
+    REJOIN  0x09  game_id u32, token u64
+    QUICKPLAY 0x0A  players u8
+    WATCH   0x0B  game_id u32
+
+Server -> client
+    HELLO        0x81  caps u8
+    CREATED      0x82  game_id u32
+    JOINED       0x83  symbol u8
+    WAIT         0x84
+    BOARD        0x85  size u8, then size*size cells u8
+    YOURTURN     0x86
+    MOVED        0x87  row u8, col u8, symbol u8, seq u16
+    INVALID      0x88  reason (UTF-8)
+    WIN          0x89
+    LOSE         0x8A
+    DRAW         0x8B
+    PLAYER_LEFT  0x8C
+    GAME_ABORTED 0x8D
+    GAMES        0x8E  count u16, count * (game_id u32, players u8,
+                       joined u8), next cursor u32 (0 = last page)
+    TEXT         0x8F  any other server message (UTF-8)
+
+Symbols travel as indices into game_logic.SYMBOLS; EMPTY_CELL marks a
+free cell.
+"""
+
+import struct
+from game_logic import SYMBOLS, SYMBOL_INDEX, EMPTY_INDEX
+
+BINARY_CAPABILITY = "BINARY/1"  # HELLO token that switches to frames
+MAX_FRAME_LENGTH = 1024         # Longest accepted client frame (bytes)
+EMPTY_CELL = EMPTY_INDEX        # Cell value of a free square
+
+# HELLO caps bits
+CAP_BITS = {"DELTA": 0x01, "REJOIN": 0x02}
+
+# Client -> server frame types
+HELLO = 0x01
+LIST = 0x02
+CREATE = 0x03
+JOIN = 0x04
+MOVE = 0x05
+RESYNC = 0x06
+STATS = 0x07
+EXIT = 0x08
+REJOIN = 0x09
+QUICKPLAY = 0x0A
+WATCH = 0x0B
+
+# Server -> client frame types
+S_HELLO = 0x81
+S_CREATED = 0x82
+S_JOINED = 0x83
+S_WAIT = 0x84
+S_BOARD = 0x85
+S_YOURTURN = 0x86
+S_MOVED = 0x87
+S_INVALID = 0x88
+S_WIN = 0x89
+S_LOSE = 0x8A
+S_DRAW = 0x8B
+S_PLAYER_LEFT = 0x8C
+S_GAME_ABORTED = 0x8D
+S_GAMES = 0x8E
+S_TEXT = 0x8F
+
+COMMAND_NAMES = {
+    HELLO: "HELLO", LIST: "LIST", CREATE: "CREATE", JOIN: "JOIN",
+    MOVE: "MOVE", RESYNC: "RESYNC", STATS: "STATS", EXIT: "EXIT",
+    REJOIN: "REJOIN", QUICKPLAY: "QUICKPLAY", WATCH: "WATCH",
+}
+
+# Payload layouts
+U8 = struct.Struct(">B")
+U32 = struct.Struct(">I")
+LIST_ARGS = struct.Struct(">BIH")
+CREATE_ARGS = struct.Struct(">BB")
+REJOIN_ARGS = struct.Struct(">IQ")
+MOVE_ARGS = struct.Struct(">BB")
+MOVED_FRAME = struct.Struct(">HBBBBH")
+GAME_ENTRY = struct.Struct(">IBB")
+HEADER = struct.Struct(">HB")
+
+
+class ProtocolError(Exception):
+    """Raised for a frame that cannot be decoded"""
+
+
+class FrameTooLongError(Exception):
+    """Raised when a client announces a frame longer than MAX_FRAME_LENGTH"""
+
+
+def frame(frame_type, payload=b""):
+    """Build one frame"""
+    return HEADER.pack(len(payload) + 1, frame_type) + payload
+
+
+# Frames without payload, built once
+SIMPLE_FRAMES = {
+    "WAIT": frame(S_WAIT),
+    "YOURTURN": frame(S_YOURTURN),
+    "WIN": frame(S_WIN),
+    "LOSE": frame(S_LOSE),
+    "DRAW": frame(S_DRAW),
+    "PLAYER_LEFT": frame(S_PLAYER_LEFT),
+    "GAME_ABORTED": frame(S_GAME_ABORTED),
+}
+
+
+# ---------------------------------------------------------------------
+# Server side: encoding events, decoding commands
+# ---------------------------------------------------------------------
+
+def encode_moved(row, col, symbol, seq):
+    """Encode a MOVED event (symbol is the text symbol)"""
+    return MOVED_FRAME.pack(MOVED_FRAME.size - 2, S_MOVED,
+                            row, col, SYMBOL_INDEX[symbol], seq)
+
+
+def encode_board(game):
+    """Encode the game's board from its cached cell indices"""
+    size = game.board_size
+    return (HEADER.pack(size * size + 2, S_BOARD) + bytes((size,)) +
+            game.get_cell_indices())
+
+
+def encode_caps(caps):
+    """Encode a capability set as a HELLO caps byte"""
+    bits = 0
+    for cap in caps:
+        bits |= CAP_BITS.get(cap, 0)
+    return bits
+
+
+def decode_caps(bits):
+    """Return the capabilities in a HELLO caps byte"""
+    return [cap for cap, bit in CAP_BITS.items() if bits & bit]
+
+
+def encode_text(message):
+    """
+    Encode a server message written for the text protocol.
+    Used for the less frequent messages; the move broadcast encodes
+    frames directly.
+    """
+    simple = SIMPLE_FRAMES.get(message)
+    if simple is not None:
+        return simple
+
+    word, _, rest = message.partition(" ")
+
+    if message.startswith("BOARD\n"):
+        rows = message.split("\n")[1:]
+        cells = bytes(SYMBOL_INDEX.get(cell, EMPTY_CELL)
+                      for row in rows for cell in row.split(" "))
+        return frame(S_BOARD, bytes((len(rows),)) + cells)
+
+    if word == "CREATED":
+        return frame(S_CREATED, U32.pack(int(rest)))
+
+    if word == "JOINED":
+        return frame(S_JOINED, U8.pack(SYMBOL_INDEX[rest]))
+
+    if word == "INVALID":
+        return frame(S_INVALID, rest.encode("utf-8"))
+
+    if word == "MOVED":
+        row, col, symbol, seq = rest.split()
+        return encode_moved(int(row), int(col), symbol, int(seq))
+
+    if word == "HELLO":
+        return frame(S_HELLO, U8.pack(encode_caps(rest.split())))
+
+    if word == "GAMES":
+        entries, cursor = [], 0
+        for token in rest.split():
+            fields = token.split(":")
+            if fields[0] == "next":
+                cursor = int(fields[1])
+            else:
+                entries.append(GAME_ENTRY.pack(*map(int, fields)))
+        payload = (struct.pack(">H", len(entries)) + b"".join(entries) +
+                   U32.pack(cursor))
+        return frame(S_GAMES, payload)
+
+    return frame(S_TEXT, message.encode("utf-8"))
+
+
+def decode_command(data):
+    """
+    Decode a client frame (type byte + payload, without the length).
+
+    Returns:
+        (command name, arguments tuple)
+
+    Raises:
+        ProtocolError for unknown types or short payloads
+    """
+    if not data:
+        raise ProtocolError("empty frame")
+
+    frame_type = data[0]
+    try:
+        if frame_type == MOVE:
+            return "MOVE", MOVE_ARGS.unpack_from(data, 1)
+        if frame_type == JOIN:
+            return "JOIN", U32.unpack_from(data, 1)
+        if frame_type == CREATE:
+            return "CREATE", CREATE_ARGS.unpack_from(data, 1)
+        if frame_type == LIST:
+            return "LIST", LIST_ARGS.unpack_from(data, 1)
+        if frame_type == HELLO:
+            return "HELLO", U8.unpack_from(data, 1)
+        if frame_type == REJOIN:
+            return "REJOIN", REJOIN_ARGS.unpack_from(data, 1)
+        if frame_type == QUICKPLAY:
+            return "QUICKPLAY", U8.unpack_from(data, 1)
+        if frame_type == WATCH:
+            return "WATCH", U32.unpack_from(data, 1)
+    except struct.error:
+        raise ProtocolError(f"short {COMMAND_NAMES[frame_type]} frame")
+
+    name = COMMAND_NAMES.get(frame_type)
+    if name is None:
+        raise ProtocolError(f"unknown frame type {frame_type:#04x}")
+    return name, ()
+
+
+class FrameReader:
+    """
+    Buffered reader that splits a client's byte stream into frames.
+    Same interface as the server's LineReader.
+    """
+
+    def __init__(self, conn, max_length=MAX_FRAME_LENGTH, on_data=None,
+                 recv_size=4096):
+        self.conn = conn
+        self.max_length = max_length
+        self.on_data = on_data
+        self.recv_size = recv_size
+        self.buffer = b""
+
+    def read_frames(self):
+        """
+        Receive more data and return every complete frame.
+
+        Returns:
+            list of frames (type byte + payload), None on disconnect
+        """
+        data = self.conn.recv(self.recv_size)
+        if not data:
+            return None
+        if self.on_data:
+            self.on_data(len(data))
+        return self.feed(data)
+
+    def feed(self, data):
+        """
+        Add received bytes and return every complete frame.
+
+        Raises:
+            FrameTooLongError if a frame exceeds max_length
+        """
+        buffer = self.buffer + data
+        frames = []
+        pos, end = 0, len(buffer)
+
+        while end - pos >= 2:
+            length = (buffer[pos] << 8) | buffer[pos + 1]
+            if length > self.max_length:
+                raise FrameTooLongError()
+            if end - pos - 2 < length:
+                break
+            frames.append(buffer[pos + 2:pos + 2 + length])
+            pos += 2 + length
+
+        self.buffer = buffer[pos:]
+        return frames
+
+    def unread(self, frames):
+        """Return frames (and the partial buffer) as the raw bytes they came from"""
+        return b"".join(struct.pack(">H", len(data)) + data
+                        for data in frames) + self.buffer
+
+
+# ---------------------------------------------------------------------
+# Client side: encoding commands, decoding events
+# ---------------------------------------------------------------------
+
+def encode_command(name, *args):
+    """
+    Encode a client command, e.g. encode_command("MOVE", 1, 2).
+    LIST takes (players, after, limit), CREATE (players, bots);
+    HELLO takes a capability list.
+    """
+    if name == "MOVE":
+        return frame(MOVE, MOVE_ARGS.pack(*args))
+    if name == "JOIN":
+        return frame(JOIN, U32.pack(*args))
+    if name == "CREATE":
+        players, bots = (list(args) + [0])[:2]
+        return frame(CREATE, CREATE_ARGS.pack(players, bots))
+    if name == "LIST":
+        players, after, limit = (list(args) + [0, 0, 0])[:3]
+        return frame(LIST, LIST_ARGS.pack(players or 0, after, limit))
+    if name == "HELLO":
+        return frame(HELLO, U8.pack(encode_caps(args[0] if args else ())))
+    if name == "REJOIN":
+        return frame(REJOIN, REJOIN_ARGS.pack(*args))
+    if name == "QUICKPLAY":
+        return frame(QUICKPLAY, U8.pack(*args))
+    if name == "WATCH":
+        return frame(WATCH, U32.pack(*args))
+    for frame_type, command in COMMAND_NAMES.items():
+        if command == name:
+            return frame(frame_type)
+    raise ValueError(f"unknown command {name}")
+
+
+def decode_event(data):
+    """
+    Decode a server frame (type byte + payload, without the length).
+
+    Returns:
+        (event name, value) where value is:
+            BOARD    - list of rows, each a list of symbols ('.' = empty)
+            MOVED    - (row, col, symbol, seq)
+            CREATED  - game id
+            JOINED   - symbol
+            GAMES    - (list of (game_id, players, joined), next cursor or None)
+            HELLO    - list of capabilities
+            INVALID / TEXT - message text
+            otherwise None
+    """
+    frame_type = data[0]
+
+    if frame_type == S_MOVED:
+        row, col, symbol, seq = struct.unpack_from(">BBBH", data, 1)
+        return "MOVED", (row, col, SYMBOLS[symbol], seq)
+
+    if frame_type == S_BOARD:
+        size = data[1]
+        cells = [SYMBOLS[cell] if cell != EMPTY_CELL else '.'
+                 for cell in data[2:2 + size * size]]
+        return "BOARD", [cells[i:i + size] for i in range(0, size * size, size)]
+
+    if frame_type == S_CREATED:
+        return "CREATED", U32.unpack_from(data, 1)[0]
+
+    if frame_type == S_JOINED:
+        return "JOINED", SYMBOLS[data[1]]
+
+    if frame_type == S_GAMES:
+        (count,) = struct.unpack_from(">H", data, 1)
+        games = [GAME_ENTRY.unpack_from(data, 3 + i * GAME_ENTRY.size)
+                 for i in range(count)]
+        (cursor,) = U32.unpack_from(data, 3 + count * GAME_ENTRY.size)
+        return "GAMES", (games, cursor or None)
+
+    if frame_type == S_HELLO:
+        return "HELLO", [BINARY_CAPABILITY] + decode_caps(data[1])
+
+    if frame_type in (S_INVALID, S_TEXT):
+        name = "INVALID" if frame_type == S_INVALID else "TEXT"
+        return name, data[1:].decode("utf-8", errors="replace")
+
+    for name, simple in SIMPLE_FRAMES.items():
+        if simple[2] == frame_type:
+            return name, None
+
+    raise ProtocolError(f"unknown frame type {frame_type:#04x}")
@@ -3,15 +3,375 @@ Tic-Tac-Toe Game Server
 Manages multiple games and multiple client connections
 """
 
+import argparse
+import asyncio
+import gc
+import multiprocessing
+import os
+import secrets
+import shutil
+import signal
 import socket
+import sys
+import tempfile
 import threading
-from game_logic import Game
+import time
+from concurrent.futures import ThreadPoolExecutor
+from bot import BotPlayer, Position, BOT_MOVE_TIME
+from game_logic import Game, SYMBOLS, SYMBOL_INDEX
+from lifecycle import GameReaper, FINISHED_GRACE_PERIOD, ARCHIVE_SIZE
+from lobby import LobbyIndex, LobbyEntry, joined_count, DEFAULT_PAGE_SIZE
+from journal import (Journal, NullJournal, read_journal, PREVIOUS_SUFFIX,
+                     CREATE, JOIN, MOVE, LEAVE, END, ROTATE, SNAP)
+from metrics import Metrics, NullMetrics, start_http_server
+from serverlog import log, LEVELS, DEBUG, INFO, parse_sampling
+from shards import HandOff, ShardRouter
+from snapshot import SnapshotWriter, read_snapshot, SNAPSHOT_INTERVAL
+from outbound import (OutboundWriter, OutboundOverflow, Fanout, AsyncFanout,
+                      MAX_OUTBOUND)
+from protocol import (FrameReader, FrameTooLongError, ProtocolError,
+                      BINARY_CAPABILITY, MAX_FRAME_LENGTH, decode_caps,
+                      decode_command, encode_text,
+                      encode_moved, encode_board)
 
 # Server Configuration
 HOST = '127.0.0.1'      # Server IP (localhost)
 PORT = 5000             # Server port
 FORMAT = 'utf-8'        # Encoding format
 ADDR = (HOST, PORT)     # Full server address
+MAX_LINE_LENGTH = 1024  # Longest accepted command line (bytes)
+RECV_SIZE = 4096        # Bytes read per recv call
+BOT_THREADS = 2         # Threads searching bot moves
+BOT_QUEUE_LIMIT = 32    # Bot moves waiting or searching beyond which new ones skip the search
+
+# Optional protocol features a client can request with HELLO
+#   DELTA - receive "MOVED <row> <col> <symbol> <seq>" after each move
+#           instead of the full board (BOARD is still sent on game start
+#           and RESYNC; its seq is the number of filled cells)
+#   BINARY/1 - after the (text) HELLO reply, both sides switch to the
+#           length-prefixed frames described in protocol.py
+#   REJOIN - receive "SEAT <game_id> <token>" after JOINED; with a
+#           journal or snapshot, "REJOIN <game_id> <token>" reclaims the
+#           seat after a server restart
+CAPABILITIES = ("DELTA", BINARY_CAPABILITY, "REJOIN")
+
+
+class Connection:
+    """
+    A connected client: its socket plus per-connection state.
+    Command handlers receive this object as `conn`.
+    
+    Writes never block. Bytes the socket does not take right away wait
+    in `out` for the OutboundWriter, and later writes queue behind them
+    and go out together in one send. A client that lets more than
+    max_outbound bytes pile up is disconnected.
+    """
+    __slots__ = ("sock", "addr", "session", "watching", "caps", "binary",
+                 "out", "out_size", "out_lock", "closed", "writer",
+                 "max_outbound")
+    
+    bot = None                    # BotPlayer for computer seats
+    
+    def __init__(self, sock, addr, writer=None, max_outbound=MAX_OUTBOUND):
+        self.sock = sock
+        self.addr = addr
+        self.session = None       # Session while seated in a game
+        self.watching = None      # Game followed as a spectator (WATCH)
+        self.caps = frozenset()   # Capabilities negotiated with HELLO
+        self.binary = False       # Speaking binary frames (BINARY/1)
+        
+        self.out = []             # Bytes waiting for the socket to drain
+        self.out_size = 0         # Total length of out
+        self.out_lock = threading.Lock()
+        self.closed = False
+        self.writer = writer      # OutboundWriter (None: finish with sendall)
+        self.max_outbound = max_outbound
+    
+    def write(self, data):
+        """
+        Send bytes to the client without blocking.
+        
+        Raises:
+            OutboundOverflow if the client fell too far behind
+        """
+        with self.out_lock:
+            if self.closed:
+                return
+            
+            # Socket busy: queue behind the waiting bytes
+            if self.out:
+                self.out.append(data)
+                self.out_size += len(data)
+                if self.out_size > self.max_outbound:
+                    self.overflow()
+                return
+            
+            try:
+                sent = self.sock.send(data, socket.MSG_DONTWAIT)
+            except BlockingIOError:
+                sent = 0
+            except OSError:
+                return      # Connection is gone; its reader cleans up
+            
+            if sent < len(data):
+                rest = data[sent:]
+                if self.writer:
+                    self.out.append(rest)
+                    self.out_size = len(rest)
+                    self.writer.watch(self)
+                else:
+                    try:
+                        self.sock.sendall(rest)
+                    except OSError:
+                        pass
+    
+    def flush_waiting(self):
+        """
+        Called by the OutboundWriter when the socket is writable:
+        send the queued bytes, coalesced into one send.
+        
+        Returns:
+            True once nothing is left (stop watching)
+        """
+        with self.out_lock:
+            if not self.out or self.closed:
+                return True
+            data = b"".join(self.out)
+            try:
+                sent = self.sock.send(data, socket.MSG_DONTWAIT)
+            except BlockingIOError:
+                sent = 0
+            except OSError:
+                sent = len(data)
+            
+            if sent == len(data):
+                self.out, self.out_size = [], 0
+                return True
+            self.out, self.out_size = [data[sent:]], len(data) - sent
+            return False
+    
+    def overflow(self):
+        """Drop a client that stopped reading (out_lock held)"""
+        self.closed = True
+        self.out, self.out_size = [], 0
+        self.writer.unwatch(self)
+        try:
+            # Wakes the client's reader, which then disconnects it
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        raise OutboundOverflow()
+    
+    def close(self):
+        """Close the client socket"""
+        with self.out_lock:
+            self.closed = True
+            self.out, self.out_size = [], 0
+        if self.writer:
+            # The socket may be registered with the writer: it closes
+            # the socket after unregistering it
+            self.writer.forget(self)
+        else:
+            self.sock.close()
+    
+    def __repr__(self):
+        return f"Connection({self.addr})"
+
+
+class AsyncConnection(Connection):
+    """
+    A client served by the asyncio engine (sock is a StreamWriter).
+    The transport buffers what the socket does not take; its buffer
+    counts towards max_outbound.
+    """
+    __slots__ = ()
+    
+    def __init__(self, writer, addr, max_outbound=MAX_OUTBOUND):
+        super().__init__(writer, addr, None, max_outbound)
+    
+    def write(self, data):
+        """Queue bytes on the transport"""
+        if self.closed:
+            return
+        transport = self.sock.transport
+        transport.write(data)
+        if transport.get_write_buffer_size() > self.max_outbound:
+            self.closed = True
+            transport.abort()
+            raise OutboundOverflow()
+    
+    def close(self):
+        """Close the client stream"""
+        self.closed = True
+        self.sock.close()
+
+
+class BotConnection(Connection):
+    """
+    The seat of a computer player. Messages sent to it are dropped;
+    the server asks its BotPlayer for a move whenever it is its turn.
+    """
+    __slots__ = ("bot",)
+    
+    def __init__(self):
+        super().__init__(None, "bot")
+        self.caps = frozenset(("DELTA",))   # Cheapest update to build
+        self.bot = None
+    
+    def write(self, data):
+        """Discard messages to the computer player"""
+    
+    def close(self):
+        """Nothing to close"""
+
+
+class AwayConnection(Connection):
+    """
+    The seat of a player in a recovered game who has not reconnected
+    yet. Messages are dropped until REJOIN hands the seat (identified
+    by Player.token) to the player's new connection.
+    """
+    __slots__ = ()
+    
+    def __init__(self):
+        # No socket behind it, but every attribute shared code may read
+        # (closed, watching, out_lock, ...) exists
+        super().__init__(None, "away")
+    
+    def write(self, data):
+        """Nobody to send to yet"""
+    
+    def close(self):
+        """Nothing to close"""
+
+
+class Session:
+    """
+    A connection's seat in a game, created on CREATE/JOIN and torn down
+    on disconnect, so commands reach the Game and Player directly.
+    """
+    __slots__ = ("game", "player")
+    
+    def __init__(self, game, player):
+        self.game = game
+        self.player = player
+    
+    @property
+    def index(self):
+        """The player's index in game.players"""
+        return self.player.index
+
+
+class Spectators:
+    """
+    The spectators of a game, grouped by the form they get updates in
+    (guarded by game.lock).
+    
+    Each group is a dict used as an ordered set, so a WATCH or a
+    disconnect costs the same with ten spectators or ten thousand. The
+    fan-out needs an immutable tuple of recipients (a broadcast queued
+    earlier keeps the ones it was sent to): it is built when a group is
+    broadcast to, and only if the group changed since the last time.
+    """
+    __slots__ = ("groups", "snapshots")
+    
+    def __init__(self):
+        self.groups = {}        # form (binary, delta) - {connection: None}
+        self.snapshots = {}     # form - tuple of its group's connections
+    
+    def add(self, form, conn):
+        """Add a spectator to its form's group"""
+        self.groups.setdefault(form, {})[conn] = None
+        self.snapshots.pop(form, None)
+    
+    def remove(self, conn):
+        """
+        Remove a spectator.
+        
+        Returns:
+            True if it was watching
+        """
+        for form, group in self.groups.items():
+            if conn in group:
+                del group[conn]
+                if not group:
+                    del self.groups[form]
+                self.snapshots.pop(form, None)
+                return True
+        return False
+    
+    def items(self):
+        """Yield (form, tuple of connections) for every group"""
+        for form, group in self.groups.items():
+            conns = self.snapshots.get(form)
+            if conns is None:
+                conns = self.snapshots[form] = tuple(group)
+            yield form, conns
+    
+    def connections(self):
+        """Yield every spectator"""
+        for group in self.groups.values():
+            yield from group
+    
+    def __len__(self):
+        return sum(len(group) for group in self.groups.values())
+
+
+class LineTooLongError(Exception):
+    """Raised when a client sends a line longer than MAX_LINE_LENGTH"""
+
+
+class LineReader:
+    """
+    Buffered reader that splits a client's byte stream into
+    newline-terminated command lines.
+    Keeps partial trailing data until the rest of the line arrives.
+    """
+
+    def __init__(self, conn, max_length=MAX_LINE_LENGTH, on_data=None):
+        self.conn = conn
+        self.max_length = max_length
+        self.on_data = on_data    # Optional callback(byte_count) per recv
+        self.buffer = b""
+    
+    def read_lines(self):
+        """
+        Receive more data and return every complete line in order.
+        
+        Returns:
+            list of raw lines without the newline (possibly empty)
+            None if the client disconnected
+        
+        Raises:
+            LineTooLongError if a line exceeds max_length
+        """
+        data = self.conn.recv(RECV_SIZE)
+        if not data:
+            return None
+        
+        if self.on_data:
+            self.on_data(len(data))
+        
+        return self.feed(data)
+    
+    def feed(self, data):
+        """
+        Add already received bytes and return every complete line.
+        
+        Raises:
+            LineTooLongError if a line exceeds max_length
+        """
+        *lines, self.buffer = (self.buffer + data).split(b"\n")
+        
+        if len(self.buffer) > self.max_length or any(
+                len(line) > self.max_length for line in lines):
+            raise LineTooLongError()
+        
+        return lines
+    
+    def unread(self, lines):
+        """Return lines (and the partial buffer) as the raw bytes they came from"""
+        return b"".join(line + b"\n" for line in lines) + self.buffer
 
 
 class TicTacToeServer:
@@ -22,19 +382,81 @@ class TicTacToeServer:
     - Game lifecycle and synchronization
     """
 
-    def __init__(self):
+    def __init__(self, host=HOST, port=PORT,
+                 finished_grace=FINISHED_GRACE_PERIOD, archive_size=ARCHIVE_SIZE,
+                 metrics=True, shard=0, shards=1, ipc_dir=None,
+                 max_outbound=MAX_OUTBOUND, bot_time=BOT_MOVE_TIME,
+                 journal_path=None, journal_fsync=False,
+                 snapshot_path=None, snapshot_interval=SNAPSHOT_INTERVAL):
+        self.host = host
+        self.port = port
         self.server_socket = None
         
+        # Multi-worker mode: this process owns the games whose id
+        # encodes `shard` and hands JOINs for other games to their owner
+        self.shard = shard
+        self.shards = shards
+        self.router = ShardRouter(shard, shards, ipc_dir) if shards > 1 else None
+        
+        # Game registry. Single get/set operations are atomic, so readers
+        # look games up without locking; games_lock only serializes
+        # writers and is never held during network I/O.
+        # Each Game carries its own lock for its state and broadcasts,
+        # and each connection holds its Session (game + player) directly.
+        
         # Dictionary: game_id - Game object
         self.games = {}
         self.next_game_id = 1
         self.games_lock = threading.Lock()
         
-        # Dictionary: connection - game_id
-        self.conn_to_game = {}
-        self.conn_lock = threading.Lock()
+        # Waiting games, indexed for LIST (with --workers, the waiting
+        # games of the other workers are mirrored in remote_lobby)
+        self.lobby = LobbyIndex()
+        self.remote_lobby = LobbyIndex()
+        
+        # Evicts finished games and archives their summaries
+        self.reaper = GameReaper(self, finished_grace, archive_size)
+        
+        # Counters and per-command latency histograms
+        self.metrics = Metrics() if metrics else NullMetrics()
+        self.count_bytes_out = self.metrics.bytes_out.inc   # Bound once: per send
+        
+        # Sockets that fill up are drained by the outbound writer thread;
+        # a client may fall up to max_outbound bytes behind
+        self.max_outbound = max_outbound
+        self.outbound = OutboundWriter()
+        
+        # Broadcasts to spectators are written by the fan-out, off the
+        # thread that applied the move
+        self.fanout = Fanout(self.drop_slow_client)
+        
+        # Computer players search on their own threads, each move
+        # limited to bot_time seconds from the moment it is scheduled
+        # (time spent queued counts). The searches are CPU-bound and
+        # share the GIL with the command threads or the event loop,
+        # which get it back at least every sys.getswitchinterval().
+        self.bot_time = bot_time
+        self.bot_pool = ThreadPoolExecutor(max_workers=BOT_THREADS,
+                                           thread_name_prefix="bot")
+        self.bot_jobs = 0                     # Bot moves waiting or searching
+        self.bot_jobs_lock = threading.Lock()
+        
+        # Game events are journaled so in-progress games survive a crash,
+        # and the games are saved to a snapshot every snapshot_interval
+        # seconds (and on shutdown); both are loaded first if present
+        if journal_path:
+            self.journal = Journal(journal_path, journal_fsync)
+        else:
+            self.journal = NullJournal()
+        if snapshot_path:
+            self.snapshots = SnapshotWriter(self, snapshot_path, snapshot_interval)
+        else:
+            self.snapshots = None
+        if journal_path or snapshot_path:
+            self.recover(journal_path, snapshot_path)
         
         self.running = False
+        self.stopping = False     # Shutting down: disconnects keep their seats
     
     def start(self):
         """
@@ -46,96 +468,359 @@ class TicTacToeServer:
         try:
             self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            self.server_socket.bind(ADDR)
-            self.server_socket.listen()
+            if self.router:
+                # Every worker listens on the same port; the kernel
+                # spreads incoming connections across them
+                self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            self.server_socket.bind((self.host, self.port))
+            self.server_socket.listen(socket.SOMAXCONN)
             self.running = True
+            self.reaper.start()
+            self.journal.start()
+            if self.snapshots:
+                self.snapshots.start()
+            self.outbound.start()
+            self.fanout.start()
+            if self.router:
+                self.router.start(self.adopt_client, self.update_remote_lobby,
+                                  self.lobby.entries)
             
-            print("=" * 60)
-            print("TIC-TAC-TOE SERVER")
-            print("=" * 60)
-            print(f"[LISTENING] Server listening on {HOST}:{PORT}")
-            print("=" * 60)
+            self.print_banner("threaded")
             
             while self.running:
                 try:
                     conn, addr = self.server_socket.accept()
-                    print(f"[NEW CONNECTION] {addr}")
+                    log.debug("NEW CONNECTION", "%s", addr)
                     
                     # Handle each client in a separate thread
                     thread = threading.Thread(
                         target=self.handle_client,
-                        args=(conn, addr),
+                        args=(Connection(conn, addr, self.outbound,
+                                         self.max_outbound), addr),
                         daemon=True
                     )
                     thread.start()
                     
-                    print(f"[ACTIVE CONNECTIONS] {threading.active_count() - 1}")
+                    if log.enabled(DEBUG):
+                        log.debug("ACTIVE CONNECTIONS", "%d",
+                                  threading.active_count() - 1)
                 
                 except Exception as e:
                     if self.running:
                         pass
         
         except Exception as e:
-            print(f"[ERROR] Server start failed: {e}")
+            log.error("ERROR", "Server start failed: %s", e)
         
         finally:
             self.shutdown()
     
-    def handle_client(self, conn, addr):
+    def print_banner(self, engine):
+        """Log the startup banner"""
+        if self.router:
+            engine = f"{engine}, shard {self.shard + 1}/{self.shards}"
+        log.raw(INFO, "=" * 60)
+        log.raw(INFO, "TIC-TAC-TOE SERVER")
+        log.raw(INFO, "=" * 60)
+        log.info("LISTENING", "Server listening on %s:%d (%s)",
+                 self.host, self.port, engine)
+        log.raw(INFO, "=" * 60)
+    
+    def recover(self, journal_path=None, snapshot_path=None):
+        """
+        Rebuild the games in progress from the snapshot and the journal,
+        then open the journal for appending.
+        
+        The snapshot is loaded first. Journal records from before the
+        rotation that preceded it are already in it; after the rotation,
+        a saved game takes over from its SNAP record on.
+        
+        Human seats of recovered games wait for their players to REJOIN;
+        computer seats get a fresh bot. Games that finished or were
+        aborted are skipped, but their ids are not handed out again.
+        """
+        start = time.perf_counter()
+        
+        # Recovery allocates a few objects per record and frees none; the
+        # cyclic collector would rescan them all again and again
+        gc.disable()
+        try:
+            generation, next_game_id, saved = 0, 1, []
+            if snapshot_path and os.path.exists(snapshot_path):
+                generation, next_game_id, saved = read_snapshot(snapshot_path)
+                self.snapshots.generation = generation
+            
+            records, offset = [], None
+            if journal_path:
+                previous = journal_path + PREVIOUS_SUFFIX
+                if os.path.exists(previous):
+                    records = read_journal(previous)[0]
+                if os.path.exists(journal_path):
+                    current, offset = read_journal(journal_path)
+                    records += current
+            
+            snapshot_games = {record[0]: self.restore_game(record) for record in saved}
+            
+            rotation = None
+            for i in range(len(records) - 1, -1, -1):
+                if records[i][0] == ROTATE and records[i][1] == generation:
+                    rotation = i
+                    break
+            
+            if rotation is None:
+                # Journal started after the snapshot was loaded
+                games, last_id = self.replay(records, snapshot_games)
+            else:
+                games, last_id = self.replay(records[rotation + 1:], {},
+                                             snapshot_games, generation)
+        finally:
+            gc.enable()
+        
+        for game_id, game in games.items():
+            if game.ended or not self.has_humans(game):
+                continue
+            self.games[game_id] = game
+            if not game.started:
+                self.lobby.add(game)
+        
+        self.next_game_id = max(next_game_id, last_id // self.shards + 1)
+        
+        if journal_path:
+            self.journal.open(offset)
+        log.info("RECOVERED", "%d games from %d snapshot games and %d journal "
+                 "records in %.2fs", len(self.games), len(saved), len(records),
+                 time.perf_counter() - start)
+    
+    def restore_game(self, record):
+        """Build a Game from its snapshot record, with every seat away"""
+        game_id, num_players, started, current_turn, seats, free, masks = record
+        game = Game(game_id, num_players)
+        players = []
+        for index, token in seats:
+            seat = AwayConnection() if token else BotConnection()
+            if not token:
+                seat.bot = BotPlayer(SYMBOLS[index], self.bot_time)
+            players.append((seat, seat.addr, SYMBOLS[index], token))
+        game.restore(players, masks, current_turn, started,
+                     [SYMBOLS[index] for index in free])
+        return game
+    
+    def replay(self, records, games, pending=None, generation=0):
+        """
+        Apply journal records to games.
+        
+        Args:
+            records: Journal records in order
+            games: Dictionary game_id - Game the records apply to
+            pending: Snapshot games that join `games` at their SNAP record
+                     of the given generation (records before it are skipped)
+            generation: Snapshot generation of pending
+        
+        Returns:
+            (games, last_id)
+            games: dictionary game_id - Game of the games not ended
+            last_id: highest game id created (0 if none)
+        """
+        pending = pending or {}
+        last_id = 0
+        for record in records:
+            kind, game_id = record[0], record[1]
+            
+            if kind == SNAP:
+                if record[2] == generation and game_id in pending:
+                    games[game_id] = pending.pop(game_id)
+                continue
+            
+            if kind == CREATE:
+                games[game_id] = Game(game_id, record[2])
+                last_id = max(last_id, game_id)
+                continue
+            
+            game = games.get(game_id)
+            if game is None:
+                continue
+            
+            if kind == MOVE:
+                player = game.get_current_player()
+                if player is not None:
+                    game.make_move(player.conn, record[2], record[3])
+            
+            elif kind == JOIN:
+                token = record[3]
+                seat = AwayConnection() if token else BotConnection()
+                _, symbol = game.add_player(seat, seat.addr)
+                game.players[-1].token = token
+                if not token:
+                    seat.bot = BotPlayer(symbol, self.bot_time)
+            
+            elif kind == LEAVE:
+                for player in game.players:
+                    if SYMBOL_INDEX[player.symbol] == record[2]:
+                        game.remove_player(player.conn)
+                        break
+            
+            elif kind == END:
+                del games[game_id]
+        
+        # SNAP records lost with the last commit interval
+        games.update(pending)
+        return games, last_id
+    
+    def adopt_client(self, sock, caps, pending):
+        """
+        Serve a client handed over by another worker.
+        pending holds the bytes it had received but not handled yet.
+        """
+        conn = Connection(sock, sock.getpeername(), self.outbound,
+                          self.max_outbound)
+        conn.caps = caps
+        conn.binary = BINARY_CAPABILITY in caps
+        threading.Thread(
+            target=self.handle_client,
+            args=(conn, conn.addr, pending),
+            daemon=True
+        ).start()
+    
+    def hand_off(self, conn, shard, sock, pending):
+        """
+        Pass a connection to the worker that owns its game.
+        
+        Returns:
+            True if the other worker now serves the client
+        """
+        try:
+            self.router.hand_off(sock, shard, conn.caps, pending)
+        except OSError as e:
+            log.warning("HANDOFF FAILED", "%s to shard %d: %s", conn.addr, shard, e)
+            self.send(conn, "ERROR Game server unavailable")
+            return False
+        
+        self.stop_watching(conn)
+        self.metrics.handoffs.inc()
+        self.metrics.active_connections.dec()
+        log.debug("HANDOFF", "%s to shard %d", conn.addr, shard)
+        return True
+    
+    def handle_client(self, conn, addr, pending=b""):
         """
         Handle communication with a single client.
         Runs in a dedicated thread.
+        pending: bytes already received by another worker (hand-off)
         """
-        print(f"[CLIENT CONNECTED] {addr}")
+        log.debug("CLIENT CONNECTED", "%s", addr)
+        reader = self.make_reader(conn)
+        if not pending:
+            self.metrics.connections.inc()
+        self.metrics.active_connections.inc()
+        handed_off = False
         
         try:
-            while self.running:
+            # Stops once the connection is closed (EXIT, or dropped as slow)
+            while self.running and not conn.closed:
                 try:
-                    # Receive message from client
-                    data = conn.recv(1024).decode(FORMAT)
+                    # Receive every complete line (or frame) sent so far
+                    if pending:
+                        lines, pending = reader.feed(pending), b""
+                    elif conn.binary:
+                        lines = reader.read_frames()
+                    else:
+                        lines = reader.read_lines()
                     
                     # Client disconnected
-                    if not data:
+                    if lines is None:
                         break
                     
-                    message = data.strip()
-                    print(f"[RECEIVED from {addr}] {message}")
-                    
-                    # Parse and execute command
-                    self.handle_command(conn, addr, message)
+                    # Parse and execute commands in order
+                    for i, line in enumerate(lines):
+                        if conn.binary:
+                            self.handle_frame(conn, addr, line)
+                            continue
+                        
+                        message = line.decode(FORMAT, errors="replace").strip()
+                        if message:
+                            log.debug("RECEIVED", "%s %s", addr, message)
+                            self.handle_command(conn, addr, message)
+                        
+                        # HELLO BINARY/1: what follows are frames
+                        if conn.binary:
+                            pending = reader.unread(lines[i + 1:])
+                            reader = self.make_reader(conn)
+                            break
+                
+                except HandOff as handoff:
+                    # lines[i] is the command that asked for the move
+                    if self.hand_off(conn, handoff.shard, conn.sock,
+                                     reader.unread(lines[i:])):
+                        handed_off = True
+                        break
                 
+                except (LineTooLongError, FrameTooLongError):
+                    log.warning("LINE TOO LONG", "%s", addr)
+                    self.send(conn, "ERROR Line too long")
+                    break
                 except ConnectionResetError:
-                    print(f"[CONNECTION RESET] {addr}")
+                    log.debug("CONNECTION RESET", "%s", addr)
                     break
                 except Exception as e:
                     break
         
         finally:
-            self.disconnect_client(conn, addr)
+            if handed_off:
+                conn.close()
+            else:
+                self.disconnect_client(conn, addr)
+    
+    def make_reader(self, conn):
+        """Return a frame or line reader for the connection's protocol"""
+        if conn.binary:
+            return FrameReader(conn.sock, on_data=self.metrics.bytes_in.inc,
+                               recv_size=RECV_SIZE)
+        return LineReader(conn.sock, on_data=self.metrics.bytes_in.inc)
     
     def handle_command(self, conn, addr, message):
         """
-        Parse and execute a command sent by a client.
+        Parse and execute a command sent by a client,
+        recording its handling time.
         """
         parts = message.split()
         if not parts:
             return
         
+        start = time.perf_counter()
+        self.dispatch_command(conn, addr, message, parts)
+        self.metrics.observe_command(parts[0], time.perf_counter() - start)
+    
+    def dispatch_command(self, conn, addr, message, parts):
+        """
+        Execute an already split command.
+        """
         command = parts[0]
-        print(f"[COMMAND from {addr}] {message}")
+        log.debug("COMMAND", "%s %s", addr, message)
         
-        # LIST - list available games
+        # LIST [players=<n>] [after=<id>] [limit=<k>] - list available games
         if command == "LIST":
-            self.handle_list(conn)
+            try:
+                options = dict(part.split("=", 1) for part in parts[1:])
+                num_players = int(options.pop("players")) if "players" in options else None
+                after = int(options.pop("after", 0))
+                limit = int(options.pop("limit", DEFAULT_PAGE_SIZE))
+                if options:
+                    raise ValueError(options)
+            except ValueError:
+                self.send(conn, "Invalid LIST command")
+                return
+            self.handle_list(conn, num_players, after, limit)
         
-        # CREATE <players> - create a new game
+        # CREATE <players> [bots] - create a new game,
+        # optionally with computer players in some of the seats
         elif command == "CREATE":
             if len(parts) < 2:
                 self.send(conn, "Invalid CREATE command")
                 return
             try:
                 num_players = int(parts[1])
-                self.handle_create(conn, addr, num_players)
+                bots = int(parts[2]) if len(parts) > 2 else 0
+                self.handle_create(conn, addr, num_players, bots)
             except ValueError:
                 self.send(conn, "Invalid number of players")
         
@@ -156,13 +841,7 @@ class TicTacToeServer:
                 self.send(conn, "INVALID Missing row or column")
                 
                 # Re-send YOURTURN if applicable
-                with self.conn_lock:
-                    game_id = self.conn_to_game.get(conn)
-                if game_id:
-                    with self.games_lock:
-                        game = self.games.get(game_id)
-                    if game and game.is_player_turn(conn):
-                        self.send(conn, "YOURTURN")
+                self.resend_turn(conn)
                 return
             
             try:
@@ -173,13 +852,56 @@ class TicTacToeServer:
                 self.send(conn, "INVALID Invalid move format (use: MOVE <row> <col>)")
                 
                 # Re-send YOURTURN if applicable
-                with self.conn_lock:
-                    game_id = self.conn_to_game.get(conn)
-                if game_id:
-                    with self.games_lock:
-                        game = self.games.get(game_id)
-                    if game and game.is_player_turn(conn):
-                        self.send(conn, "YOURTURN")
+                self.resend_turn(conn)
+        
+        # HELLO <capabilities...> - negotiate optional protocol features
+        elif command == "HELLO":
+            self.handle_hello(conn, parts[1:])
+        
+        # REJOIN <game_id> <token> - reclaim a seat after a server restart
+        elif command == "REJOIN":
+            if len(parts) < 3:
+                self.send(conn, "Invalid REJOIN command")
+                return
+            try:
+                game_id = int(parts[1])
+                token = int(parts[2], 16)
+            except ValueError:
+                self.send(conn, "Invalid REJOIN command")
+                return
+            self.handle_rejoin(conn, addr, game_id, token)
+        
+        # QUICKPLAY <players> - join or create a game of that size
+        elif command == "QUICKPLAY":
+            if len(parts) < 2:
+                self.send(conn, "Invalid QUICKPLAY command")
+                return
+            try:
+                num_players = int(parts[1])
+            except ValueError:
+                self.send(conn, "Invalid number of players")
+                return
+            self.handle_quickplay(conn, addr, num_players)
+        
+        # WATCH <game_id> - follow a game as a spectator
+        elif command == "WATCH":
+            if len(parts) < 2:
+                self.send(conn, "Invalid WATCH command")
+                return
+            try:
+                game_id = int(parts[1])
+            except ValueError:
+                self.send(conn, "Invalid game ID")
+                return
+            self.handle_watch(conn, addr, game_id)
+        
+        # RESYNC - request a full board snapshot
+        elif command == "RESYNC":
+            self.handle_resync(conn)
+        
+        # STATS - server counters and latency summary (admin)
+        elif command == "STATS":
+            self.send(conn, self.metrics.stats_line())
         
         # EXIT - disconnect client
         elif command == "EXIT":
@@ -189,69 +911,236 @@ class TicTacToeServer:
         else:
             self.send(conn, f"Unknown command: {command}")
     
-    def handle_list(self, conn):
+    def handle_frame(self, conn, addr, data):
+        """
+        Decode and execute a binary command frame,
+        recording its handling time.
+        """
+        try:
+            command, args = decode_command(data)
+        except ProtocolError as e:
+            self.send(conn, f"ERROR {e}")
+            return
+        
+        log.debug("RECEIVED", "%s %s %s", addr, command, args)
+        start = time.perf_counter()
+        self.dispatch_frame(conn, addr, command, args)
+        self.metrics.observe_command(command, time.perf_counter() - start)
+    
+    def dispatch_frame(self, conn, addr, command, args):
+        """
+        Execute a decoded frame. Arguments arrive as integers,
+        so the handlers are called without any parsing.
+        """
+        if command == "MOVE":
+            self.handle_move(conn, addr, *args)
+        
+        elif command == "JOIN":
+            self.handle_join(conn, addr, args[0])
+        
+        elif command == "CREATE":
+            self.handle_create(conn, addr, *args)
+        
+        # LIST: 0 players means any, 0 limit the default page size
+        elif command == "LIST":
+            num_players, after, limit = args
+            self.handle_list(conn, num_players or None, after,
+                             limit or DEFAULT_PAGE_SIZE)
+        
+        elif command == "HELLO":
+            self.handle_hello(conn, [BINARY_CAPABILITY] + decode_caps(args[0]))
+        
+        elif command == "REJOIN":
+            self.handle_rejoin(conn, addr, *args)
+        
+        elif command == "QUICKPLAY":
+            self.handle_quickplay(conn, addr, args[0])
+        
+        elif command == "WATCH":
+            self.handle_watch(conn, addr, args[0])
+        
+        # RESYNC, STATS, EXIT take no arguments
+        else:
+            self.dispatch_command(conn, addr, command, [command])
+    
+    def handle_hello(self, conn, requested):
+        """
+        Handle HELLO command.
+        Enables the requested capabilities this server supports
+        and replies with the accepted ones.
+        """
+        accepted = [cap for cap in requested if cap in CAPABILITIES]
+        conn.caps = frozenset(accepted)
+        
+        # The reply still uses the protocol the client asked in
+        reply = self.encode(conn, " ".join(["HELLO"] + accepted))
+        
+        game = conn.watching
+        if game is None:
+            self.send_bytes(conn, reply)
+            conn.binary = BINARY_CAPABILITY in conn.caps
+            return
+        
+        # A spectator's broadcasts now come in another form. The reply
+        # goes through the fan-out too, behind the broadcasts already
+        # queued in the old form, and the switch happens under the game
+        # lock, so no broadcast of the old form is queued after it.
+        with game.lock:
+            self.broadcast((conn,), reply)
+            conn.binary = BINARY_CAPABILITY in conn.caps
+            if self.remove_spectator(game, conn):
+                self.add_spectator(game, conn)
+    
+    def has_capability(self, conn, capability):
+        """Return True if the client negotiated the given capability"""
+        return capability in conn.caps
+    
+    def resend_turn(self, conn):
+        """Re-send YOURTURN if it is this connection's turn"""
+        session = conn.session
+        if session:
+            with session.game.lock:
+                if session.game.is_turn_of(session.player):
+                    self.send(conn, "YOURTURN")
+    
+    def handle_resync(self, conn):
+        """
+        Handle RESYNC command.
+        Sends a full board snapshot of the client's current game.
+        """
+        session = conn.session
+        
+        # Spectators get the board through the fan-out, behind the
+        # moves already queued for them
+        if session is None and conn.watching is not None:
+            game = conn.watching
+            with game.lock:
+                if game.started:
+                    self.broadcast((conn,), self.board_data(game, conn.binary))
+                    return
+        
+        if not session or not session.game.started:
+            self.send(conn, "INVALID Not in a game")
+            return
+        
+        game = session.game
+        with game.lock:
+            self.send_board(conn, game)
+    
+    def handle_list(self, conn, num_players=None, after=0, limit=DEFAULT_PAGE_SIZE):
         """
         Handle LIST command.
-        Sends a list of waiting games.
+        Sends one page of waiting games, optionally filtered by player
+        count. A trailing "next:<id>" token is the cursor for the next
+        page (pass it back as after=<id>).
         """
-        with self.games_lock:
-            waiting_games = []
-            
-            for game_id, game in self.games.items():
-                if game.is_waiting():
-                    waiting_games.append(
-                        f"{game_id}:{game.num_players}:{len(game.players)}"
-                    )
-            
-            games_str = " ".join(waiting_games) if waiting_games else ""
-            response = f"GAMES {games_str}"
-            self.send(conn, response)
-            print(f"[SENT] {response}")
+        games, next_cursor = self.lobby.page(num_players, after, limit)
+        
+        # Other workers' waiting games are listed too
+        if self.router:
+            games, next_cursor = LobbyIndex.merge_pages(
+                [(games, next_cursor),
+                 self.remote_lobby.page(num_players, after, limit)], limit)
+        
+        waiting_games = [
+            f"{game.game_id}:{game.num_players}:{joined_count(game)}"
+            for game in games
+        ]
+        if next_cursor is not None:
+            waiting_games.append(f"next:{next_cursor}")
+        
+        games_str = " ".join(waiting_games) if waiting_games else ""
+        response = f"GAMES {games_str}"
+        self.send(conn, response)
+        log.debug("SENT", "%s", response)
     
-    def handle_create(self, conn, addr, num_players):
+    def handle_create(self, conn, addr, num_players, bots=0):
         """
         Handle CREATE command.
-        Creates a new game and adds the creator as first player.
+        Creates a new game, adds the creator as first player and
+        seats `bots` computer players after them.
         """
         if num_players < 2 or num_players > 13:
             self.send(conn, "Number of players must be 2-13")
             return
         
+        if bots < 0 or bots >= num_players:
+            self.send(conn, f"Number of bots must be 0-{num_players - 1}")
+            return
+        
+        if conn.session is not None:
+            self.send(conn, "Already in a game")
+            return
+        
+        self.stop_watching(conn)
+        
         with self.games_lock:
-            game_id = self.next_game_id
+            game_id = self.next_game_id * self.shards + self.shard
             self.next_game_id += 1
-            
-            game = Game(game_id, num_players)
-            success, symbol = game.add_player(conn, addr)
-            
-            if not success:
-                self.send(conn, f"Error: {symbol}")
-                return
-            
-            self.games[game_id] = game
-            
-            with self.conn_lock:
-                self.conn_to_game[conn] = game_id
         
-        # Notify creator
-        self.send(conn, f"CREATED {game_id}")
-        self.send(conn, f"JOINED {symbol}")
-        self.send(conn, "WAIT")
+        game = Game(game_id, num_players)
+        success, symbol = game.add_player(conn, addr)
+        
+        if not success:
+            self.send(conn, f"Error: {symbol}")
+            return
+        
+        token = game.players[-1].token = self.new_token()
+        conn.session = Session(game, game.players[-1])
+        
+        for _ in range(bots):
+            seat = BotConnection()
+            _, bot_symbol = game.add_player(seat, seat.addr)
+            seat.bot = BotPlayer(bot_symbol, self.bot_time)
         
-        print(f"[GAME CREATED] Game {game_id} by {addr} ({num_players} players)")
+        # Held from registration through the first sends: a JOIN by id
+        # waits until the game is announced (or started) here
+        with game.lock:
+            # Journaled as the game registers, so a snapshot either saves
+            # the game or sees these records after its journal rotation
+            with self.games_lock:
+                self.journal.create(game_id, num_players)
+                for player in game.players:
+                    self.journal.join(game_id, SYMBOL_INDEX[player.symbol], player.token)
+                self.games[game_id] = game
+            self.metrics.games_created.inc()
+            log.info("GAME CREATED", "Game %s by %s (%d players, %d bots)",
+                     game_id, addr, num_players, bots)
+            
+            # Notify creator
+            self.send(conn, f"CREATED {game_id}", f"JOINED {symbol}")
+            self.send_seat(conn, game_id, token)
+            if game.started:
+                # Bots took every other seat
+                self.metrics.games_started.inc()
+                self.start_game(game)
+            else:
+                self.lobby.add(game)
+                self.announce_lobby(game)
+                self.send(conn, "WAIT")
     
     def handle_join(self, conn, addr, game_id):
         """
         Handle JOIN command.
         Adds a player to an existing game.
         """
-        with self.games_lock:
-            game = self.games.get(game_id)
-            
-            if not game:
-                self.send(conn, f"Game {game_id} not found")
-                return
-            
+        # Another worker owns the game: move the connection there
+        if self.router and not self.router.is_local(game_id) and conn.session is None:
+            raise HandOff(self.router.owner(game_id))
+        
+        if conn.session is not None:
+            self.send(conn, "Already in a game")
+            return
+        
+        game = self.games.get(game_id)
+        
+        # An aborted game may still be referenced until it is unregistered
+        if not game or game.ended:
+            self.send(conn, f"Game {game_id} not found")
+            return
+        
+        self.stop_watching(conn)
+        with game.lock:
             if not game.is_waiting():
                 self.send(conn, "Game already started")
                 return
@@ -260,136 +1149,596 @@ class TicTacToeServer:
                 self.send(conn, "Game is full")
                 return
             
-            success, symbol = game.add_player(conn, addr)
-            
-            if not success:
-                self.send(conn, f"Error: {symbol}")
+            if game.ended:
+                self.send(conn, f"Game {game_id} not found")
                 return
             
-            with self.conn_lock:
-                self.conn_to_game[conn] = game_id
+            self.seat_player(conn, addr, game)
+    
+    def seat_player(self, conn, addr, game):
+        """
+        Add a player to a waiting game and start it once full
+        (caller holds game.lock).
+        """
+        game_id = game.game_id
+        success, symbol = game.add_player(conn, addr)
+        
+        if not success:
+            self.send(conn, f"Error: {symbol}")
+            return
         
+        token = game.players[-1].token = self.new_token()
+        conn.session = Session(game, game.players[-1])
+        self.journal.join(game_id, SYMBOL_INDEX[symbol], token)
+        
+        # Sent under the game lock so JOINED/BOARD precede any move
         self.send(conn, f"JOINED {symbol}")
-        print(f"[PLAYER JOINED] {addr} joined game {game_id} as {symbol}")
+        self.send_seat(conn, game_id, token)
+        log.info("PLAYER JOINED", "%s joined game %s as %s",
+                 addr, game_id, symbol)
         
         if game.started:
+            self.lobby.remove(game)
+            self.metrics.games_started.inc()
             self.start_game(game)
         else:
             self.send(conn, "WAIT")
+        self.announce_lobby(game)
+    
+    def announce_lobby(self, game):
+        """
+        Tell the other workers how a game now stands in this worker's
+        lobby: its seats taken while it waits, 0 once it started or
+        ended (caller holds game.lock, which keeps the updates of one
+        game in order).
+        """
+        if self.router:
+            joined = 0 if game.started or game.ended else len(game.players)
+            self.router.announce([(game.game_id, game.num_players, joined)])
+    
+    def update_remote_lobby(self, entries):
+        """
+        Apply lobby entries announced by another worker
+        (router thread; the only writer of remote_lobby).
+        """
+        for game_id, num_players, joined in entries:
+            entry = self.remote_lobby.get(game_id)
+            if not joined:
+                if entry is not None:
+                    self.remote_lobby.remove(entry)
+            elif entry is None:
+                self.remote_lobby.add(LobbyEntry(game_id, num_players, joined))
+            else:
+                entry.joined = joined
+    
+    def handle_quickplay(self, conn, addr, num_players):
+        """
+        Handle QUICKPLAY command.
+        Seats the player in the longest-waiting game for num_players,
+        or creates one if none is waiting, in a single round trip.
+        """
+        if num_players < 2 or num_players > 13:
+            self.send(conn, "Number of players must be 2-13")
+            return
+        
+        # Each game size is matched on one worker, so all its
+        # players meet in the same queue
+        owner = num_players % self.shards
+        if self.router and owner != self.shard and conn.session is None:
+            raise HandOff(owner)
+        
+        if conn.session is not None:
+            self.send(conn, "Already in a game")
+            return
+        
+        self.stop_watching(conn)
+        while True:
+            game = self.lobby.first(num_players)
+            if game is None:
+                self.handle_create(conn, addr, num_players)
+                return
+            
+            with game.lock:
+                if game.is_waiting() and not game.is_full() and not game.ended:
+                    self.seat_player(conn, addr, game)
+                    return
+            
+            # Started or aborted meanwhile: drop it and try the next one
+            self.lobby.remove(game)
+    
+    def new_token(self):
+        """Return a fresh secret seat token (never 0, which marks bots)"""
+        return secrets.randbits(63) + 1
+    
+    def send_seat(self, conn, game_id, token):
+        """Tell a client its seat token if it negotiated REJOIN"""
+        if self.has_capability(conn, "REJOIN"):
+            self.send(conn, f"SEAT {game_id} {token:x}")
+    
+    def handle_watch(self, conn, addr, game_id):
+        """
+        Handle WATCH command.
+        Follows a game without taking a seat: the spectator gets
+        "WATCHING <game_id>", the board once the game has started, then
+        every move and the result, in the form it negotiated.
+        """
+        # Another worker owns the game: move the connection there
+        if self.router and not self.router.is_local(game_id) and conn.session is None:
+            raise HandOff(self.router.owner(game_id))
+        
+        if conn.session is not None:
+            self.send(conn, "Already in a game")
+            return
+        
+        game = self.games.get(game_id)
+        if not game or game.ended:
+            self.send(conn, f"Game {game_id} not found")
+            return
+        
+        self.stop_watching(conn)
+        with game.lock:
+            if game.ended:
+                self.send(conn, f"Game {game_id} not found")
+                return
+            
+            self.add_spectator(game, conn)
+            conn.watching = game
+            
+            # Through the fan-out, so it precedes the moves queued after it
+            data = self.encode(conn, f"WATCHING {game_id}")
+            if game.started:
+                data += self.board_data(game, conn.binary)
+            self.broadcast((conn,), data)
+        
+        self.metrics.spectators.inc()
+        log.debug("WATCHING", "%s watches game %s", addr, game_id)
+    
+    def stop_watching(self, conn):
+        """Stop sending a game's broadcasts to a spectator"""
+        game = conn.watching
+        if game is None:
+            return
+        conn.watching = None
+        with game.lock:
+            if self.remove_spectator(game, conn):
+                self.metrics.spectators.dec()
+    
+    def client_form(self, conn):
+        """Return how a client gets updates: (binary, delta)"""
+        return conn.binary, "DELTA" in conn.caps
+    
+    def add_spectator(self, game, conn):
+        """Add a spectator to its form's group (caller holds game.lock)"""
+        if game.spectators is None:
+            game.spectators = Spectators()
+        game.spectators.add(self.client_form(conn), conn)
+    
+    def remove_spectator(self, game, conn):
+        """
+        Remove a spectator from the game (caller holds game.lock).
+        
+        Returns:
+            True if it was watching the game
+        """
+        return game.spectators is not None and game.spectators.remove(conn)
+    
+    def broadcast(self, conns, data):
+        """
+        Send the same encoded bytes to many clients through the fan-out.
+        The caller returns without waiting for the writes.
+        """
+        self.count_bytes_out(len(data) * len(conns))
+        self.fanout.submit(conns, data)
+    
+    def broadcast_spectators(self, game, *messages):
+        """
+        Send messages to every spectator of a game, encoded once per
+        form (caller holds game.lock).
+        """
+        for (binary, delta), conns in (game.spectators or {}).items():
+            self.broadcast(conns, self.encode_messages(binary, messages))
+    
+    def handle_rejoin(self, conn, addr, game_id, token):
+        """
+        Handle REJOIN command.
+        Hands a seat of a game recovered from the journal back to its
+        player, who proves it with the token received in SEAT.
+        """
+        # Another worker owns the game: move the connection there
+        if self.router and not self.router.is_local(game_id) and conn.session is None:
+            raise HandOff(self.router.owner(game_id))
+        
+        if conn.session is not None:
+            self.send(conn, "Already in a game")
+            return
+        
+        game = self.games.get(game_id)
+        if not game or game.ended:
+            self.send(conn, f"Game {game_id} not found")
+            return
+        
+        self.stop_watching(conn)
+        with game.lock:
+            for player in game.players:
+                seat = player.conn
+                if isinstance(seat, AwayConnection) and player.token == token:
+                    break
+            else:
+                self.send(conn, "Invalid seat token")
+                return
+            
+            player.conn = conn
+            player.addr = addr
+            conn.session = Session(game, player)
+            self.send(conn, f"JOINED {player.symbol}")
+            self.send_seat(conn, game_id, token)
+            log.info("PLAYER REJOINED", "%s rejoined game %s as %s",
+                     addr, game_id, player.symbol)
+            
+            if not game.started:
+                self.send(conn, "WAIT")
+                return
+            
+            if game.is_turn_of(player):
+                self.send_board(conn, game, "YOURTURN")
+            else:
+                self.send_board(conn, game)
+            
+            # A recovered game's bots wait for the first player back
+            self.schedule_bot(game)
     
     def start_game(self, game):
         """
-        Start the game:
+        Start the game (caller holds game.lock):
         - Send initial board to all players
         - Notify first player that it's their turn
         """
-        print(f"[GAME STARTED] Game {game.game_id}")
-        
-        board_str = game.get_board_string()
+        log.info("GAME STARTED", "Game %s", game.game_id)
         
         for i, player in enumerate(game.players):
-            self.send(player.conn, board_str)
-            
             if i == 0:
-                self.send(player.conn, "YOURTURN")
+                self.send_board(player.conn, game, "YOURTURN")
+            else:
+                self.send_board(player.conn, game)
+        
+        for (binary, _), conns in (game.spectators or {}).items():
+            self.broadcast(conns, self.board_data(game, binary))
+        self.schedule_bot(game)
+    
+    def schedule_bot(self, game):
+        """
+        Let a computer player move if it is its turn (caller holds
+        game.lock). The search runs on a bot thread on a snapshot of
+        the position, so the game stays unlocked meanwhile.
+        
+        The move's deadline is set here, so a job that waited for a bot
+        thread searches only for what is left of its budget. Past
+        BOT_QUEUE_LIMIT pending moves, new ones get no search at all:
+        under load the queue drains at the speed of the quick move.
+        """
+        player = game.get_current_player()
+        if player is None or player.conn.bot is None:
+            return
+        deadline = time.perf_counter() + player.conn.bot.move_time
+        with self.bot_jobs_lock:
+            self.bot_jobs += 1
+            if self.bot_jobs > BOT_QUEUE_LIMIT:
+                deadline = 0.0
+        self.bot_pool.submit(self.run_bot, game, player,
+                             Position.from_game(game), deadline)
+    
+    def run_bot(self, game, player, position, deadline):
+        """Bot thread: search a move until the deadline and play it"""
+        try:
+            row, col = player.conn.bot.choose_move(position, deadline)
+        except Exception as e:
+            log.error("ERROR", "Bot in game %s failed: %s", game.game_id, e)
+            return
+        finally:
+            with self.bot_jobs_lock:
+                self.bot_jobs -= 1
+        self.apply_bot_move(game, player, position, row, col)
+    
+    def apply_bot_move(self, game, player, position, row, col):
+        """
+        Play a bot's move unless the game moved on while it searched
+        (a player left, or the game ended).
+        """
+        with game.lock:
+            if game.is_turn_of(player) and game.move_count == position.move_count:
+                self.apply_move(game, player.conn, row, col)
     
     def handle_move(self, conn, addr, row, col):
         """
         Handle MOVE command.
         Broadcast board updates and game results.
         """
-        with self.conn_lock:
-            game_id = self.conn_to_game.get(conn)
+        session = conn.session
         
-        if game_id is None:
+        if session is None:
             self.send(conn, "INVALID Not in a game")
             return
         
-        with self.games_lock:
-            game = self.games.get(game_id)
-        
-        if not game:
-            self.send(conn, "INVALID Game not found")
-            return
+        game = session.game
         
+        # Moves in different games never contend: only this game is locked
+        with game.lock:
+            self.apply_move(game, conn, row, col)
+    
+    def apply_move(self, game, conn, row, col):
+        """
+        Make a move and broadcast the result (caller holds game.lock).
+        """
+        game_id = game.game_id
         status, data = game.make_move(conn, row, col)
         
         if status == "invalid":
-            self.send(conn, f"INVALID {data}")
-            self.send(conn, "YOURTURN")
+            self.metrics.invalid_moves.inc()
+            self.send(conn, f"INVALID {data}", "YOURTURN")
             return
         
-        # Send updated board to all players
-        board_str = game.get_board_string()
-        for player in game.players:
-            self.send(player.conn, board_str)
+        self.metrics.moves.inc()
+        self.journal.move(game_id, row, col)
         
-        if status == "win":
-            winner = game.winner
-            for player in game.players:
-                if player.conn == winner.conn:
-                    self.send(player.conn, "WIN")
-                else:
-                    self.send(player.conn, "LOSE")
+        if status in ("win", "draw"):
+            self.journal.end(game_id)
+            self.metrics.games_finished.inc()
+            self.reaper.game_finished(game)
+            if status == "win":
+                log.info("GAME ENDED", "Game %s - Winner: %s", game_id, game.winner.symbol)
+            else:
+                log.info("GAME ENDED", "Game %s - Draw", game_id)
             
-            print(f"[GAME ENDED] Game {game_id} - Winner: {winner.symbol}")
-        
-        elif status == "draw":
+            # The players are free to play or watch another game right
+            # away; the reaper removes the finished game later
             for player in game.players:
-                self.send(player.conn, "DRAW")
+                session = player.conn.session
+                if session is not None and session.game is game:
+                    player.conn.session = None
+        
+        winner = game.winner
+        next_player = None if game.ended else game.get_current_player()
+        if next_player is not None and next_player.conn.bot is not None:
+            self.schedule_bot(game)
+        
+        # Send the move to all players and spectators: a compact MOVED
+        # event to clients that negotiated DELTA, the full board to
+        # everyone else; the result or turn notice goes out in the same
+        # write. Each distinct message is encoded once and its bytes are
+        # shared by every client that gets it.
+        updates = {}
+        for player in game.players:
+            conn = player.conn
+            if conn.bot is not None:
+                continue
+            
+            if status == "win":
+                result = "WIN" if conn == winner.conn else "LOSE"
+            elif status == "draw":
+                result = "DRAW"
+            elif player is next_player:
+                result = "YOURTURN"
+            else:
+                result = None
             
-            print(f"[GAME ENDED] Game {game_id} - Draw")
+            key = (self.client_form(conn), result)
+            data = updates.get(key)
+            if data is None:
+                data = updates[key] = self.encode_update(game, key[0], row, col, result)
+            self.send_bytes(conn, data)
         
-        else:
-            current_player = game.get_current_player()
-            self.send(current_player.conn, "YOURTURN")
+        # Spectators learn the result instead of WIN/LOSE
+        if game.spectators:
+            if status == "win":
+                result = f"WINNER {winner.symbol}"
+            elif status == "draw":
+                result = "DRAW"
+            else:
+                result = None
+            for form, conns in game.spectators.items():
+                data = updates.get((form, result))
+                if data is None:
+                    data = self.encode_update(game, form, row, col, result)
+                self.broadcast(conns, data)
+        
+        # A finished game is not rendered again: free its board cache
+        if game.ended:
+            game.board_cache = None
+    
+    def encode_update(self, game, form, row, col, result=None):
+        """
+        Encode the update sent after the move at (row, col)
+        (caller holds game.lock).
+        
+        Args:
+            form: (binary, delta) of the receiving clients
+            result: Message sent in the same write (YOURTURN, WIN, ...) or None
+        
+        Returns:
+            bytes ready for the socket
+        """
+        binary, delta = form
+        symbol = game.get_cell(row, col)
+        
+        # Binary boards are framed around the game's cached cell indices
+        if binary:
+            if delta:
+                update = encode_moved(row, col, symbol, game.move_count)
+            else:
+                update = encode_board(game)
+            return update + encode_text(result) if result else update
+        
+        # The text board is cached per game version, already encoded
+        if not delta:
+            update = game.get_board_bytes()
+            return update + (result + "\n").encode(FORMAT) if result else update
+        update = f"MOVED {row} {col} {symbol} {game.move_count}"
+        if result:
+            return f"{update}\n{result}\n".encode(FORMAT)
+        return (update + "\n").encode(FORMAT)
+    
+    def send(self, conn, *messages):
+        """
+        Send one or more messages to a client in a single write
+        (as frames if it switched to the binary protocol).
+        Never blocks: a client that falls too far behind is dropped.
+        """
+        self.send_bytes(conn, self.encode(conn, *messages))
     
-    def send(self, conn, message):
-        """Send a message to a client"""
+    def send_board(self, conn, game, *messages):
+        """
+        Send the board and then messages in a single write
+        (caller holds game.lock).
+        """
+        data = self.board_data(game, conn.binary)
+        self.send_bytes(conn, data + self.encode(conn, *messages) if messages else data)
+    
+    def board_data(self, game, binary):
+        """
+        Return the encoded board for text or binary clients
+        (caller holds game.lock). Both forms come from the game's
+        board cache, rendered once per version.
+        """
+        return encode_board(game) if binary else game.get_board_bytes()
+    
+    def encode(self, conn, *messages):
+        """Encode messages for one client"""
+        return self.encode_messages(conn.binary, messages)
+    
+    def encode_messages(self, binary, messages):
+        """Encode messages as frames or text lines"""
+        if binary:
+            return b"".join(encode_text(message) for message in messages)
+        if len(messages) == 1:
+            return (messages[0] + "\n").encode(FORMAT)
+        return "".join(message + "\n" for message in messages).encode(FORMAT)
+    
+    def send_bytes(self, conn, data):
+        """Send already encoded data to a client"""
+        self.count_bytes_out(len(data))
         try:
-            conn.send((message + "\n").encode(FORMAT))
+            conn.write(data)
+        except OutboundOverflow:
+            self.drop_slow_client(conn)
         except Exception as e:
             pass
     
+    def drop_slow_client(self, conn):
+        """
+        A client let its outbound buffer pass max_outbound. Its socket has
+        been shut down; its reader disconnects it the usual way.
+        """
+        self.metrics.slow_clients.inc()
+        log.warning("SLOW CLIENT", "%s more than %d bytes behind, disconnecting",
+                    conn.addr, self.max_outbound)
+    
     def disconnect_client(self, conn, addr):
         """
         Handle client disconnection:
         - Remove player from game
         - Notify remaining players
         """
-        print(f"[DISCONNECTED] {addr}")
+        log.debug("DISCONNECTED", "%s", addr)
+        self.metrics.active_connections.dec()
         
-        with self.conn_lock:
-            game_id = self.conn_to_game.pop(conn, None)
+        session = conn.session
+        conn.session = None
+        self.stop_watching(conn)
         
-        if game_id:
-            with self.games_lock:
-                game = self.games.get(game_id)
+        # Clients cut off by shutdown keep their seats (snapshot, journal)
+        if session and not self.stopping:
+            game = session.game
+            game_id = game.game_id
+            
+            with game.lock:
+                # Finished games are already closed in the journal
+                journaled = not game.ended
+                if journaled:
+                    self.journal.leave(game_id, SYMBOL_INDEX[session.player.symbol])
+                result = game.remove_player(conn)
                 
-                if game:
-                    result = game.remove_player(conn)
-                    
-                    # Notify remaining players
+                # Only computer players left: nobody to play for
+                if result != "abort" and not self.has_humans(game):
+                    game.end("abort")
+                    result = "abort"
+                
+                if journaled and game.ended:
+                    self.journal.end(game_id)
+                
+                # One seat fewer taken in a game still waiting
+                if not game.started and not game.ended:
+                    self.announce_lobby(game)
+                
+                # Notify remaining players and spectators
+                for p in game.players:
+                    self.send(p.conn, "PLAYER_LEFT")
+                self.broadcast_spectators(game, "PLAYER_LEFT")
+                
+                # Abort game if needed
+                if result == "abort":
                     for p in game.players:
-                        self.send(p.conn, "PLAYER_LEFT")
-                    
-                    # Abort game if needed
-                    if result == "abort":
-                        for p in game.players:
-                            self.send(p.conn, "GAME_ABORTED")
-                        
-                        del self.games[game_id]
-                        print(f"[GAME REMOVED] Game {game_id} deleted")
+                        self.send(p.conn, "GAME_ABORTED")
+                    self.broadcast_spectators(game, "GAME_ABORTED")
+                else:
+                    # The turn may have passed to a computer player
+                    self.schedule_bot(game)
+            
+            if result == "abort":
+                if game.result == "abort":
+                    self.metrics.games_aborted.inc()
+                self.unregister_game(game)
+                log.info("GAME REMOVED", "Game %s deleted", game_id)
         
         try:
             conn.close()
         except:
             pass
     
+    def has_humans(self, game):
+        """Return True if a client (not a bot) is seated in the game"""
+        return any(player.conn.bot is None for player in game.players)
+    
+    def unregister_game(self, game):
+        """
+        Remove a game from the registry, the lobby and the
+        sessions of players still seated in it.
+        """
+        if self.lobby.remove(game) and self.router:
+            self.router.announce([(game.game_id, game.num_players, 0)])
+        
+        with self.games_lock:
+            self.games.pop(game.game_id, None)
+        
+        with game.lock:
+            for player in game.players:
+                session = player.conn.session
+                if session is not None and session.game is game:
+                    player.conn.session = None
+            
+            # Spectators stop watching; the game is gone
+            if game.spectators is not None:
+                for conn in game.spectators.connections():
+                    if conn.watching is game:
+                        conn.watching = None
+                self.metrics.spectators.dec(len(game.spectators))
+                game.spectators = None
+    
+    def terminate(self):
+        """Stop serving on SIGTERM (called from the signal handler)"""
+        sys.exit(0)
+    
     def shutdown(self):
         """Shutdown the server cleanly"""
-        print("\n[SHUTTING DOWN] Server shutting down...")
+        log.info("SHUTTING DOWN", "Server shutting down...")
         self.running = False
+        self.stopping = True
+        self.reaper.stop()
+        self.bot_pool.shutdown(wait=False, cancel_futures=True)
+        if self.snapshots:
+            self.snapshots.stop()
+        self.journal.close()
+        if self.router:
+            self.router.close()
         
         if self.server_socket:
             try:
@@ -397,18 +1746,362 @@ class TicTacToeServer:
             except:
                 pass
         
-        print("[SHUTDOWN COMPLETE]")
+        log.info("SHUTDOWN COMPLETE")
+        log.flush()
+
+
+def stream_unread(reader):
+    """
+    Bytes a StreamReader has received but not returned yet.
+    
+    asyncio offers no public way to take them back, so this reads the
+    private bytearray StreamReader._buffer. That attribute is the same
+    on CPython 3.7 through 3.13; this is the only place relying on it.
+    
+    Returns:
+        bytes, or None if the running Python stores them differently
+    """
+    buffer = getattr(reader, "_buffer", None)
+    if not isinstance(buffer, (bytes, bytearray)):
+        return None
+    return bytes(buffer)
+
+
+class AsyncTicTacToeServer(TicTacToeServer):
+    """
+    Server variant that serves every connection from a single asyncio
+    event loop instead of one thread per client.
+    Uses the same wire protocol and command handlers; here a connection
+    wraps the client's asyncio StreamWriter.
+    """
+
+    def __init__(self, host=HOST, port=PORT, **options):
+        super().__init__(host, port, **options)
+        self.async_server = None
+        self.loop = None
+        self.connection_count = 0
+        self.adopting = set()   # Tasks serving clients handed over by other workers
+        self.client_tasks = {}  # Dictionary: task serving a client - its StreamWriter
+        self.fanout = AsyncFanout(self.drop_slow_client)
+    
+    def start(self):
+        """Start the server and run the event loop until shutdown"""
+        try:
+            asyncio.run(self.serve())
+        except Exception as e:
+            log.error("ERROR", "Server start failed: %s", e)
+        finally:
+            self.shutdown()
+    
+    async def serve(self):
+        """Bind, listen and accept clients on the event loop"""
+        self.async_server = await asyncio.start_server(
+            self.handle_stream, self.host, self.port,
+            reuse_address=True, reuse_port=self.router is not None,
+            backlog=socket.SOMAXCONN, limit=MAX_LINE_LENGTH
+        )
+        self.running = True
+        self.reaper.start()
+        self.journal.start()
+        if self.snapshots:
+            self.snapshots.start()
+        self.loop = loop = asyncio.get_running_loop()
+        self.fanout.start(loop)
+        if self.router:
+            # Hand-offs are received on the router's thread, which keeps
+            # draining even while this loop is busy, so a sender never
+            # waits on a loop that is itself waiting to send
+            self.router.start(
+                lambda *client: loop.call_soon_threadsafe(self.receive_handoff, *client),
+                self.update_remote_lobby, self.lobby.entries)
+        self.print_banner("asyncio")
+        
+        async with self.async_server:
+            try:
+                await self.async_server.serve_forever()
+            except asyncio.CancelledError:
+                # Listener closed by terminate()
+                if not self.stopping:
+                    raise
+            finally:
+                # Streams closed from here on are the server going down
+                self.stopping = True
+                await self.close_clients()
+    
+    async def close_clients(self):
+        """
+        Close every client stream and wait for its task to finish, so no
+        task is left blocked in a read for asyncio.run() to cancel
+        """
+        for writer in list(self.client_tasks.values()):
+            writer.close()
+        if self.client_tasks:
+            await asyncio.gather(*self.client_tasks, return_exceptions=True)
+    
+    def apply_bot_move(self, game, player, position, row, col):
+        """Bot thread: play the move on the event loop, which owns the streams"""
+        self.loop.call_soon_threadsafe(super().apply_bot_move,
+                                       game, player, position, row, col)
+    
+    def receive_handoff(self, sock, caps, pending):
+        """Event loop callback: another worker handed a client over"""
+        task = asyncio.create_task(self.adopt_stream(sock, caps, pending))
+        self.adopting.add(task)
+        task.add_done_callback(self.adopting.discard)
+    
+    async def adopt_stream(self, sock, caps, pending):
+        """
+        Serve a client handed over by another worker.
+        pending is queued in the stream before the socket is read.
+        """
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader(limit=MAX_LINE_LENGTH)
+        reader.feed_data(pending)
+        protocol = asyncio.StreamReaderProtocol(reader)
+        transport, _ = await loop.connect_accepted_socket(lambda: protocol, sock)
+        writer = asyncio.StreamWriter(transport, protocol, reader, loop)
+        await self.handle_stream(reader, writer, caps)
+    
+    async def handle_stream(self, reader, writer, caps=None):
+        """
+        Handle communication with a single client.
+        Runs as a task on the event loop.
+        caps: capabilities of a client handed over by another worker
+        """
+        addr = writer.get_extra_info('peername')
+        conn = AsyncConnection(writer, addr, self.max_outbound)
+        if caps is None:
+            self.metrics.connections.inc()
+        else:
+            conn.caps = caps
+            conn.binary = BINARY_CAPABILITY in caps
+        self.metrics.active_connections.inc()
+        self.connection_count += 1
+        handed_off = False
+        task = asyncio.current_task()
+        self.client_tasks[task] = writer
+        log.debug("NEW CONNECTION", "%s", addr)
+        log.debug("ACTIVE CONNECTIONS", "%d", self.connection_count)
+        
+        try:
+            while self.running:
+                try:
+                    if conn.binary:
+                        # Receive one length-prefixed frame
+                        header = await reader.readexactly(2)
+                        length = int.from_bytes(header, "big")
+                        if length > MAX_FRAME_LENGTH:
+                            raise FrameTooLongError()
+                        line = header + await reader.readexactly(length)
+                        
+                        self.metrics.bytes_in.inc(len(line))
+                        self.handle_frame(conn, addr, line[2:])
+                        continue
+                    
+                    # Receive one newline-terminated line (ValueError:
+                    # longer than the StreamReader limit)
+                    try:
+                        line = await reader.readline()
+                    except ValueError:
+                        raise LineTooLongError() from None
+                    
+                    # Client disconnected (partial trailing data is dropped)
+                    if not line.endswith(b"\n"):
+                        break
+                    
+                    self.metrics.bytes_in.inc(len(line))
+                    message = line.decode(FORMAT, errors="replace").strip()
+                    if message:
+                        log.debug("RECEIVED", "%s %s", addr, message)
+                        self.handle_command(conn, addr, message)
+                
+                except HandOff as handoff:
+                    # Stop reading, then pass on this line (or frame) and
+                    # everything the stream has buffered after it
+                    writer.transport.pause_reading()
+                    unread = stream_unread(reader)
+                    if unread is None:
+                        log.error("HANDOFF FAILED", "%s: unread bytes unavailable "
+                                  "on this Python version", addr)
+                        self.send(conn, "ERROR Game server unavailable")
+                    elif self.hand_off(conn, handoff.shard,
+                                       writer.get_extra_info('socket'),
+                                       line + unread):
+                        handed_off = True
+                        break
+                    writer.transport.resume_reading()
+                
+                except asyncio.IncompleteReadError:
+                    # Disconnected mid-frame
+                    break
+                except (LineTooLongError, FrameTooLongError):
+                    log.warning("LINE TOO LONG", "%s", addr)
+                    self.send(conn, "ERROR Line too long")
+                    break
+                except ConnectionResetError:
+                    log.debug("CONNECTION RESET", "%s", addr)
+                    break
+                except Exception as e:
+                    break
+        
+        finally:
+            self.connection_count -= 1
+            del self.client_tasks[task]
+            if handed_off:
+                conn.close()
+            else:
+                self.disconnect_client(conn, addr)
+    
+    def terminate(self):
+        """
+        Stop serving on SIGTERM: close the listener from the event loop,
+        which ends serve_forever. Raising SystemExit in the handler could
+        interrupt any callback, including one that swallows it.
+        """
+        if self.loop is None:
+            super().terminate()
+        else:
+            self.loop.call_soon_threadsafe(self.async_server.close)
+    
+    def shutdown(self):
+        """Shutdown the server cleanly"""
+        if self.async_server:
+            self.async_server.close()
+        super().shutdown()
+
+
+# Server engines selectable at startup
+ENGINES = {
+    "threaded": TicTacToeServer,
+    "asyncio": AsyncTicTacToeServer,
+}
 
 def main():
     """Server entry point"""
-    server = TicTacToeServer()
+    parser = argparse.ArgumentParser(description="Tic-Tac-Toe server")
+    parser.add_argument("--engine", choices=sorted(ENGINES), default="threaded",
+                        help="connection handling engine (default: threaded)")
+    parser.add_argument("--host", default=HOST, help="address to bind")
+    parser.add_argument("--port", type=int, default=PORT, help="port to bind")
+    parser.add_argument("--finished-grace", type=float, default=FINISHED_GRACE_PERIOD,
+                        help="seconds before a finished game is evicted")
+    parser.add_argument("--archive-size", type=int, default=ARCHIVE_SIZE,
+                        help="finished game summaries kept in memory")
+    parser.add_argument("--no-metrics", action="store_true",
+                        help="disable metrics collection")
+    parser.add_argument("--metrics-port", type=int,
+                        help="serve Prometheus metrics on this local port")
+    parser.add_argument("--log-level", choices=list(LEVELS), default="info",
+                        help="minimum level logged (debug logs every message)")
+    parser.add_argument("--log-sample", action="append", metavar="CATEGORY=RATE",
+                        help="keep only RATE (0-1] of a category's records, "
+                             "e.g. RECEIVED=0.01 (repeatable)")
+    parser.add_argument("--log-queue", type=int,
+                        help="log records buffered before new ones are dropped")
+    parser.add_argument("--max-outbound", type=int, default=MAX_OUTBOUND,
+                        help="bytes queued for a client before it is "
+                             "disconnected as too slow")
+    parser.add_argument("--bot-time", type=float, default=BOT_MOVE_TIME,
+                        help="search time per computer player move (seconds)")
+    parser.add_argument("--journal", metavar="PATH",
+                        help="journal game events to PATH and recover the games "
+                             "in progress from it on startup (a worker uses "
+                             "PATH.<shard>)")
+    parser.add_argument("--journal-fsync", action="store_true",
+                        help="fsync the journal on every group commit")
+    parser.add_argument("--snapshot", metavar="PATH",
+                        help="save the games to PATH periodically and on "
+                             "shutdown, and load them on startup (a worker "
+                             "uses PATH.<shard>)")
+    parser.add_argument("--snapshot-interval", type=float, default=SNAPSHOT_INTERVAL,
+                        help="seconds between snapshots")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes sharing the port (SO_REUSEPORT); "
+                             "each owns a shard of the games")
+    args = parser.parse_args()
+    
+    if args.workers > 1:
+        run_workers(args)
+    else:
+        run_server(args)
+
+def run_server(args, shard=0, shards=1, ipc_dir=None):
+    """Run one server process (a worker when shards > 1)"""
+    log.configure(level=LEVELS[args.log_level],
+                  sampling=parse_sampling(args.log_sample),
+                  queue_size=args.log_queue)
+    
+    journal_path = args.journal
+    snapshot_path = args.snapshot
+    if shards > 1:
+        if journal_path:
+            journal_path = f"{journal_path}.{shard}"
+        if snapshot_path:
+            snapshot_path = f"{snapshot_path}.{shard}"
+    
+    server = ENGINES[args.engine](args.host, args.port,
+                                  finished_grace=args.finished_grace,
+                                  archive_size=args.archive_size,
+                                  metrics=not args.no_metrics,
+                                  shard=shard, shards=shards, ipc_dir=ipc_dir,
+                                  max_outbound=args.max_outbound,
+                                  bot_time=args.bot_time,
+                                  journal_path=journal_path,
+                                  journal_fsync=args.journal_fsync,
+                                  snapshot_path=snapshot_path,
+                                  snapshot_interval=args.snapshot_interval)
+    
+    if args.metrics_port:
+        # One endpoint per worker on consecutive ports
+        metrics_port = args.metrics_port + shard
+        start_http_server(server.metrics, metrics_port, args.host)
+        log.info("METRICS", "http://%s:%d/metrics", args.host, metrics_port)
+    
+    # A deploy stops the server with SIGTERM: shut down the same way as
+    # on Ctrl+C, so the final snapshot is saved. Clients cut off from
+    # here on keep their seats.
+    def stop(signum, frame):
+        server.stopping = True
+        server.terminate()
+    signal.signal(signal.SIGTERM, stop)
     
     try:
         server.start()
     except KeyboardInterrupt:
-        print("\n[INTERRUPTED] Shutting down...")
+        log.info("INTERRUPTED", "Shutting down...")
     finally:
         server.shutdown()
 
+def run_workers(args):
+    """
+    Start args.workers server processes on the same port and wait.
+    Workers hand connections to each other over Unix sockets in a
+    private temporary directory.
+    """
+    ipc_dir = tempfile.mkdtemp(prefix="tictactoe-")
+    context = multiprocessing.get_context("spawn")
+    workers = [
+        context.Process(target=run_server, args=(args, shard, args.workers, ipc_dir))
+        for shard in range(args.workers)
+    ]
+    for worker in workers:
+        worker.start()
+    
+    # Stopping the parent stops the workers too
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        # Workers get the same SIGINT and shut down on their own
+        for worker in workers:
+            worker.join(timeout=5)
+    finally:
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+        shutil.rmtree(ipc_dir, ignore_errors=True)
+
 if __name__ == '__main__':
-    main()
+    main()
\ No newline at end of file
@@ -0,0 +1,207 @@
+"""
+Tic-Tac-Toe Server Logging
+Leveled, sampled logging written by a background thread
+"""
+
+import sys
+import threading
+import time
+from collections import deque
+
+# Log levels
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+OFF = 100
+
+LEVELS = {"debug": DEBUG, "info": INFO, "warning": WARNING,
+          "error": ERROR, "off": OFF}
+
+QUEUE_SIZE = 10000          # Log records buffered before new ones are dropped
+BATCH_SIZE = 256            # Records written per stream write
+WRITE_INTERVAL = 0.05       # Seconds the writer sleeps when the queue is empty
+DROP_REPORT_INTERVAL = 5.0  # Seconds between "records dropped" reports
+
+
+class Logger:
+    """
+    Logger that keeps formatting and I/O off the calling thread.
+
+    A call below the configured level returns before touching its
+    arguments. Accepted records are (category, format, args) tuples
+    appended to a bounded deque (a single GIL-atomic append, no lock or
+    wake-up); a background thread polls it and formats and writes the
+    records in batches. When the queue is full the record is dropped
+    and counted.
+
+    Messages look like the server's classic output:
+        [CATEGORY] formatted message
+    """
+
+    def __init__(self, level=INFO, stream=None, queue_size=QUEUE_SIZE):
+        self.level = level
+        self.stream = stream
+        self.queue = deque()
+        self.queue_size = queue_size
+        self.busy = False       # Writer is formatting/writing a batch
+        self.sampling = {}      # Dictionary: category - keep 1 of every N
+        self.seen = {}          # Dictionary: category - records seen
+        self.dropped = 0        # Records lost to a full queue
+        self.reported_dropped = 0
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def configure(self, level=None, sampling=None, queue_size=None, stream=None):
+        """
+        Change settings.
+
+        Args:
+            level: Minimum level written (DEBUG/INFO/WARNING/ERROR/OFF)
+            sampling: Dictionary category - rate (0-1]; only about
+                      rate of that category's records are kept
+            queue_size: Capacity of the record queue
+            stream: File object to write to (default: sys.stdout)
+        """
+        if level is not None:
+            self.level = level
+        if sampling is not None:
+            self.sampling = {category: max(1, round(1 / rate))
+                             for category, rate in sampling.items() if rate > 0}
+            self.seen = {}
+        if queue_size is not None:
+            self.queue_size = queue_size
+        if stream is not None:
+            self.stream = stream
+
+    def enabled(self, level):
+        """Return True if records at this level are written"""
+        return level >= self.level
+
+    def log(self, level, category, message="", *args):
+        """
+        Queue a record. message is formatted with % args by the writer
+        thread, never here.
+        """
+        if level >= self.level:
+            self._emit(category, message, args)
+
+    # Level shortcuts check the level inline so a filtered call costs
+    # one comparison
+    def debug(self, category, message="", *args):
+        if DEBUG >= self.level:
+            self._emit(category, message, args)
+
+    def info(self, category, message="", *args):
+        if INFO >= self.level:
+            self._emit(category, message, args)
+
+    def warning(self, category, message="", *args):
+        if WARNING >= self.level:
+            self._emit(category, message, args)
+
+    def error(self, category, message="", *args):
+        if ERROR >= self.level:
+            self._emit(category, message, args)
+
+    def _emit(self, category, message, args):
+        """Apply sampling and queue the record (or count it as dropped)"""
+        if self.sampling:
+            every = self.sampling.get(category)
+            if every is not None:
+                seen = self.seen.get(category, 0)
+                self.seen[category] = seen + 1
+                if seen % every:
+                    return
+
+        if self.thread is None:
+            self.start()
+
+        if len(self.queue) < self.queue_size:
+            self.queue.append((category, message, args))
+        else:
+            self.dropped += 1
+
+    def raw(self, level, text):
+        """Queue a pre-formatted line (banners, separators)"""
+        self.log(level, None, text)
+
+    def start(self):
+        """Start the background writer thread"""
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+
+    def run(self):
+        """Writer loop: format and write records in batches"""
+        last_report = time.monotonic()
+        pop = self.queue.popleft
+
+        while True:
+            if not self.queue:
+                time.sleep(WRITE_INTERVAL)
+                continue
+
+            self.busy = True
+            batch = []
+            while self.queue and len(batch) < BATCH_SIZE:
+                batch.append(pop())
+
+            lines = [format_record(*record) for record in batch]
+
+            now = time.monotonic()
+            if (self.dropped != self.reported_dropped and
+                    now - last_report >= DROP_REPORT_INTERVAL):
+                lines.append(f"[LOG] {self.dropped - self.reported_dropped} "
+                             f"records dropped (queue full, "
+                             f"{self.dropped} total)")
+                self.reported_dropped = self.dropped
+                last_report = now
+
+            stream = self.stream or sys.stdout
+            try:
+                stream.write("\n".join(lines) + "\n")
+                stream.flush()
+            except Exception:
+                pass
+            self.busy = False
+
+    def flush(self, timeout=2.0):
+        """Wait (up to timeout seconds) until queued records are written"""
+        deadline = time.monotonic() + timeout
+        while ((self.queue or self.busy) and self.thread is not None and
+               time.monotonic() < deadline):
+            time.sleep(0.01)
+
+
+def format_record(category, message, args):
+    """Format one queued record"""
+    if args:
+        try:
+            message = message % args
+        except (TypeError, ValueError):
+            message = f"{message} {args}"
+    if category is None:
+        return message
+    return f"[{category}] {message}" if message else f"[{category}]"
+
+
+def parse_sampling(specs):
+    """
+    Parse CATEGORY=RATE strings (e.g. "RECEIVED=0.01").
+
+    Returns:
+        Dictionary category - rate
+    """
+    sampling = {}
+    for spec in specs or ():
+        category, _, rate = spec.rpartition("=")
+        if not category:
+            raise ValueError(f"expected CATEGORY=RATE, got {spec!r}")
+        sampling[category] = float(rate)
+    return sampling
+
+
+# Shared server logger
+log = Logger()
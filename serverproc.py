@@ -0,0 +1,59 @@
+"""
+Tic-Tac-Toe Server Subprocess
+Starts server.py for the benchmarks and the load generator
+"""
+
+import contextlib
+import os
+import socket
+import subprocess
+import sys
+import time
+
+
+def wait_for_port(host, port, timeout=10.0):
+    """Wait until a server accepts connections on host:port"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((host, port), timeout=0.5).close()
+            return True
+        except OSError:
+            time.sleep(0.05)
+    return False
+
+
+@contextlib.contextmanager
+def spawn_server(engine="threaded", host="127.0.0.1", port=5000, *options,
+                 log_level="warning", settle=0.0):
+    """
+    Run server.py in a subprocess for the duration of a with block.
+
+    Args:
+        options: Further server command line arguments
+        log_level: --log-level of the server (None: its default)
+        settle: Seconds to wait once the port accepts connections
+
+    Yields:
+        subprocess.Popen of the server
+
+    Raises:
+        RuntimeError if the server does not start accepting connections
+    """
+    command = [sys.executable, "server.py", "--engine", engine,
+               "--host", host, "--port", str(port)]
+    if log_level is not None:
+        command += ["--log-level", log_level]
+    server = subprocess.Popen(
+        command + list(options),
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        if not wait_for_port(host, port):
+            raise RuntimeError("server did not start")
+        time.sleep(settle)
+        yield server
+    finally:
+        server.terminate()
+        server.wait()
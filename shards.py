@@ -0,0 +1,194 @@
+"""
+Tic-Tac-Toe Server Sharding
+Game ownership and connection hand-off between worker processes
+"""
+
+import array
+import os
+import socket
+import struct
+import threading
+from serverlog import log
+
+MAX_HANDOFF_SIZE = 65536    # Largest hand-off message (capabilities + unread data)
+
+# Lobby messages between workers (datagrams without a descriptor):
+#   LOBBY_UPDATE followed by entries: game_id u32, players u8, joined u8
+#       (joined 0: the game left the sender's lobby)
+#   LOBBY_SYNC asks the receiver to send its whole lobby
+LOBBY_UPDATE = b"L"
+LOBBY_SYNC = b"S"
+LOBBY_ENTRY = struct.Struct(">IBB")
+LOBBY_BATCH = (MAX_HANDOFF_SIZE - 1) // LOBBY_ENTRY.size   # Entries per datagram
+
+
+def shard_of(game_id, num_shards):
+    """
+    Return the shard that owns a game.
+    Worker `shard` numbers its games next_id * num_shards + shard,
+    so the owner is encoded in the id itself.
+    """
+    return game_id % num_shards
+
+
+class HandOff(Exception):
+    """
+    Raised by a command handler when the connection must move to the
+    worker that owns the game it asked for.
+    """
+
+    def __init__(self, shard):
+        super().__init__(shard)
+        self.shard = shard
+
+
+class ShardRouter:
+    """
+    Moves client connections between worker processes.
+
+    Every worker binds a Unix datagram socket in a shared directory.
+    A hand-off sends the client's file descriptor (SCM_RIGHTS) together
+    with its negotiated capabilities and any bytes already read but not
+    yet handled (the JOIN line itself and whatever followed it), so the
+    owning worker picks the conversation up exactly where it stopped.
+    The client never notices.
+
+    The same sockets keep every worker's view of the other workers'
+    waiting games current, so LIST shows the whole server: each change
+    to a worker's lobby is announced to all the others, and a starting
+    worker announces its lobby and asks the others for theirs.
+    """
+
+    def __init__(self, shard, num_shards, ipc_dir):
+        self.shard = shard
+        self.num_shards = num_shards
+        self.ipc_dir = ipc_dir
+
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        path = self.path(shard)
+        if os.path.exists(path):
+            os.unlink(path)
+        self.sock.bind(path)
+
+        self.handed_off = 0     # Connections sent to other workers
+        self.adopted = 0        # Connections received from other workers
+
+    def path(self, shard):
+        """Socket path of a worker"""
+        return os.path.join(self.ipc_dir, f"shard-{shard}.sock")
+
+    def owner(self, game_id):
+        """Return the shard that owns game_id"""
+        return shard_of(game_id, self.num_shards)
+
+    def is_local(self, game_id):
+        """Return True if this worker owns game_id"""
+        return shard_of(game_id, self.num_shards) == self.shard
+
+    def hand_off(self, client_sock, shard, caps, pending):
+        """
+        Send a client socket to another worker.
+        The caller stops reading from the socket first and closes its own
+        descriptor afterwards; the receiver holds a duplicate.
+
+        Args:
+            client_sock: The client's socket (anything with fileno())
+            shard: Destination worker
+            caps: Capabilities negotiated with HELLO
+            pending: Received bytes not yet handled
+        """
+        message = " ".join(sorted(caps)).encode("utf-8") + b"\n" + pending
+        # socket.send_fds() ignores its address argument, so build the
+        # SCM_RIGHTS message directly
+        fds = array.array("i", [client_sock.fileno()])
+        self.sock.sendmsg([message], [(socket.SOL_SOCKET, socket.SCM_RIGHTS, fds)],
+                          0, self.path(shard))
+        self.handed_off += 1
+
+    def announce(self, entries):
+        """
+        Send lobby entries (game_id, players, joined) to every other worker.
+        A worker that is not running yet gets them when it asks (sync).
+        """
+        for shard in range(self.num_shards):
+            if shard != self.shard:
+                self.send_lobby(self.path(shard), entries)
+
+    def send_lobby(self, address, entries):
+        """Send lobby entries to one worker socket, LOBBY_BATCH per datagram"""
+        for start in range(0, len(entries), LOBBY_BATCH):
+            message = LOBBY_UPDATE + b"".join(
+                LOBBY_ENTRY.pack(*entry) for entry in entries[start:start + LOBBY_BATCH])
+            try:
+                self.sock.sendto(message, address)
+            except OSError as e:
+                log.debug("LOBBY UPDATE FAILED", "%s: %s", address, e)
+                return
+
+    def sync(self, entries):
+        """
+        On startup: announce this worker's lobby and ask every other
+        worker for its own (whichever of two workers starts second
+        brings both up to date)
+        """
+        self.announce(entries)
+        for shard in range(self.num_shards):
+            if shard != self.shard:
+                try:
+                    self.sock.sendto(LOBBY_SYNC, self.path(shard))
+                except OSError:
+                    pass    # Not running yet; it syncs when it starts
+
+    def receive(self, adopt, on_lobby, lobby_entries):
+        """
+        Receive one message: a handed-off client, lobby entries of
+        another worker, or a request for this worker's lobby.
+
+        Args:
+            adopt: Callback(client_sock, caps, pending) for a client
+            on_lobby: Callback(entries) for lobby entries
+            lobby_entries: Returns this worker's lobby entries
+        """
+        message, fds, _, address = socket.recv_fds(self.sock, MAX_HANDOFF_SIZE, 1)
+
+        if fds:
+            caps, _, pending = message.partition(b"\n")
+            client_sock = socket.socket(fileno=fds[0])
+            self.adopted += 1
+            adopt(client_sock, frozenset(caps.decode("utf-8").split()), pending)
+
+        elif message[:1] == LOBBY_UPDATE:
+            on_lobby([LOBBY_ENTRY.unpack_from(message, offset)
+                      for offset in range(1, len(message), LOBBY_ENTRY.size)])
+
+        elif message == LOBBY_SYNC and address:
+            self.send_lobby(address, lobby_entries())
+
+    def start(self, adopt, on_lobby, lobby_entries):
+        """
+        Receive hand-offs and lobby messages in a background thread,
+        then sync lobbies with the other workers.
+
+        Args:
+            adopt: Callback(client_sock, caps, pending) for each client
+            on_lobby: Callback(entries) for lobby entries of other workers
+                      (called on the router thread)
+            lobby_entries: Returns this worker's lobby entries
+        """
+        def run():
+            while True:
+                try:
+                    self.receive(adopt, on_lobby, lobby_entries)
+                except OSError:
+                    break
+
+        threading.Thread(target=run, daemon=True).start()
+        self.sync(lobby_entries())
+
+    def close(self):
+        """Close and remove this worker's socket"""
+        self.sock.close()
+        try:
+            os.unlink(self.path(self.shard))
+        except OSError:
+            pass
@@ -0,0 +1,200 @@
+"""
+Tic-Tac-Toe Server Snapshots
+Compact image of every game in progress, saved periodically and loaded
+on startup so a restart keeps the games
+"""
+
+import os
+import struct
+import threading
+import time
+from game_logic import SYMBOL_INDEX
+from serverlog import log
+
+MAGIC = b"TTTS"             # File signature
+VERSION = 1                 # Snapshot format version
+SNAPSHOT_INTERVAL = 60.0    # Seconds between background snapshots
+
+# File layout (all integers big-endian):
+#   header: magic, version u8, generation u32, next_game_id u32, games u32
+#   per game:
+#       game_id u32, players u8, started u8, current_turn u8, seats u8
+#       per seat (turn order): symbol index u8, token u64 (0 = computer)
+#       free symbols: count u8, symbol index u8 each (hand-out order)
+#       per symbol index: mask length u8, bitboard bytes
+HEADER = struct.Struct(">4sBIII")
+GAME = struct.Struct(">IBBBB")
+SEAT = struct.Struct(">BQ")
+
+# All seats of a game in one unpack, by seat count
+SEATS = {count: struct.Struct(">" + "BQ" * count) for count in range(14)}
+
+
+class SnapshotError(Exception):
+    """Raised for a file that is not a snapshot of this version"""
+
+
+def encode_game(out, game):
+    """Append a game's record to the bytearray out (caller holds game.lock)"""
+    out += GAME.pack(game.game_id, game.num_players, game.started,
+                     game.current_turn, len(game.players))
+    for player in game.players:
+        out += SEAT.pack(SYMBOL_INDEX[player.symbol], player.token)
+
+    out.append(len(game.available_symbols))
+    out += bytes(SYMBOL_INDEX[symbol] for symbol in game.available_symbols)
+
+    for mask in game.symbol_masks:
+        data = mask.to_bytes((mask.bit_length() + 7) // 8, "big")
+        out.append(len(data))
+        out += data
+
+
+def write_snapshot(path, generation, next_game_id, count, body):
+    """
+    Write a snapshot next to path and move it into place, so a crash
+    leaves either the old snapshot or the new one.
+    """
+    temp = path + ".tmp"
+    with open(temp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, generation, next_game_id, count))
+        f.write(body)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp, path)
+
+
+def read_snapshot(path):
+    """
+    Read a snapshot.
+
+    Returns:
+        (generation, next_game_id, games)
+        games: list of tuples
+            (game_id, players, started, current_turn,
+             seats [(symbol index, token), ...], free symbol indices,
+             symbol masks)
+
+    Raises:
+        SnapshotError if the file is not a complete snapshot of this version
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+
+    try:
+        magic, version, generation, next_game_id, count = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise SnapshotError(f"{path}: not a version {VERSION} snapshot")
+
+        games = []
+        pos = HEADER.size
+        for _ in range(count):
+            game_id, players, started, current_turn, num_seats = GAME.unpack_from(data, pos)
+            pos += GAME.size
+
+            layout = SEATS[num_seats]
+            fields = layout.unpack_from(data, pos)
+            seats = list(zip(fields[0::2], fields[1::2]))
+            pos += layout.size
+
+            free = data[pos + 1:pos + 1 + data[pos]]
+            pos += 1 + len(free)
+
+            masks = []
+            for _ in range(players):
+                end = pos + 1 + data[pos]
+                masks.append(int.from_bytes(data[pos + 1:end], "big"))
+                pos = end
+
+            games.append((game_id, players, bool(started), current_turn,
+                          seats, list(free), masks))
+    except (struct.error, IndexError, KeyError):
+        raise SnapshotError(f"{path}: truncated snapshot")
+
+    return generation, next_game_id, games
+
+
+class SnapshotWriter:
+    """
+    Saves the server's games to a snapshot file every interval seconds
+    from a background thread, and once more on shutdown.
+
+    Moves keep flowing while a snapshot is taken: each game is locked
+    only while its record is encoded. The journal is rotated first and
+    every saved game gets a SNAP record, so recovery knows which
+    journal records the snapshot already contains.
+    """
+
+    def __init__(self, server, path, interval=SNAPSHOT_INTERVAL):
+        self.server = server
+        self.path = path
+        self.interval = interval
+        self.generation = 0       # Generation of the last snapshot written or loaded
+
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    def save(self):
+        """
+        Take a snapshot of every game that has not ended.
+
+        Returns:
+            (games saved, bytes written, seconds taken)
+        """
+        server = self.server
+        journal = server.journal
+        start = time.perf_counter()
+        generation = self.generation + 1
+
+        # New games register under games_lock, so each one is either in
+        # this list or journaled after the rotation marker. Only the
+        # marker is set under the lock; the journal files are switched
+        # after it is released
+        with server.games_lock:
+            journal.mark_rotation(generation)
+            games = list(server.games.values())
+            next_game_id = server.next_game_id
+        journal.rotate()
+
+        body = bytearray()
+        count = 0
+        for game in games:
+            with game.lock:
+                if game.ended:
+                    continue
+                encode_game(body, game)
+                journal.snap(game.game_id, generation)
+            count += 1
+
+        write_snapshot(self.path, generation, next_game_id, count, body)
+        self.generation = generation
+        journal.drop_previous()
+
+        elapsed = time.perf_counter() - start
+        size = HEADER.size + len(body)
+        log.info("SNAPSHOT", "%d games, %d bytes in %.3fs", count, size, elapsed)
+        return count, size, elapsed
+
+    def start(self):
+        """Run periodic snapshots in a background thread"""
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        """Background snapshot loop"""
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.save()
+            except OSError as e:
+                log.error("SNAPSHOT FAILED", "%s: %s", self.path, e)
+
+    def stop(self):
+        """Stop the background snapshots and save a final one"""
+        if self.thread is None or self.stop_event.is_set():
+            return
+        self.stop_event.set()
+        self.thread.join()
+        try:
+            self.save()
+        except OSError as e:
+            log.error("SNAPSHOT FAILED", "%s: %s", self.path, e)
@@ -0,0 +1,45 @@
+"""
+Tests for the computer opponent
+"""
+
+import time
+import unittest
+from bot import BotPlayer, Position
+from test_game_logic import started_game
+
+
+class DeadlineTest(unittest.TestCase):
+    """The move budget is counted from the deadline the caller stamps"""
+
+    def test_spent_budget_plays_at_once(self):
+        game = started_game(13)
+        game.make_move(game.get_current_player().conn, 7, 7)
+        bot = BotPlayer(game.get_current_player().symbol, move_time=10.0)
+
+        start = time.perf_counter()
+        row, col = bot.choose_move(Position.from_game(game), start - 1.0)
+        self.assertLess(time.perf_counter() - start, 0.05)
+        self.assertEqual(bot.depth, 0)
+        self.assertEqual(game.get_cell(row, col), '.')
+
+    def test_late_start_searches_only_what_is_left(self):
+        game = started_game(13)
+        game.make_move(game.get_current_player().conn, 7, 7)
+        bot = BotPlayer(game.get_current_player().symbol, move_time=10.0)
+
+        start = time.perf_counter()
+        bot.choose_move(Position.from_game(game), start + 0.1)
+        self.assertLess(time.perf_counter() - start, 0.5)
+
+    def test_spent_budget_still_blocks_a_win(self):
+        game = started_game(2)
+        x, o = game.players
+        game.make_move(x.conn, 0, 0)
+        game.make_move(o.conn, 1, 1)
+        game.make_move(x.conn, 0, 1)
+        bot = BotPlayer(o.symbol)
+        self.assertEqual(bot.choose_move(Position.from_game(game), 0.0), (0, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
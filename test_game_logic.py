@@ -0,0 +1,247 @@
+"""
+Tests for the game logic
+"""
+
+import math
+import random
+import unittest
+from collections import Counter
+from game_logic import (Game, MIN_BOARD_SIZE, MAX_BOARD_SIZE, SYMMETRIES, ZOBRIST,
+                        WIN_MASKS, KEY_BITS, KEY_MASK)
+
+
+def started_game(num_players):
+    """Create a started game with dummy connections"""
+    game = Game(0, num_players)
+    for i in range(num_players):
+        game.add_player(i, ("127.0.0.1", i))
+    return game
+
+
+class IncrementalWinTest(unittest.TestCase):
+    """make_move checks only the lines through the last move; it must
+    agree with the full-board check_win on every move"""
+
+    GAMES_PER_SIZE = 20
+
+    def test_matches_full_scan(self):
+        rng = random.Random(1234)
+        for size in range(MIN_BOARD_SIZE, MAX_BOARD_SIZE + 1):
+            with self.subTest(size=size):
+                wins = 0
+                for _ in range(self.GAMES_PER_SIZE):
+                    wins += self.play_and_compare(started_game(size - 1), rng)
+                # Every size must exercise the win path, not only draws
+                self.assertGreater(wins, 0)
+
+    def play_and_compare(self, game, rng):
+        """Play random moves, comparing both checks after each one"""
+        cells = [(r, c) for r in range(game.board_size)
+                 for c in range(game.board_size)]
+        rng.shuffle(cells)
+
+        for row, col in cells:
+            player = game.get_current_player()
+            status, _ = game.make_move(player.conn, row, col)
+
+            full_scan = game.check_win(player.symbol)
+            self.assertEqual(status == "win", full_scan,
+                             f"move ({row}, {col}) by {player.symbol}\n"
+                             f"{game.get_board_string()}")
+            self.assertEqual(game.check_win_at(row, col), full_scan)
+
+            # Nobody else can have a line the incremental check missed
+            for other in game.players:
+                if other is not player:
+                    self.assertFalse(game.check_win(other.symbol))
+
+            if status == "win":
+                self.assertIs(game.winner, player)
+                return 1
+            if status == "draw":
+                self.assertEqual(game.move_count, game.board_size ** 2)
+                return 0
+        self.fail("game neither won nor drawn on a full board")
+
+    def test_win_on_each_line_through_a_cell(self):
+        # Row, column and both diagonals completed by the middle cell
+        lines = {
+            "row": [(2, 1), (2, 3), (2, 2)],
+            "column": [(1, 2), (3, 2), (2, 2)],
+            "diagonal": [(1, 1), (3, 3), (2, 2)],
+            "anti-diagonal": [(1, 3), (3, 1), (2, 2)],
+        }
+        for name, cells in lines.items():
+            with self.subTest(line=name):
+                game = started_game(4)
+                free = [(r, 4) for r in range(5)] + [(4, c) for c in range(4)]
+                for i, (row, col) in enumerate(cells):
+                    status, _ = game.make_move(game.players[0].conn, row, col)
+                    if i < len(cells) - 1:
+                        self.assertEqual(status, "success")
+                        # Other players move away from the line
+                        for other in game.players[1:]:
+                            game.make_move(other.conn, *free.pop())
+                self.assertEqual(status, "win")
+
+
+def transformed(game, transform):
+    """Return a copy of a game's board mapped through one of SYMMETRIES"""
+    size = game.board_size
+    copy = Game(game.game_id, game.num_players)
+    for index, mask in enumerate(game.symbol_masks):
+        for cell in range(size * size):
+            if mask >> cell & 1:
+                row, col = transform(cell // size, cell % size, size)
+                image = row * size + col
+                copy.symbol_masks[index] |= 1 << image
+                copy.position_keys ^= ZOBRIST[size][1][image][index]
+    return copy
+
+
+class BoardCacheTest(unittest.TestCase):
+    """The board bytes patched move by move must match a fresh rendering,
+    multi-byte symbols included"""
+
+    def test_patched_bytes_match_the_board(self):
+        rng = random.Random(2468)
+        game = started_game(MAX_BOARD_SIZE - 1)
+        size = game.board_size
+        cells = [(r, c) for r in range(size) for c in range(size)]
+        rng.shuffle(cells)
+        game.get_board_bytes()
+        game.get_cell_indices()
+
+        for row, col in cells:
+            status, _ = game.make_move(game.get_current_player().conn, row, col)
+            expected = "BOARD\n" + "".join(" ".join(r) + "\n" for r in game.board)
+            self.assertEqual(game.get_board_bytes(), expected.encode("utf-8"))
+            self.assertEqual(game.get_board_string(), expected[:-1])
+            if status != "success":
+                break
+
+
+class ZobristKeyTest(unittest.TestCase):
+    """Keys kept up to date move by move must match keys built from
+    the board, and every orientation must share the canonical key"""
+
+    POSITIONS = 500
+
+    def test_keys_of_random_positions(self):
+        rng = random.Random(4321)
+        for _ in range(self.POSITIONS):
+            game = started_game(rng.randrange(MIN_BOARD_SIZE - 1, MAX_BOARD_SIZE))
+            size = game.board_size
+            cells = [(r, c) for r in range(size) for c in range(size)]
+            rng.shuffle(cells)
+            for row, col in cells[:rng.randrange(1, len(cells))]:
+                status, _ = game.make_move(game.get_current_player().conn, row, col)
+                if status != "success":
+                    break
+
+            with self.subTest(board=game.get_board_string()):
+                full = 0
+                for index, mask in enumerate(game.symbol_masks):
+                    for cell in range(size * size):
+                        if mask >> cell & 1:
+                            full ^= ZOBRIST[size][0][cell][index]
+                self.assertEqual(game.zobrist_key, full)
+
+                canonical = game.canonical_key()
+                for transform in SYMMETRIES[1:]:
+                    self.assertEqual(transformed(game, transform).canonical_key(),
+                                     canonical)
+
+
+
+def reachable_positions(num_players, max_moves):
+    """
+    Enumerate every position reachable in up to max_moves moves
+    (play stops at a win).
+
+    Returns:
+        dict: symbol masks - packed symmetry keys, as kept by make_move
+    """
+    size = num_players + 1
+    keys = ZOBRIST[size][1]
+    win_masks = WIN_MASKS[size][0]
+    positions = {}
+
+    def visit(masks, occupied, packed, moves):
+        board = tuple(masks)
+        if board in positions:
+            return
+        positions[board] = packed
+        last = masks[(moves - 1) % num_players]
+        if moves == max_moves or any(last & w == w for w in win_masks):
+            return
+        turn = moves % num_players
+        for cell in range(size * size):
+            bit = 1 << cell
+            if not occupied & bit:
+                masks[turn] |= bit
+                visit(masks, occupied | bit, packed ^ keys[cell][turn], moves + 1)
+                masks[turn] ^= bit
+
+    visit([0] * num_players, 0, 0, 0)
+    return positions
+
+
+def canonical_board(board, size):
+    """Return the smallest of a board's 8 orientations"""
+    images = []
+    for transform in SYMMETRIES:
+        image = []
+        for mask in board:
+            moved = 0
+            while mask:
+                low = mask & -mask
+                row, col = divmod(low.bit_length() - 1, size)
+                r, c = transform(row, col, size)
+                moved |= 1 << (r * size + c)
+                mask ^= low
+            image.append(moved)
+        images.append(tuple(image))
+    return min(images)
+
+
+class ZobristCollisionTest(unittest.TestCase):
+    """Keys of distinct reachable positions: truncated keys collide no
+    more than random numbers would, full keys never"""
+
+    # (players, moves): every 3x3 game, and 4x4 games up to 5 moves
+    POSITIONS = ((2, 9), (3, 5))
+    CANONICAL = ((2, 9), (3, 4))
+
+    def test_truncated_keys_within_birthday_bound(self):
+        for num_players, moves in self.POSITIONS:
+            keys = list(reachable_positions(num_players, moves).values())
+            count = len(keys)
+            for width in (24, 28, 32):
+                with self.subTest(players=num_players, bits=width):
+                    mask = (1 << width) - 1
+                    counts = Counter(key & mask for key in keys)
+                    pairs = sum(n * (n - 1) // 2 for n in counts.values())
+                    expected = count * (count - 1) / 2 ** (width + 1)
+                    # Poisson tail: 6 standard deviations above the mean
+                    self.assertLessEqual(pairs, expected + 6 * math.sqrt(expected) + 6)
+
+            self.assertEqual(len({key & KEY_MASK for key in keys}), count)
+
+    def test_canonical_keys_never_collide(self):
+        for num_players, moves in self.CANONICAL:
+            size = num_players + 1
+            owners = {}
+            collisions = []
+            for board, packed in reachable_positions(num_players, moves).items():
+                key = min((packed >> (KEY_BITS * t)) & KEY_MASK
+                          for t in range(len(SYMMETRIES)))
+                canonical = canonical_board(board, size)
+                if owners.setdefault(key, canonical) != canonical:
+                    collisions.append((owners[key], canonical))
+            with self.subTest(players=num_players):
+                self.assertEqual(collisions, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
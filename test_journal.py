@@ -0,0 +1,100 @@
+"""
+Tests for the game journal
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from journal import Journal, read_journal, PREVIOUS_SUFFIX, CREATE, MOVE, ROTATE
+from serverlog import log, LEVELS
+
+
+def setUpModule():
+    log.configure(level=LEVELS["off"])
+
+
+class JournalRotationTest(unittest.TestCase):
+    """Records appended while a marked rotation waits for its files"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "journal")
+        self.journal = Journal(self.path)
+        self.journal.open()
+
+    def tearDown(self):
+        self.journal.close()
+        shutil.rmtree(self.directory)
+
+    def test_records_after_the_marker_start_the_new_segment(self):
+        self.journal.create(1, 2)
+        self.journal.mark_rotation(1)
+        self.journal.move(1, 0, 0)
+        self.journal.commit()       # Waits for rotate(): nothing written
+        self.assertEqual(read_journal(self.path)[0], [])
+
+        self.journal.rotate()
+        self.journal.move(1, 1, 1)
+        self.journal.commit()
+        self.assertEqual(read_journal(self.path + PREVIOUS_SUFFIX)[0], [(CREATE, 1, 2)])
+        self.assertEqual(read_journal(self.path)[0],
+                         [(ROTATE, 1), (MOVE, 1, 0, 0), (MOVE, 1, 1, 1)])
+
+
+class JournalFailureTest(unittest.TestCase):
+    """A journal whose disk fills up (its file swapped for /dev/full)"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "journal")
+        self.journal = Journal(self.path)
+        self.journal.open()
+
+    def tearDown(self):
+        self.journal.close()
+        shutil.rmtree(self.directory)
+
+    def fill_disk(self):
+        """Make every further write to the current segment fail (ENOSPC)"""
+        full = os.open("/dev/full", os.O_WRONLY)
+        os.dup2(full, self.journal.fd)
+        os.close(full)
+
+    def test_write_error_stops_buffering(self):
+        self.journal.create(1, 2)
+        self.journal.commit()
+        self.fill_disk()
+
+        self.journal.move(1, 0, 0)
+        self.journal.commit()
+        self.assertTrue(self.journal.failed)
+
+        # Nothing piles up in memory while failed
+        for _ in range(1000):
+            self.journal.move(1, 1, 1)
+        self.assertEqual(len(self.journal.buffer), 0)
+
+        # Only the record committed before the error is on disk
+        records, _ = read_journal(self.path)
+        self.assertEqual(records, [(CREATE, 1, 2)])
+
+    def test_rotation_resumes(self):
+        self.journal.create(1, 2)
+        self.journal.commit()
+        self.fill_disk()
+        self.journal.move(1, 0, 0)
+        self.journal.commit()
+
+        self.journal.mark_rotation(1)
+        self.journal.rotate()
+        self.assertFalse(self.journal.failed)
+        self.journal.move(1, 2, 2)
+        self.journal.commit()
+
+        self.assertEqual(read_journal(self.path + PREVIOUS_SUFFIX)[0], [(CREATE, 1, 2)])
+        self.assertEqual(read_journal(self.path)[0], [(ROTATE, 1), (MOVE, 1, 2, 2)])
+
+
+if __name__ == "__main__":
+    unittest.main()
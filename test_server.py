@@ -0,0 +1,636 @@
+"""
+Tests for the server, run in-process against real sockets
+"""
+
+import asyncio
+import contextlib
+import random
+import socket
+import threading
+import time
+import unittest
+from game_logic import SYMBOLS
+from outbound import OutboundWriter, OutboundOverflow
+from serverlog import log, LEVELS
+from server import (TicTacToeServer, AsyncTicTacToeServer, Connection, AwayConnection,
+                    Spectators)
+
+HOST = "127.0.0.1"
+READ_TIMEOUT = 20.0     # Seconds to wait for a server message
+
+
+def setUpModule():
+    log.configure(level=LEVELS["warning"])
+
+
+@contextlib.contextmanager
+def running_server(engine=TicTacToeServer, **options):
+    """
+    Run a server on a free port in a background thread.
+
+    Yields:
+        (server, port)
+    """
+    server = engine(HOST, 0, **options)
+    thread = threading.Thread(target=server.start, daemon=True)
+    thread.start()
+
+    deadline = time.monotonic() + 10
+    while not server.running:
+        if time.monotonic() > deadline:
+            raise RuntimeError("server did not start")
+        time.sleep(0.01)
+    if isinstance(server, AsyncTicTacToeServer):
+        port = server.async_server.sockets[0].getsockname()[1]
+    else:
+        port = server.server_socket.getsockname()[1]
+
+    try:
+        yield server, port
+    finally:
+        server.stopping = True
+        if isinstance(server, AsyncTicTacToeServer):
+            server.terminate()
+        else:
+            # accept() returns once more, sees running cleared and exits
+            server.running = False
+            socket.create_connection((HOST, port)).close()
+        thread.join(timeout=10)
+
+
+class Client:
+    """A text protocol client on asyncio streams"""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, port, *caps):
+        reader, writer = await asyncio.open_connection(HOST, port)
+        client = cls(reader, writer)
+        if caps:
+            client.send("HELLO " + " ".join(caps))
+            await client.expect("HELLO")
+        return client
+
+    def send(self, message):
+        """Send one command line"""
+        self.writer.write((message + "\n").encode())
+
+    async def read_line(self):
+        """Read one line from the server"""
+        line = await asyncio.wait_for(self.reader.readline(), READ_TIMEOUT)
+        if not line:
+            raise ConnectionError("server closed the connection")
+        return line.decode().strip()
+
+    async def expect(self, prefix):
+        """Read lines until one starts with prefix and return it"""
+        while True:
+            line = await self.read_line()
+            if line.startswith(prefix):
+                return line
+
+    def close(self):
+        self.writer.close()
+
+
+class StressTest(unittest.TestCase):
+    """
+    Hundreds of games played at once. On every update each player of a
+    game sends a move, so every move races the rejected moves of the
+    players whose turn it is not on the same game lock.
+    """
+
+    GAMES = 200
+    PLAYERS = 3
+
+    def test_threaded_engine(self):
+        self.run_stress(TicTacToeServer)
+
+    def test_asyncio_engine(self):
+        self.run_stress(AsyncTicTacToeServer)
+
+    def run_stress(self, engine):
+        with running_server(engine, metrics=False) as (server, port):
+            games = asyncio.run(self.play_games(server, port))
+
+            for game_id, moves, results, bids, game in games:
+                # Every player saw the same moves, numbered 1..n
+                self.assertEqual(len(set(map(tuple, moves))), 1, game_id)
+                seen = moves[0]
+                self.assertEqual([seq for _, _, _, seq in seen],
+                                 list(range(1, len(seen) + 1)), game_id)
+
+                # Applied once each, in turn order, on distinct cells
+                self.assertEqual([symbol for _, _, symbol, _ in seen],
+                                 [SYMBOLS[i % self.PLAYERS] for i in range(len(seen))],
+                                 game_id)
+                self.assertEqual(len({(row, col) for row, col, _, _ in seen}),
+                                 len(seen), game_id)
+
+                # Each move is one its own player bid before seeing it
+                # (a bid sent on an earlier update may land on their turn)
+                for row, col, symbol, seq in seen:
+                    earlier = [cell for known, cell in bids[symbol].items() if known < seq]
+                    self.assertIn((row, col), earlier, (game_id, seq))
+
+                # One winner and the rest losers, or a draw for everyone
+                self.assertIn(sorted(results),
+                              (["LOSE"] * (self.PLAYERS - 1) + ["WIN"],
+                               ["DRAW"] * self.PLAYERS), game_id)
+
+                # The server's board holds exactly these moves
+                self.assertTrue(game.ended)
+                self.assertEqual(game.move_count, len(seen))
+                for row, col, symbol, _ in seen:
+                    self.assertEqual(game.get_cell(row, col), symbol)
+
+    async def play_games(self, server, port):
+        rng = random.Random(1234)
+        return await asyncio.gather(*(self.play_game(server, port,
+                                                     random.Random(rng.random()))
+                                      for _ in range(self.GAMES)))
+
+    async def play_game(self, server, port, rng):
+        """
+        Play one game.
+
+        Returns:
+            (game_id, moves seen per player, results, bids per symbol,
+             server's Game)
+            (read before the players leave and the game is removed)
+        """
+        clients = [await Client.connect(port, "DELTA") for _ in range(self.PLAYERS)]
+        try:
+            creator = clients[0]
+            creator.send(f"CREATE {self.PLAYERS}")
+            game_id = int((await creator.expect("CREATED")).split()[1])
+            symbols = [(await creator.expect("JOINED")).split()[1]]
+            await creator.expect("WAIT")
+            for client in clients[1:]:
+                client.send(f"JOIN {game_id}")
+                symbols.append((await client.expect("JOINED")).split()[1])
+
+            outcomes = await asyncio.gather(*(self.play(client, rng) for client in clients))
+            bids = {symbol: bid for symbol, (_, _, bid) in zip(symbols, outcomes)}
+            return (game_id, [moves for moves, _, _ in outcomes],
+                    [result for _, result, _ in outcomes], bids, server.games[game_id])
+        finally:
+            for client in clients:
+                client.close()
+
+    async def play(self, client, rng):
+        """
+        Bid a random free cell after every update, until the game ends.
+
+        Returns:
+            (moves seen, result, bids)
+            bids: dictionary - number of moves seen: cell bid after them
+        """
+        size = self.PLAYERS + 1
+        free = {(row, col) for row in range(size) for col in range(size)}
+        moves = []
+        bids = {}
+        while True:
+            line = await client.read_line()
+            if line == "BOARD":
+                for _ in range(size):
+                    await client.read_line()
+            elif line.startswith("MOVED"):
+                _, row, col, symbol, seq = line.split()
+                moves.append((int(row), int(col), symbol, int(seq)))
+                free.discard((int(row), int(col)))
+            elif line in ("WIN", "LOSE", "DRAW", "GAME_ABORTED"):
+                return moves, line, bids
+            else:
+                continue
+
+            if free:
+                bids[len(moves)] = cell = rng.choice(sorted(free))
+                client.send("MOVE {} {}".format(*cell))
+
+class GameOverTest(unittest.TestCase):
+    """Players of a finished game are free to play or watch again"""
+
+    def test_threaded_engine(self):
+        with running_server(TicTacToeServer) as (server, port):
+            asyncio.run(self.play_then_requeue(server, port))
+
+    def test_asyncio_engine(self):
+        with running_server(AsyncTicTacToeServer) as (server, port):
+            asyncio.run(self.play_then_requeue(server, port))
+
+    async def play_then_requeue(self, server, port):
+        x, o = [await Client.connect(port, "DELTA") for _ in range(2)]
+        try:
+            x.send("CREATE 2")
+            game_id = int((await x.expect("CREATED")).split()[1])
+            o.send(f"JOIN {game_id}")
+            await o.expect("JOINED")
+
+            # X takes the top row while O plays the middle one
+            for col in range(2):
+                await x.expect("YOURTURN")
+                x.send(f"MOVE 0 {col}")
+                await o.expect("YOURTURN")
+                o.send(f"MOVE 1 {col}")
+            await x.expect("YOURTURN")
+            x.send("MOVE 0 2")
+            self.assertEqual(await x.expect("WIN"), "WIN")
+            self.assertEqual(await o.expect("LOSE"), "LOSE")
+
+            # The finished game is still registered until the reaper
+            # evicts it, but holds neither player nor its board cache
+            x.send("QUICKPLAY 2")
+            self.assertEqual(await x.read_line(), "CREATED " + str(game_id + 1))
+            self.assertIsNone(server.games[game_id].board_cache)
+            o.send(f"WATCH {game_id + 1}")
+            self.assertEqual(await o.read_line(), f"WATCHING {game_id + 1}")
+        finally:
+            x.close()
+            o.close()
+
+
+class OneSeatTest(unittest.TestCase):
+    """A client seated in a game cannot take a seat in another one"""
+
+    def test_join_and_create_refused(self):
+        with running_server(TicTacToeServer) as (server, port):
+            asyncio.run(self.take_two_seats(port))
+
+    async def take_two_seats(self, port):
+        x, y = [await Client.connect(port) for _ in range(2)]
+        try:
+            x.send("CREATE 3")
+            await x.expect("WAIT")
+            y.send("CREATE 3")
+            other_id = int((await y.expect("CREATED")).split()[1])
+            await y.expect("WAIT")
+
+            x.send(f"JOIN {other_id}")
+            self.assertEqual(await x.read_line(), "Already in a game")
+            x.send("CREATE 2")
+            self.assertEqual(await x.read_line(), "Already in a game")
+        finally:
+            x.close()
+            y.close()
+
+
+class SpectatorsTest(unittest.TestCase):
+    """Spectator groups and the recipient tuples built from them"""
+
+    def test_snapshot_rebuilt_only_after_a_change(self):
+        spectators = Spectators()
+        conns = [Connection(None, i) for i in range(4)]
+        for conn in conns[:3]:
+            spectators.add((False, True), conn)
+        spectators.add((True, True), conns[3])
+
+        first = dict(spectators.items())
+        self.assertEqual(first, {(False, True): tuple(conns[:3]),
+                                 (True, True): (conns[3],)})
+        self.assertIs(dict(spectators.items())[(False, True)], first[(False, True)])
+
+        # A broadcast already queued keeps its recipients
+        self.assertTrue(spectators.remove(conns[1]))
+        self.assertFalse(spectators.remove(conns[1]))
+        self.assertEqual(first[(False, True)], tuple(conns[:3]))
+        self.assertEqual(dict(spectators.items())[(False, True)], (conns[0], conns[2]))
+
+        # An emptied group disappears
+        self.assertTrue(spectators.remove(conns[3]))
+        self.assertEqual(list(dict(spectators.items())), [(False, True)])
+        self.assertEqual(len(spectators), 2)
+        self.assertEqual(list(spectators.connections()), [conns[0], conns[2]])
+
+
+class SpectatorHelloTest(unittest.TestCase):
+    """A spectator switching to binary while text broadcasts are still
+    queued for it in the fan-out"""
+
+    def test_reply_follows_queued_broadcasts(self):
+        with running_server(TicTacToeServer) as (server, port):
+            asyncio.run(self.switch_while_queued(server, port))
+
+    async def switch_while_queued(self, server, port):
+        x, o, watcher = [await Client.connect(port) for _ in range(3)]
+        try:
+            x.send("CREATE 2")
+            game_id = int((await x.expect("CREATED")).split()[1])
+            o.send(f"JOIN {game_id}")
+            await o.expect("JOINED")
+            watcher.send(f"WATCH {game_id}")
+            await watcher.expect("WATCHING")
+            for _ in range(4):
+                await watcher.read_line()   # The board: "BOARD" and 3 rows
+
+            # Hold the fan-out on the next broadcast
+            entered, release = threading.Event(), threading.Event()
+            deliver = server.fanout.deliver
+            def held(conns, data):
+                entered.set()
+                release.wait(READ_TIMEOUT)
+                deliver(conns, data)
+            server.fanout.deliver = held
+
+            await x.expect("YOURTURN")
+            x.send("MOVE 0 0")
+            self.assertTrue(await asyncio.to_thread(entered.wait, READ_TIMEOUT))
+
+            # The reply queues up behind the text board of that move
+            watcher.send("HELLO BINARY/1")
+            deadline = time.monotonic() + READ_TIMEOUT
+            while not server.fanout.jobs:
+                self.assertLess(time.monotonic(), deadline)
+                await asyncio.sleep(0.01)
+            release.set()
+
+            lines = [await watcher.read_line() for _ in range(5)]
+            self.assertEqual(lines, ["BOARD", "X . .", ". . .", ". . .",
+                                     "HELLO BINARY/1"])
+        finally:
+            for client in (x, o, watcher):
+                client.close()
+
+
+class LineTooLongTest(unittest.TestCase):
+    """Only an over-long line is answered with "Line too long", not an
+    error raised while handling a command"""
+
+    def test_threaded_engine(self):
+        self.check_errors(TicTacToeServer)
+
+    def test_asyncio_engine(self):
+        self.check_errors(AsyncTicTacToeServer)
+
+    def check_errors(self, engine):
+        with running_server(engine) as (server, port):
+            def broken_list(*args):
+                raise ValueError("broken handler")
+            server.handle_list = broken_list
+            asyncio.run(self.send_both(port))
+
+    async def send_both(self, port):
+        long_line, broken = [await Client.connect(port) for _ in range(2)]
+        try:
+            long_line.send("LIST " + "x" * 4096)
+            self.assertEqual(await long_line.read_line(), "ERROR Line too long")
+
+            broken.send("LIST")
+            with self.assertRaises(ConnectionError):
+                await broken.read_line()
+        finally:
+            long_line.close()
+            broken.close()
+
+
+class AwayConnectionTest(unittest.TestCase):
+    """The seat of a player not back yet after a restart goes through
+    the same paths as a connected client"""
+
+    def test_shared_paths(self):
+        server = TicTacToeServer(HOST, 0, metrics=False)
+        conn = AwayConnection()
+        self.assertFalse(conn.closed)
+        self.assertIsNone(conn.watching)
+        conn.write(b"BOARD\n")
+        server.stop_watching(conn)
+        server.disconnect_client(conn, conn.addr)
+        conn.close()
+
+
+class CreateJoinTest(unittest.TestCase):
+    """A JOIN by id racing the CREATE that registered the game"""
+
+    def test_join_while_creator_is_answered(self):
+        with running_server(TicTacToeServer, metrics=True) as (server, port):
+            # Hold the creator's thread right after CREATED goes out,
+            # which is when the game can already be found by id
+            send = server.send
+
+            def slow_send(conn, *messages):
+                send(conn, *messages)
+                if messages[0].startswith("CREATED"):
+                    time.sleep(0.3)
+
+            server.send = slow_send
+            lines = asyncio.run(self.create_and_join(port))
+
+            self.assertEqual(server.metrics.games_started.value, 1)
+            for seen in lines:
+                self.assertEqual(seen.count("BOARD"), 1, seen)
+            self.assertEqual(lines[0].count("YOURTURN"), 1, lines[0])
+            self.assertNotIn("YOURTURN", lines[1])
+
+    async def create_and_join(self, port):
+        """Returns: lines received by the creator and by the joiner"""
+        creator = await Client.connect(port)
+        joiner = await Client.connect(port)
+        try:
+            creator.send("CREATE 2")
+            game_id = int((await creator.expect("CREATED")).split()[1])
+            joiner.send(f"JOIN {game_id}")
+            return [await self.read_all(creator), await self.read_all(joiner)]
+        finally:
+            creator.close()
+            joiner.close()
+
+    async def read_all(self, client, quiet=1.0):
+        """Read lines until none arrives for `quiet` seconds"""
+        lines = []
+        while True:
+            try:
+                line = await asyncio.wait_for(client.reader.readline(), quiet)
+            except asyncio.TimeoutError:
+                return lines
+            if not line:
+                return lines
+            lines.append(line.decode().strip())
+
+
+class OutboundWriterTest(unittest.TestCase):
+    """
+    Connections dropped or closed while the writer watches them. The
+    writer loop is stepped by hand, so no thread decides the order.
+    """
+
+    CHUNK = 1024 * 1024     # More than a socket buffer takes at once
+
+    def test_descriptor_reused_after_overflow(self):
+        writer = OutboundWriter()
+
+        # Queue bytes (the writer now watches the socket), overflow, close
+        sock, peer = socket.socketpair()
+        conn = Connection(sock, "slow", writer, max_outbound=self.CHUNK)
+        conn.write(b"x" * self.CHUNK)
+        writer.step(0)
+        with self.assertRaises(OutboundOverflow):
+            conn.write(b"x" * self.CHUNK)
+        conn.close()
+        peer.close()
+
+        # A new connection (possibly on the same descriptor number)
+        # still gets everything flushed
+        sock, peer = socket.socketpair()
+        peer.setblocking(False)
+        conn = Connection(sock, "next", writer)
+        conn.write(b"y" * self.CHUNK)
+        received = 0
+        for _ in range(1000):
+            writer.step(0.01)
+            try:
+                received += len(peer.recv(self.CHUNK))
+            except BlockingIOError:
+                pass
+            if received == self.CHUNK:
+                break
+        self.assertEqual(received, self.CHUNK)
+
+        # Nothing but the wake-up socket is left registered
+        conn.close()
+        writer.step(0)
+        self.assertEqual(len(writer.selector.get_map()), 1)
+        self.assertEqual(sock.fileno(), -1)
+        peer.close()
+
+
+class ShutdownTest(unittest.TestCase):
+    """Stopping the asyncio engine closes the open client streams
+    instead of leaving their reads for asyncio.run() to cancel"""
+
+    def test_clients_connected(self):
+        with self.assertNoLogs("asyncio", level="ERROR"):
+            with running_server(AsyncTicTacToeServer) as (server, port):
+                clients = [socket.create_connection((HOST, port)) for _ in range(3)]
+                clients[0].sendall(b"CREATE 2\n")
+                clients[1].sendall(b"HELLO BINARY/1\n")
+                deadline = time.monotonic() + READ_TIMEOUT
+                while len(server.client_tasks) < len(clients):
+                    self.assertLess(time.monotonic(), deadline)
+                    time.sleep(0.01)
+            self.assertEqual(server.client_tasks, {})
+
+        for client in clients:
+            client.settimeout(READ_TIMEOUT)
+            while client.recv(4096):
+                pass
+            client.close()
+
+
+class SlowClientTest(unittest.TestCase):
+    """
+    A player stops reading while asking for more and more replies. The
+    server must drop them once max_outbound bytes are queued and tell
+    the other player, while players of another game keep getting their
+    moves answered as fast as usual.
+    """
+
+    MAX_OUTBOUND = 64 * 1024
+    WAITING_GAMES = 50      # Makes every LIST reply a few hundred bytes
+    REQUESTS = 20000        # Replies far beyond the socket buffers
+    ROUNDS = 3              # Drawn games played by the timed pair
+    MAX_ROUND_TRIP = 0.1    # Seconds from MOVE to the BOARD it produces
+
+    # A 3x3 game that ends in a draw on the ninth move
+    DRAW = ((0, 0), (1, 1), (2, 2), (0, 2), (2, 0), (1, 0), (1, 2), (2, 1), (0, 1))
+
+    def test_threaded_engine(self):
+        self.run_slow_client(TicTacToeServer)
+
+    def test_asyncio_engine(self):
+        self.run_slow_client(AsyncTicTacToeServer)
+
+    def run_slow_client(self, engine):
+        with running_server(engine, metrics=True,
+                            max_outbound=self.MAX_OUTBOUND) as (server, port):
+            round_trips = asyncio.run(self.stall(port))
+            self.assertEqual(server.metrics.slow_clients.value, 1)
+            self.assertEqual(len(round_trips), self.ROUNDS * len(self.DRAW))
+            self.assertLess(max(round_trips), self.MAX_ROUND_TRIP)
+
+            # The dropped socket left the outbound writer's selector
+            # (only its wake-up socket stays registered)
+            if not isinstance(server, AsyncTicTacToeServer):
+                deadline = time.monotonic() + READ_TIMEOUT
+                while len(server.outbound.selector.get_map()) > 1:
+                    self.assertLess(time.monotonic(), deadline)
+                    time.sleep(0.01)
+
+    async def stall(self, port):
+        """
+        Flood the server from a player that never reads, while two
+        other players time their moves.
+
+        Returns:
+            list of MOVE to BOARD round trips (seconds)
+        """
+        lobby = [await Client.connect(port) for _ in range(self.WAITING_GAMES)]
+        for client in lobby:
+            client.send("CREATE 2")
+            await client.expect("WAIT")
+
+        # A small receive buffer, so the replies pile up on the server
+        sock = socket.socket()
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        sock.connect((HOST, port))
+        slow = Client(*await asyncio.open_connection(sock=sock))
+        fast = await Client.connect(port, "DELTA")
+        x, o = [await Client.connect(port) for _ in range(2)]
+        try:
+            slow.send("CREATE 2")
+            game_id = int((await slow.expect("CREATED")).split()[1])
+            await slow.expect("WAIT")
+            fast.send(f"JOIN {game_id}")
+            await fast.expect("JOINED")
+            await slow.expect("YOURTURN")
+            slow.send("MOVE 0 0")
+            await fast.expect("YOURTURN")
+
+            # From here on the slow player never reads again
+            timed = asyncio.create_task(self.play_draws(x, o))
+            slow.writer.write(b"LIST\n" * self.REQUESTS)
+            await slow.writer.drain()
+
+            # The other player learns that the slow player was dropped
+            # and is still served afterwards
+            seen = []
+            while not seen or seen[-1] != "GAME_ABORTED":
+                seen.append(await fast.read_line())
+            self.assertIn("PLAYER_LEFT", seen)
+            fast.send("LIST")
+            await fast.expect("GAMES")
+
+            # The slow player's connection was closed
+            with self.assertRaises((ConnectionError, OSError)):
+                while True:
+                    await slow.read_line()
+
+            return await timed
+        finally:
+            for client in lobby + [slow, fast, x, o]:
+                client.close()
+
+    async def play_draws(self, x, o):
+        """Play drawn games, timing each MOVE until its BOARD arrives"""
+        round_trips = []
+        for _ in range(self.ROUNDS):
+            x.send("CREATE 2")
+            game_id = int((await x.expect("CREATED")).split()[1])
+            o.send(f"JOIN {game_id}")
+            await o.expect("JOINED")
+            for i, (row, col) in enumerate(self.DRAW):
+                mover = (x, o)[i % 2]
+                await mover.expect("YOURTURN")
+                start = time.perf_counter()
+                mover.send(f"MOVE {row} {col}")
+                await mover.expect("BOARD")
+                round_trips.append(time.perf_counter() - start)
+            await x.expect("DRAW")
+            await o.expect("DRAW")
+        return round_trips
+
+
+if __name__ == "__main__":
+    unittest.main()
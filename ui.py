@@ -64,57 +64,3 @@ def print_board_text(board_text):
 
     print()
     return size
-
-def read_move_safe(board_size, game_active_check=None):
-    """
-    Safely read a move from the user with validation
-    
-    Args:
-        board_size: Size of the game board
-        game_active_check: Optional callable to verify game is still active
-    
-    Returns:
-        (row_str, col_str) as strings
-        (None, None) if game was aborted during waiting for input
-    """
-    while True:
-        try:
-            # Check if the game is still active
-            if game_active_check and not game_active_check():
-                return None, None
-            
-            print("\nEnter your move:")
-            row_input = input("  Row: ").strip()
-            
-            if game_active_check and not game_active_check():
-                return None, None
-            
-            col_input = input("  Col: ").strip()
-            
-            if game_active_check and not game_active_check():
-                return None, None
-
-            # Convert input to integers
-            try:
-                row = int(row_input)
-                col = int(col_input)
-            except ValueError:
-                print("Please enter valid numbers")
-                continue
-
-            # Validate input range
-            if board_size is not None:
-                if row < 0 or row >= board_size:
-                    print(f"Row must be between 0 and {board_size - 1}")
-                    continue
-
-                if col < 0 or col >= board_size:
-                    print(f"Column must be between 0 and {board_size - 1}")
-                    continue
-
-            # Return values as strings for compatibility
-            return str(row), str(col)
-    
-        except Exception as e:
-            print(f"Error reading input: {e}")
-            continue
\ No newline at end of file